@@ -1,19 +1,33 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException
-from app.models.request import ChatRequest
-from app.models.response import ChatResponse
+from fastapi.responses import StreamingResponse
+from app.models.request import BatchChatRequest, ChatRequest
+from app.models.response import BatchChatResult, ChatResponse, SourceDocument
 from app.core.security import get_current_user
-from app.services.rag_pipeline import RAGPipeline
-from app.services.vector_store import MongoVectorStore, get_vector_store
+from app.services.rag_pipeline import RAGPipeline, get_rag_pipeline
 from loguru import logger
 
 router = APIRouter()
-rag_pipeline = RAGPipeline()
+
+def sse_event(event: str, data) -> str:
+    """Formats one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def source_documents(docs) -> list[SourceDocument]:
+    return [
+        SourceDocument(
+            page=doc.metadata.get("page"),
+            similarity_score=doc.metadata.get("similarity_score"),
+            text=doc.page_content,
+        )
+        for doc in docs
+    ]
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_doc(
     request: ChatRequest,
     current_user: dict = Depends(get_current_user),
-    vector_store: MongoVectorStore = Depends(get_vector_store)
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
 ):
     """
     Handles chat requests for a specific document.
@@ -22,19 +36,109 @@ async def chat_with_doc(
     logger.info(f"Received chat request from user {user_id} for doc {request.document_id}")
 
     try:
-        retriever = vector_store.get_retriever(
-            user_id=user_id, document_id=request.document_id
+        result = await rag_pipeline.aanswer(
+            request.question, user_id=user_id, document_id=request.document_id
         )
 
-        chain = rag_pipeline._create_rag_chain(retriever)
-        result = await chain.ainvoke(request.question)
-
         logger.info(f"Successfully generated response for user {user_id}")
         return ChatResponse(
             question=request.question,
-            answer=result,
+            answer=result["answer"],
             document_id=request.document_id,
         )
     except Exception as e:
         logger.error(f"Error processing chat request for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred while processing your chat request.")
+
+@router.post("/chat/stream")
+async def stream_chat_with_doc(
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user),
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
+    """
+    Streams the answer for a chat request as server-sent events: one `sources`
+    event with the retrieved chunks, then `token` events as the answer is
+    generated, then `done` (or `error`).
+    """
+    user_id = current_user.get("sub")
+    logger.info(f"Received streaming chat request from user {user_id} for doc {request.document_id}")
+
+    async def event_stream():
+        try:
+            async for chunk in rag_pipeline.astream(
+                request.question, user_id=user_id, document_id=request.document_id
+            ):
+                if "docs" in chunk:
+                    sources = [source.model_dump() for source in source_documents(chunk["docs"])]
+                    yield sse_event("sources", sources)
+                if chunk.get("answer"):
+                    yield sse_event("token", {"text": chunk["answer"]})
+            yield sse_event("done", {"document_id": request.document_id})
+            logger.info(f"Successfully streamed response for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error streaming chat response for user {user_id}: {e}")
+            yield sse_event("error", {"detail": "An internal error occurred while processing your chat request."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/chat/batch")
+async def batch_chat_with_docs(
+    request: BatchChatRequest,
+    current_user: dict = Depends(get_current_user),
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
+    """
+    Asks every question of every listed document and streams the results as
+    NDJSON, one BatchChatResult per line in completion order. A failed item
+    is reported on its own line with `error` set; the rest of the batch
+    carries on. A final line {"done": true, "results": <count>} marks the end.
+    """
+    user_id = current_user.get("sub")
+    logger.info(
+        f"Received batch chat request from user {user_id}: "
+        f"{len(request.questions)} questions x {len(request.document_ids)} documents"
+    )
+
+    async def result_stream():
+        count = 0
+        try:
+            async for item in rag_pipeline.astream_batch(request.questions, user_id, request.document_ids):
+                result = BatchChatResult(
+                    document_id=item["document_id"],
+                    question=item["question"],
+                    answer=item.get("answer"),
+                    sources=source_documents(item.get("docs", [])),
+                    cached=item.get("cached", False),
+                    error=item.get("error"),
+                )
+                count += 1
+                yield result.model_dump_json() + "\n"
+            yield json.dumps({"done": True, "results": count}) + "\n"
+            logger.info(f"Completed batch of {count} results for user {user_id}")
+        except Exception as e:
+            logger.error(f"Error processing batch chat request for user {user_id}: {e}")
+            yield json.dumps({"done": False, "results": count,
+                              "error": "An internal error occurred while processing your batch request."}) + "\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/chat/cache/stats")
+async def get_answer_cache_stats(
+    current_user: dict = Depends(get_current_user),
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
+    """
+    Reports hit/miss counts and hit rate of the semantic answer cache.
+    """
+    if rag_pipeline.answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag_pipeline.answer_cache.stats()}
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from app.models.response import DocumentStatusResponse, DocumentSummaryResponse
+from app.core.security import get_current_user
+from app.services.ingestion import IngestionQueue, IngestionStage, get_ingestion_queue
+from app.services.summarizer import DocumentSummaryService, get_summary_service
+from app.services.vector_store import MongoVectorStore, get_vector_store
+from loguru import logger
+
+router = APIRouter()
+
+@router.get("/documents/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(
+    document_id: str,
+    current_user: dict = Depends(get_current_user),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
+    vector_store: MongoVectorStore = Depends(get_vector_store)
+):
+    """
+    Reports the ingestion stage and progress of an uploaded document.
+    """
+    user_id = current_user.get("sub")
+
+    job = await ingestion_queue.get(user_id, document_id)
+    if job is not None:
+        return DocumentStatusResponse(
+            document_id=document_id,
+            stage=job.stage.value,
+            filename=job.filename,
+            pages_total=job.pages_total,
+            pages_processed=job.pages_processed,
+            chunks_total=job.chunks_total,
+            chunks_stored=job.chunks_stored,
+            chunks_reused=job.chunks_reused,
+            error=job.error,
+        )
+
+    # Documents ingested before jobs were recorded are looked up in the store.
+    if await vector_store.adocument_exists(user_id, document_id):
+        return DocumentStatusResponse(document_id=document_id, stage=IngestionStage.COMPLETED.value)
+
+    raise HTTPException(status_code=404, detail="Document not found.")
+
+@router.get("/documents/{document_id}/summary", response_model=DocumentSummaryResponse)
+async def get_document_summary(
+    document_id: str,
+    current_user: dict = Depends(get_current_user),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
+    vector_store: MongoVectorStore = Depends(get_vector_store),
+    summary_service: DocumentSummaryService = Depends(get_summary_service)
+):
+    """
+    Summarizes a document. Summaries are cached until the document changes.
+    """
+    user_id = current_user.get("sub")
+
+    job = await ingestion_queue.get(user_id, document_id)
+    if job is not None and not job.finished:
+        raise HTTPException(status_code=409, detail="The document is still being processed.")
+
+    texts = await vector_store.aget_document_texts(user_id, document_id)
+    if not texts:
+        raise HTTPException(status_code=404, detail="Document not found.")
+
+    try:
+        summary, cached = await summary_service.get_summary(user_id, document_id, texts)
+    except Exception as e:
+        logger.error(f"Error summarizing document {document_id} for user {user_id}: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred while summarizing the document.")
+
+    return DocumentSummaryResponse(document_id=document_id, summary=summary, chunks=len(texts), cached=cached)
+
+@router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: str,
+    current_user: dict = Depends(get_current_user),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
+    vector_store: MongoVectorStore = Depends(get_vector_store),
+    summary_service: DocumentSummaryService = Depends(get_summary_service)
+):
+    """
+    Deletes a document, all of its chunks and its cached summary.
+    """
+    user_id = current_user.get("sub")
+
+    job = await ingestion_queue.get(user_id, document_id)
+    if job is not None and not job.finished:
+        raise HTTPException(status_code=409, detail="The document is still being processed.")
+
+    if not await vector_store.adelete_document(user_id, document_id):
+        raise HTTPException(status_code=404, detail="Document not found.")
+    await ingestion_queue.forget(user_id, document_id)
+    await summary_service.forget(user_id, document_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,50 +1,75 @@
+import os
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from typing import Optional
+from fastapi import APIRouter, Depends, Form, HTTPException, UploadFile, status
 from app.models.response import UploadResponse
 from app.core.security import get_current_user
 from app.services.pdf_loader import PDFLoader
-from app.services.vector_store import MongoVectorStore
-from app.services.vector_store import get_vector_store
+from app.services.ingestion import DocumentBusyError, IngestionJob, IngestionQueue, QueueFullError, get_ingestion_queue
+from app.services.vector_store import MongoVectorStore, get_vector_store
 from loguru import logger
 
 router = APIRouter()
 
-@router.post("/upload", response_model=UploadResponse)
+@router.post("/upload", response_model=UploadResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_pdf(
     file: UploadFile,
+    document_id: Optional[str] = Form(None),
     current_user: dict = Depends(get_current_user),
+    ingestion_queue: IngestionQueue = Depends(get_ingestion_queue),
     vector_store: MongoVectorStore = Depends(get_vector_store)
 ):
     """
-    Handles PDF file uploads.
+    Handles PDF file uploads. The file is spooled to disk and queued for
+    ingestion; poll /documents/{document_id}/status for progress.
+    Pass an existing document_id to replace that document's contents; the old
+    chunks keep serving until the new upload has been fully stored, and only
+    content that changed is embedded again.
     """
     user_id = current_user.get("sub")
+    replace = document_id is not None
     logger.info(f"Received upload request from user: {user_id}")
 
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Invalid file type. Only PDFs are allowed.")
 
-    try:
-        document_id = str(uuid.uuid4())
-        logger.info(f"Generated document_id: '{document_id}'")
+    if replace and not await vector_store.adocument_exists(user_id, document_id):
+        raise HTTPException(status_code=404, detail="Document not found.")
 
-        pdf_loader = PDFLoader(upload_file=file)
-        documents = await pdf_loader.load_and_chunk()
-        logger.info(f"Processed {len(documents)} document chunks")
+    tmp_path = None
+    queued = False
+    try:
+        if document_id is None:
+            document_id = str(uuid.uuid4())
+            logger.info(f"Generated document_id: '{document_id}'")
+        else:
+            logger.info(f"Replacing document '{document_id}'")
 
-        vector_store.add_documents(
-            documents=documents,
+        tmp_path = await PDFLoader.save_upload(file)
+        job = IngestionJob(
+            document_id=document_id,
             user_id=user_id,
-            document_id=document_id
+            filename=file.filename,
+            file_path=tmp_path,
+            replace=replace
         )
+        await ingestion_queue.enqueue(job)
+        queued = True
 
-        logger.success(f"Successfully processed and stored document {document_id} for user {user_id}")
-        
         return UploadResponse(
-            message="File uploaded and processed successfully.",
+            message="File uploaded and queued for processing.",
             filename=file.filename,
-            document_id=document_id
+            document_id=document_id,
+            status=job.stage.value
         )
+    except DocumentBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error during file upload for user {user_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Once queued, the ingestion job owns the file and removes it when done.
+        if not queued and tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -11,6 +12,15 @@ class Settings(BaseSettings):
     """
     # MongoDB Configuration
     MONGO_CONNECTION_STRING: str
+    # Connection pool settings, applied to both the sync and the async (Motor) client.
+    # MONGO_MAX_POOL_SIZE is the budget for the machine, split evenly across web workers.
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 5
+    MONGO_MAX_IDLE_TIME_MS: int = 300_000
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    # Chunks per unordered insert_many call.
+    MONGO_WRITE_BATCH_SIZE: int = 500
 
     # Google Gemini API Key
     GOOGLE_GEMINI_API_KEY: str
@@ -20,15 +30,130 @@ class Settings(BaseSettings):
     SUPABASE_KEY: str # This is the service_role key
     SUPABASE_JWT_SECRET: str
     SUPABASE_ANON_KEY: str
+    # Access token verification. HS* tokens are checked against SUPABASE_JWT_SECRET;
+    # asymmetric ones against the key set at SUPABASE_JWKS_URL (e.g.
+    # https://<project>.supabase.co/auth/v1/.well-known/jwks.json), when configured.
+    JWT_ALGORITHMS: list[str] = ["HS256", "RS256", "ES256"]
+    JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWKS_URL: Optional[str] = None
+    JWKS_CACHE_TTL_SECONDS: int = 600
+    # Validated token claims are reused until the token expires or this TTL passes.
+    AUTH_CACHE_TTL_SECONDS: int = 300
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
 
     HUGGINGFACE_API_TOKEN:str
 
+    # Embedding Configuration
+    # "huggingface" calls the Inference API; "local" runs sentence-transformers in-process.
+    EMBEDDING_PROVIDER: str = "huggingface"
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_API_URL: str = "https://router.huggingface.co/hf-inference/models/{model}/pipeline/feature-extraction"
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_MAX_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_BATCH_TIMEOUT_SECONDS: float = 30.0
+    # Embeddings are cached by (model, sha256 of normalized text) in memory and in MongoDB.
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100_000
+    EMBEDDING_CACHE_PERSISTENT: bool = True
+    # How chunk embeddings are packed in MongoDB: "float32", or quantized "float16" / "int8".
+    EMBEDDING_STORAGE_DTYPE: str = "float32"
+
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
 
     # Port Configuration
     PORT: int = 8000
 
+    # Multi-worker Configuration
+    # Server processes on this machine (gunicorn -c gunicorn.conf.py); 0 there
+    # means one per CPU core. Per-process pools below are sized from it.
+    WEB_CONCURRENCY: int = 0
+    # Directory, ideally on tmpfs such as /dev/shm, where workers share embedding
+    # matrices and document change notices; unset keeps all state per process.
+    SHARED_INDEX_DIR: Optional[str] = None
+    # Total size of shared matrices. The default fits Docker's 64 MB /dev/shm;
+    # raise it together with the container's --shm-size.
+    SHARED_INDEX_MAX_MB: int = 48
+
+    # Ingestion Queue Configuration
+    INGESTION_MAX_CONCURRENCY: int = 2
+    INGESTION_QUEUE_MAX_SIZE: int = 100
+    # A document is claimed in MongoDB while its ingestion is pending, so web
+    # workers never ingest it twice at once; a claim its worker has not renewed
+    # for this long (e.g. the process died) can be taken over.
+    INGESTION_JOB_STALE_SECONDS: int = 60
+    # Re-uploads of an existing document keep unchanged chunks, reuse stored
+    # embeddings and apply only the difference; off re-ingests from scratch.
+    INCREMENTAL_REINGESTION: bool = True
+
+    # PDF Parsing Configuration
+    # Worker processes for page extraction; 0 means an even share of the CPU
+    # cores per web worker.
+    PDF_PARSE_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 16
+
+    # Retrieval / RAG Configuration
+    RETRIEVAL_TOP_K: int = 5
+    # Upper bound on concurrent chain runs when answering questions in a batch.
+    RAG_MAX_CONCURRENCY: int = 8
+    # Limits on one /chat/batch request (every question is asked of every document).
+    BATCH_MAX_QUESTIONS: int = 100
+    BATCH_MAX_DOCUMENTS: int = 500
+    # Estimated prompt tokens available for retrieved context, and the share of a
+    # passage's word 5-grams found in a better-ranked one that marks it a duplicate.
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_DUPLICATE_THRESHOLD: float = 0.8
+
+    # Semantic Answer Cache Configuration
+    # A cached answer is reused when a new question's embedding is at least this
+    # cosine-similar to a previously answered question on the same document.
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES_PER_DOCUMENT: int = 256
+    ANSWER_CACHE_MAX_DOCUMENTS: int = 1000
+
+    # Vector Index Configuration
+    # Memory budget for the in-process cache of per-document embedding matrices.
+    VECTOR_INDEX_CACHE_MB: int = 256
+    # Threads for index builds and NumPy scoring, kept off the event loop; 0
+    # means an even share of the CPU cores per web worker, at least 2.
+    VECTOR_SEARCH_THREADS: int = 0
+    # "exact" scores every chunk, "ivf" uses the approximate IVF-flat index,
+    # "auto" switches to IVF once a search scope reaches IVF_MIN_CHUNKS.
+    VECTOR_INDEX_BACKEND: str = "auto"
+    IVF_MIN_CHUNKS: int = 20000
+    IVF_NPROBE: int = 16
+    IVF_RETRAIN_GROWTH: float = 2.0
+
+    # Hybrid Search Configuration
+    # "hybrid" fuses vector and BM25 keyword rankings with reciprocal rank fusion
+    # for single-document searches; "vector" uses embeddings alone.
+    RETRIEVAL_MODE: str = "hybrid"
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    HYBRID_RRF_K: int = 60
+    # Each retriever contributes k * this many candidates to the fusion.
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    KEYWORD_INDEX_CACHE_MB: int = 64
+
+    # Summarization Configuration
+    SUMMARY_MODEL: str = "gemini-1.5-flash"
+    # Concurrent LLM calls across all summaries in a process, kept within
+    # provider rate limits, and how many finished outputs are written to the
+    # summary cache at a time.
+    SUMMARY_MAX_CONCURRENCY: int = 8
+    SUMMARY_MAP_BATCH_SIZE: int = 32
+    # Estimated tokens of partial summaries merged by one reduce call.
+    SUMMARY_REDUCE_TOKEN_BUDGET: int = 6000
+    SUMMARY_CACHE_MAX_ENTRIES: int = 10_000
+
+    # How long /health/ready waits for a MongoDB ping before reporting not ready.
+    READINESS_TIMEOUT_SECONDS: float = 2.0
+    # Tag each request (and the ingestion it queues) with a trace ID, taken from
+    # X-Request-ID when the caller sends one, and include it in log lines.
+    REQUEST_TRACING: bool = True
+
     # --- CORRECTED CONFIGURATION ---
     # This single dictionary now handles all model settings, resolving the conflict.
     # It tells Pydantic where to find the .env file and to ignore extra variables.
@@ -0,0 +1,65 @@
+from pymongo import monitoring
+from app.core.config import settings
+from app.core.metrics import MONGO_POOL_CHECKOUT_FAILURES, MONGO_POOL_CONNECTIONS
+from app.core.scaling import per_worker
+
+DATABASE_NAME = "chat_with_pdf_db"
+CHUNK_COLLECTION_NAME = "document_embeddings_hf"
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Keeps the mongo_pool_* metrics current for one client from pymongo's
+    connection pool events.
+    """
+    def __init__(self, client: str):
+        self.client = client
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.inc(client=self.client, state="open")
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.dec(client=self.client, state="open")
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CONNECTIONS.inc(client=self.client, state="in_use")
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CONNECTIONS.dec(client=self.client, state="in_use")
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_FAILURES.inc(client=self.client, reason=str(event.reason))
+
+    # The remaining events carry nothing the metrics need.
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+def mongo_client_options(client: str = "sync") -> dict:
+    """
+    Connection pool settings shared by the sync and the async (Motor) client.
+    client names the pool in metrics. Each web worker gets an even share of
+    MONGO_MAX_POOL_SIZE.
+    """
+    return {
+        "event_listeners": [PoolMetricsListener(client)],
+        "maxPoolSize": per_worker(settings.MONGO_MAX_POOL_SIZE),
+        "minPoolSize": min(settings.MONGO_MIN_POOL_SIZE, per_worker(settings.MONGO_MAX_POOL_SIZE)),
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
@@ -0,0 +1,77 @@
+import inspect
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+# Resources in the order they were created, so shutdown can close them newest first.
+_created: list["LazyResource"] = []
+_created_lock = threading.Lock()
+
+
+class LazyResource(Generic[T]):
+    """
+    A process-wide object built on first use rather than at import time.
+    get() is thread-safe, so it can be called from executor threads. A factory
+    that raises leaves the resource uncreated, and the next get() retries.
+    """
+    def __init__(self, name: str, factory: Callable[[], T], close: Optional[Callable[[T], object]] = None):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._remember(self.factory())
+                    logger.info(f"Initialized {self.name}.")
+                instance = self._instance
+        return instance
+
+    def set(self, instance: T):
+        """
+        Installs an instance built elsewhere, e.g. a stand-in for benchmarks.
+        """
+        with self._lock:
+            self._remember(instance)
+
+    def _remember(self, instance: T):
+        self._instance = instance
+        with _created_lock:
+            if self not in _created:
+                _created.append(self)
+
+    async def aclose(self):
+        instance, self._instance = self._instance, None
+        if instance is None or self.close is None:
+            return
+        result = self.close(instance)
+        if inspect.isawaitable(result):
+            await result
+        logger.info(f"Closed {self.name}.")
+
+
+async def close_resources():
+    """
+    Closes every resource created so far, newest first, so a resource is
+    closed before the ones it was built on. Errors are logged, not raised,
+    so one failing close does not skip the rest.
+    """
+    while True:
+        with _created_lock:
+            if not _created:
+                return
+            resource = _created.pop()
+        try:
+            await resource.aclose()
+        except Exception as e:
+            logger.error(f"Error while closing {resource.name}: {e}")
@@ -7,10 +7,12 @@ def setup_logging():
     Removes default handlers and adds a new one with a specific format.
     """
     logger.remove()  # Remove the default handler
+    # Lines logged outside a traced request show "-" as their trace ID.
+    logger.configure(extra={"trace_id": "-"})
     logger.add(
         sys.stderr,
         level="INFO",
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> | {extra[trace_id]} - <level>{message}</level>",
         colorize=True,
     )
     logger.info("Logger configured successfully.")
@@ -0,0 +1,225 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A callback returns (labels, value) pairs and is read at scrape time, for
+# values that already live elsewhere, such as queue lengths or cache counters.
+Callback = Callable[[], Iterable[tuple[dict, float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    """
+    Holds metric families and renders them in the Prometheus text format.
+    """
+    def __init__(self):
+        self._metrics: dict[str, "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    """
+    Base for metric families. Values are kept per label-value tuple; every
+    update names all of the family's labels as keyword arguments.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callback] = None, registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _current(self) -> dict[tuple, float]:
+        if self.callback is None:
+            with self._lock:
+                return dict(self._values)
+        return {self._key(labels): value for labels, value in self.callback()}
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._current().items())
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    Cumulative-bucket histogram of observed durations (or any values).
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: dict[tuple, list] = {}
+        super().__init__(name, documentation, labelnames, registry=registry)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count.
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        lines = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {values[-1]}")
+        return lines
+
+
+# --- Cache statistics ---
+# Caches report through their stats() method: {"hits", "misses", ...}.
+_caches: dict[str, Callable[[], Optional[dict]]] = {}
+
+def register_cache(name: str, stats: Callable[[], Optional[dict]]):
+    """
+    Exposes a cache's hit and miss counts. stats may return None while the
+    cache does not exist yet.
+    """
+    _caches[name] = stats
+
+def _cache_samples(field: str):
+    for name, stats in list(_caches.items()):
+        current = stats()
+        if current is not None:
+            yield {"cache": name}, current[field]
+
+Counter("cache_hits_total", "Cache lookups answered from the cache.", ["cache"],
+        callback=lambda: _cache_samples("hits"))
+Counter("cache_misses_total", "Cache lookups that missed.", ["cache"],
+        callback=lambda: _cache_samples("misses"))
+
+
+# --- Request path ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.",
+    ["method", "route", "status"],
+)
+AUTH_SECONDS = Histogram(
+    "auth_seconds", "Time spent validating the bearer token.", ["outcome"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_stage_seconds",
+    "Time per question answering stage: query_embedding, mongo_fetch, scoring, "
+    "llm_first_token, llm and total.",
+    ["stage"],
+)
+
+# --- Ingestion ---
+INGESTION_STAGE_SECONDS = Histogram(
+    "ingestion_stage_seconds",
+    "Time per ingestion step: temp_write per upload, parse per page batch, chunk per page, "
+    "embed and store per chunk batch.",
+    ["stage"],
+)
+INGESTION_DOCUMENTS = Counter("ingestion_documents_total", "Ingestion runs by outcome.", ["outcome"])
+
+# --- MongoDB connection pools, fed by database.PoolMetricsListener ---
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongo_pool_connections", "Open MongoDB connections per client, by state (open or in_use).", ["client", "state"],
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed, e.g. on wait queue timeout.",
+    ["client", "reason"],
+)
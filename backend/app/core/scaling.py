@@ -0,0 +1,28 @@
+import os
+
+
+def cpu_count() -> int:
+    """
+    CPU cores this process may run on, which respects container CPU sets.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def web_worker_count() -> int:
+    """
+    Server processes sharing this machine. gunicorn.conf.py exports the
+    resolved count as WEB_CONCURRENCY; a plain uvicorn process is one worker.
+    """
+    # Imported here so gunicorn.conf.py can use cpu_count before it exports the settings.
+    from app.core.config import settings
+
+    return max(1, settings.WEB_CONCURRENCY)
+
+
+def per_worker(total: int, minimum: int = 1) -> int:
+    """
+    This process's share of a budget meant for the whole machine.
+    """
+    return max(minimum, total // web_worker_count())
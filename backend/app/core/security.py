@@ -1,16 +1,194 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from supabase import create_client, Client
-from jose import jwt, JWTError
+from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
 from loguru import logger
 from .config import settings
+from .lifecycle import LazyResource
+from .metrics import AUTH_SECONDS, register_cache
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # This scheme expects the token to be sent in the Authorization header
 # as 'Bearer <token>'
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+class TokenClaimsCache:
+    """
+    Bounded LRU of validated token claims, keyed by a hash of the token. An
+    entry is dropped once the token's exp passes or ttl_seconds after it was
+    validated, whichever comes first. Only valid tokens are cached.
+    """
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries)}
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, claims: dict):
+        expires_at = time.time() + self.ttl_seconds
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (dict(claims), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class JWKSKeySet:
+    """
+    Public signing keys from a JWKS endpoint, parsed once and cached by kid.
+    The set is refetched after ttl_seconds, or early when a token names an
+    unknown kid (key rotation), but never more than once per
+    min_refresh_seconds so unknown kids cannot hammer the endpoint. If a
+    refetch fails, the keys already held keep being used.
+    """
+    def __init__(self, url: str, ttl_seconds: float = 600.0, min_refresh_seconds: float = 30.0, timeout: float = 5.0):
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self.timeout = timeout
+        self._keys: dict = {}
+        self._fetched_at = float("-inf")
+        self._attempted_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self) -> dict:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()
+
+    def _stale(self, kid: Optional[str], now: float) -> bool:
+        expired = now - self._fetched_at > self.ttl_seconds
+        return (expired or kid not in self._keys) and now - self._attempted_at > self.min_refresh_seconds
+
+    async def _refresh(self):
+        self._attempted_at = time.monotonic()
+        try:
+            document = await self._fetch()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Failed to fetch JWKS from {self.url}; keeping {len(self._keys)} cached keys: {e}")
+            return
+
+        keys = {}
+        for key in document.get("keys", []):
+            try:
+                keys[key["kid"]] = jwk.construct(key, key.get("alg"))
+            except (KeyError, JWKError) as e:
+                logger.warning(f"Skipping unusable JWKS key {key.get('kid')}: {e}")
+        self._keys = keys
+        self._fetched_at = self._attempted_at
+        logger.info(f"Loaded {len(keys)} signing keys from JWKS.")
+
+    async def get_key(self, kid: Optional[str]):
+        """
+        Returns the parsed key for kid, or None if the key set does not have it.
+        """
+        if self._stale(kid, time.monotonic()):
+            async with self._lock:
+                # Another request may have refreshed while this one waited.
+                if self._stale(kid, time.monotonic()):
+                    await self._refresh()
+        return self._keys.get(kid)
+
+
+token_cache = TokenClaimsCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
+jwks_key_set = (
+    JWKSKeySet(settings.SUPABASE_JWKS_URL, ttl_seconds=settings.JWKS_CACHE_TTL_SECONDS)
+    if settings.SUPABASE_JWKS_URL else None
+)
+
+
+register_cache("token_claims", token_cache.stats)
+
+
+async def verify_token(token: str) -> dict:
+    """
+    Returns the claims of a valid access token, from the cache when the token
+    was seen before. Raises JWTError if the token is not valid.
+    """
+    start = time.perf_counter()
+    claims = token_cache.get(token)
+    if claims is not None:
+        AUTH_SECONDS.observe(time.perf_counter() - start, outcome="cached")
+        return claims
+
+    try:
+        claims = await _verify_uncached(token)
+    except Exception:
+        AUTH_SECONDS.observe(time.perf_counter() - start, outcome="rejected")
+        raise
+    token_cache.put(token, claims)
+    AUTH_SECONDS.observe(time.perf_counter() - start, outcome="verified")
+    logger.debug(f"Validated token for user_id: {claims['sub']}")
+    return claims
+
+
+async def _verify_uncached(token: str) -> dict:
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm not in settings.JWT_ALGORITHMS:
+        raise JWTError(f"Unsupported signing algorithm: {algorithm}")
+
+    # The key type follows from the algorithm, so an HMAC token can never be
+    # checked against a public key.
+    if algorithm.startswith("HS"):
+        key = settings.SUPABASE_JWT_SECRET
+    elif jwks_key_set is None:
+        raise JWTError(f"{algorithm} token received but SUPABASE_JWKS_URL is not configured")
+    else:
+        key = await jwks_key_set.get_key(header.get("kid"))
+        if key is None:
+            raise JWTError(f"Unknown signing key: {header.get('kid')}")
+
+    claims = jwt.decode(token, key, algorithms=[algorithm], audience=settings.JWT_AUDIENCE)
+    if claims.get("sub") is None:
+        raise JWTError("Token has no subject")
+    return claims
+
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     """
@@ -23,21 +201,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience="authenticated",
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        
         # The payload itself contains the user data from Supabase token
-        # You can add a check here to see if the user exists in your DB if needed
         # For now, we trust the valid token from Supabase
-        logger.info(f"Successfully validated token for user_id: {user_id}")
-        return payload
+        return await verify_token(token)
 
     except JWTError as e:
         logger.error(f"JWT Error: {e}")
@@ -46,3 +212,25 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
         logger.error(f"An unexpected error occurred during token validation: {e}")
         raise credentials_exception
 
+
+def _create_supabase() -> "Client":
+    from supabase import create_client
+
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+
+_supabase = LazyResource("Supabase client", _create_supabase)
+
+def get_supabase() -> "Client":
+    """
+    Returns the shared Supabase client, creating it on first use so importing
+    this module needs neither the supabase package loaded nor the network.
+    """
+    return _supabase.get()
+
+
+def __getattr__(name: str):
+    # Keeps `from app.core.security import supabase` working, lazily.
+    if name == "supabase":
+        return get_supabase()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
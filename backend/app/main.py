@@ -1,19 +1,66 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.v1 import upload, chat
+from fastapi.responses import JSONResponse, Response
+from app.api.v1 import upload, chat, documents
 from app.core.logger import setup_logging
 from app.core.config import settings
+from app.core.lifecycle import close_resources
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+from app.core.tracing import RequestTracingMiddleware
+from app.services.rag_pipeline import get_rag_pipeline
+from app.services.vector_store import get_vector_store
+from loguru import logger
 import uvicorn
 import os
 
-# --- CHANGE ---
-# The lifespan manager is removed. Logging is now called directly.
 setup_logging()
 
-app = FastAPI(title="Chat with PDF API")
+async def _in_warm_up_thread(app: FastAPI, fn):
+    """
+    Runs fn in a worker thread. Cancelling warm-up cannot stop the thread, so
+    it is shielded and tracked, and shutdown waits for it before closing
+    resources rather than letting it create one after they are closed.
+    """
+    future = asyncio.ensure_future(asyncio.to_thread(fn))
+    app.state.warm_up_threads.append(future)
+    return await asyncio.shield(future)
+
+async def warm_up(app: FastAPI):
+    """
+    Connects to MongoDB, ensures its indexes and builds the RAG pipeline in
+    the background, so startup never waits on the network. Requests that
+    arrive first create whatever they need themselves.
+    """
+    try:
+        vector_store = await _in_warm_up_thread(app, get_vector_store)
+        try:
+            await vector_store.aensure_indexes()
+        except Exception as e:
+            # The API can still serve without them; queries just fall back to collection scans.
+            logger.error(f"Could not ensure MongoDB indexes: {e}")
+        await _in_warm_up_thread(app, get_rag_pipeline)
+        app.state.warmed_up = True
+        logger.info("Warm-up complete.")
+    except Exception as e:
+        logger.error(f"Warm-up failed; resources will be created on first use: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warmed_up = False
+    app.state.warm_up_threads = []
+    warm_up_task = asyncio.create_task(warm_up(app))
+    yield
+    warm_up_task.cancel()
+    await asyncio.gather(warm_up_task, *app.state.warm_up_threads, return_exceptions=True)
+    await close_resources()
+    logger.info("Shutdown complete.")
+
+app = FastAPI(title="Chat with PDF API", lifespan=lifespan)
 
 # CORS Middleware Configuration
-origins = ["*"] 
+origins = ["*"]
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,17 +68,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(RequestTracingMiddleware)
 
 # Include API routers
 app.include_router(upload.router, prefix="/api/v1", tags=["PDF Management"])
+app.include_router(documents.router, prefix="/api/v1", tags=["PDF Management"])
 app.include_router(chat.router, prefix="/api/v1", tags=["Chat"])
 
 @app.get("/", tags=["Health Check"])
 def read_root():
     """Health check endpoint."""
-    return {"status": "ok"}  
+    return {"status": "ok"}
+
+@app.get("/health/live", tags=["Health Check"])
+def liveness():
+    """Liveness probe: the process is up and serving. Touches no dependencies."""
+    return {"status": "alive"}
+
+@app.get("/health/ready", tags=["Health Check"])
+async def readiness():
+    """
+    Readiness probe: warm-up has finished and MongoDB answers a ping within
+    READINESS_TIMEOUT_SECONDS. Returns 503 otherwise.
+    """
+    checks = {"warm_up": app.state.warmed_up, "mongodb": False}
+    if checks["warm_up"]:
+        try:
+            await asyncio.wait_for(get_vector_store().aping(), timeout=settings.READINESS_TIMEOUT_SECONDS)
+            checks["mongodb"] = True
+        except Exception as e:
+            logger.warning(f"Readiness check failed to reach MongoDB: {e}")
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
+
+@app.get("/metrics", tags=["Health Check"], include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: latency histograms, counters and gauges."""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))  # default 8000 locally
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run("main:app", host="0.0.0.0", port=port)
@@ -0,0 +1,73 @@
+"""
+Rewrites chunk embeddings in document_embeddings_hf into packed BSON binary.
+
+Usage (from backend/):
+    python -m app.migrations.migrate_embedding_storage --dtype float32 --batch-size 1000 [--dry-run]
+
+Converts legacy chunks that store the embedding as an array of floats, and
+packed chunks stored with a different dtype than --dtype. Each update is
+conditional on the chunk still needing conversion, so the migration is
+idempotent, can be interrupted and rerun, and is safe while the API is serving:
+readers decode both layouts.
+"""
+import argparse
+from pymongo import MongoClient, UpdateOne
+from pymongo.collection import Collection
+from loguru import logger
+from app.core.config import settings
+from app.core.database import CHUNK_COLLECTION_NAME, DATABASE_NAME, mongo_client_options
+from app.services.embedding_codec import STORAGE_DTYPES, decode_embedding, encode_embedding
+
+
+def pending_filter(dtype: str) -> dict:
+    return {
+        "embedding": {"$exists": True},
+        "$or": [
+            {"embedding": {"$type": "array"}},
+            {"embedding_dtype": {"$ne": dtype}},
+        ],
+    }
+
+
+def migrate(collection: Collection, dtype: str, batch_size: int = 1000, dry_run: bool = False) -> int:
+    """
+    Converts every pending chunk and returns how many were rewritten.
+    """
+    query = pending_filter(dtype)
+    total = collection.count_documents(query)
+    logger.info(f"{total} chunks need conversion to {dtype}.")
+    if dry_run or not total:
+        return 0
+
+    projection = {"embedding": 1, "embedding_dtype": 1, "embedding_scale": 1}
+    unset = {} if dtype == "int8" else {"$unset": {"embedding_scale": ""}}
+    operations, migrated = [], 0
+    for chunk in collection.find(query, projection).batch_size(batch_size):
+        fields = encode_embedding(decode_embedding(chunk), dtype)
+        operations.append(UpdateOne({"_id": chunk["_id"], **query}, {"$set": fields, **unset}))
+        if len(operations) >= batch_size:
+            migrated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+            logger.info(f"Converted {migrated}/{total} chunks.")
+    if operations:
+        migrated += collection.bulk_write(operations, ordered=False).modified_count
+
+    remaining = collection.count_documents(query)
+    logger.success(f"Converted {migrated} chunks; {remaining} still pending.")
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", choices=sorted(STORAGE_DTYPES), default=settings.EMBEDDING_STORAGE_DTYPE)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    client = MongoClient(settings.MONGO_CONNECTION_STRING, **mongo_client_options())
+    collection = client.get_database(DATABASE_NAME).get_collection(CHUNK_COLLECTION_NAME)
+    migrate(collection, args.dtype, args.batch_size, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
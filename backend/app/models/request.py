@@ -1,4 +1,6 @@
+from typing import Annotated
 from pydantic import BaseModel, Field, EmailStr
+from app.core.config import settings
 
 class UserCreate(BaseModel):
     """
@@ -16,3 +18,13 @@ class ChatRequest(BaseModel):
     """
     document_id: str = Field(..., description="The unique identifier for the processed document.")
     question: str = Field(..., min_length=1, description="The question being asked by the user.")
+
+class BatchChatRequest(BaseModel):
+    """
+    Schema for a batch chat request.
+    Every question is answered against every listed document.
+    """
+    document_ids: list[str] = Field(..., min_length=1, max_length=settings.BATCH_MAX_DOCUMENTS,
+                                    description="The documents to ask each question of.")
+    questions: list[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1, max_length=settings.BATCH_MAX_QUESTIONS,
+                                                         description="The questions to ask.")
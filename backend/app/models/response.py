@@ -17,11 +17,35 @@ class UserResponse(BaseModel):
 
 class UploadResponse(BaseModel):
     """
-    Schema for the response after a successful file upload and processing.
+    Schema for the response after a file upload has been accepted for processing.
     """
     message: str = "File uploaded successfully."
     filename: str = Field(..., description="The original name of the uploaded file.")
     document_id: str = Field(..., description="The unique identifier assigned to the processed document.")
+    status: str = Field("queued", description="The ingestion stage of the document.")
+
+class DocumentStatusResponse(BaseModel):
+    """
+    Schema for reporting the ingestion progress of an uploaded document.
+    """
+    document_id: str = Field(..., description="The ID of the document.")
+    stage: str = Field(..., description="One of queued, parsing, embedding, completed or failed.")
+    filename: Optional[str] = Field(None, description="The original name of the uploaded file.")
+    pages_total: int = Field(0, description="Number of pages in the PDF, once parsed.")
+    pages_processed: int = Field(0, description="Number of pages parsed so far.")
+    chunks_total: int = Field(0, description="Number of text chunks produced from the PDF.")
+    chunks_stored: int = Field(0, description="Number of chunks embedded and stored so far.")
+    chunks_reused: int = Field(0, description="Number of chunks of a re-upload whose stored embedding was reused rather than computed again.")
+    error: Optional[str] = Field(None, description="The error message if ingestion failed.")
+
+class DocumentSummaryResponse(BaseModel):
+    """
+    Schema for a whole-document summary.
+    """
+    document_id: str = Field(..., description="The ID of the document.")
+    summary: str = Field(..., description="The generated summary.")
+    chunks: int = Field(..., description="Number of chunks the summary was built from.")
+    cached: bool = Field(False, description="Whether the summary was served from cache.")
 
 class ChatResponse(BaseModel):
     """
@@ -30,3 +54,23 @@ class ChatResponse(BaseModel):
     question: str = Field(..., description="The original question asked by the user.")
     answer: str = Field(..., description="The generated answer to the user's question.")
     document_id: str = Field(..., description="The ID of the document the chat is based on.")
+
+class SourceDocument(BaseModel):
+    """
+    Schema for a retrieved chunk used as context for an answer.
+    """
+    page: Optional[int] = Field(None, description="Zero-based page number the chunk came from.")
+    similarity_score: Optional[float] = Field(None, description="Cosine similarity between the question and the chunk.")
+    text: str = Field(..., description="The chunk text.")
+
+class BatchChatResult(BaseModel):
+    """
+    Schema for one line of the batch chat NDJSON stream: the answer to one
+    question about one document, or the error that prevented it.
+    """
+    document_id: str = Field(..., description="The ID of the document the question was asked of.")
+    question: str = Field(..., description="The question asked.")
+    answer: Optional[str] = Field(None, description="The generated answer, unless an error occurred.")
+    sources: List[SourceDocument] = Field(default_factory=list, description="The chunks used as context.")
+    cached: bool = Field(False, description="Whether the answer was served from the answer cache.")
+    error: Optional[str] = Field(None, description="Why no answer was produced, if so.")
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+from langchain.docstore.document import Document
+from app.services.vector_index import normalize_rows
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    docs: list[Document]
+    similarity: float = 0.0
+    created_at: float = field(default_factory=time.time)
+
+
+class _DocumentAnswers:
+    """
+    Cached answers for one document, with their question embeddings stacked
+    into a matrix so a lookup is one matrix-vector product.
+    """
+    def __init__(self):
+        self.entries: list[CachedAnswer] = []
+        self.matrix: Optional[np.ndarray] = None
+
+    def add(self, embedding: np.ndarray, entry: CachedAnswer, max_entries: int):
+        self.entries.append(entry)
+        self.matrix = embedding if self.matrix is None else np.vstack([self.matrix, embedding])
+        if len(self.entries) > max_entries:
+            self.entries = self.entries[-max_entries:]
+            self.matrix = self.matrix[-max_entries:]
+
+    def drop_expired(self, cutoff: float):
+        keep = [i for i, entry in enumerate(self.entries) if entry.created_at >= cutoff]
+        if len(keep) != len(self.entries):
+            self.entries = [self.entries[i] for i in keep]
+            self.matrix = self.matrix[keep] if keep else None
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers per (user_id, document_id) and serves them for new
+    questions whose embedding is within `threshold` cosine similarity of a
+    cached question. Entries expire after ttl_seconds; each document keeps at
+    most max_entries_per_document answers, and at most max_documents documents
+    are kept, least recently used first out.
+    """
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600,
+                 max_entries_per_document: int = 256, max_documents: int = 1000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_document = max_entries_per_document
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[tuple, _DocumentAnswers]" = OrderedDict()
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "documents": len(self._documents),
+        }
+
+    def lookup(self, user_id: str, document_id: str, query_embedding) -> Optional[CachedAnswer]:
+        query = normalize_rows(query_embedding)[0]
+        with self._lock:
+            answers = self._documents.get((user_id, document_id))
+            if answers is not None:
+                self._documents.move_to_end((user_id, document_id))
+                answers.drop_expired(time.time() - self.ttl_seconds)
+            if answers is None or answers.matrix is None:
+                self.misses += 1
+                return None
+
+            scores = answers.matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            entry = answers.entries[best]
+            return CachedAnswer(entry.question, entry.answer, entry.docs, float(scores[best]), entry.created_at)
+
+    def generation(self, user_id: str) -> int:
+        """
+        Returns the user's invalidation counter. Read it before retrieval and pass
+        it to store() so an answer built from since-changed data is not cached.
+        """
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def store(self, user_id: str, document_id: str, query_embedding, question: str, answer: str,
+              docs: list[Document], generation: Optional[int] = None):
+        embedding = normalize_rows(query_embedding)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                return
+            key = (user_id, document_id)
+            answers = self._documents.get(key)
+            if answers is None:
+                answers = self._documents[key] = _DocumentAnswers()
+            self._documents.move_to_end(key)
+            answers.add(embedding, CachedAnswer(question, answer, docs), self.max_entries_per_document)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def invalidate(self, user_id: str, document_id: str):
+        """
+        Drops the answers for a document, and the user's cross-document answers
+        since they may have drawn on it.
+        """
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._documents.pop((user_id, document_id), None)
+            self._documents.pop((user_id, None), None)
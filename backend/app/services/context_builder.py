@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Optional
+from langchain.docstore.document import Document
+from app.services.tokens import estimate_tokens
+
+
+@dataclass
+class Passage:
+    """
+    A span of one page assembled from one or more retrieved chunks. rank is the
+    best retrieval rank among them (0 = most relevant).
+    """
+    text: str
+    rank: int
+    document_id: Optional[str] = None
+    page: Optional[int] = None
+    start: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+
+def _shingles(text: str, size: int = 5) -> set:
+    words = text.lower().split()
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class ContextBuilder:
+    """
+    Assembles the prompt context from retrieved chunks, best first:
+    overlapping or touching chunks of the same page are stitched back into one
+    passage using their start offsets, passages mostly contained in a better
+    ranked one are dropped, and the rest are packed under a token budget.
+    """
+    def __init__(self, token_budget: int = 1500, duplicate_threshold: float = 0.8,
+                 max_gap: int = 2, separator: str = "\n\n"):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.max_gap = max_gap
+        self.separator = separator
+
+    def build(self, docs: list[Document]) -> str:
+        return self.separator.join(passage.text for passage in self.pack(self.passages(docs)))
+
+    def passages(self, docs: list[Document]) -> list[Passage]:
+        """
+        Returns merged, de-duplicated passages ordered by rank.
+        """
+        passages = [
+            Passage(
+                text=doc.page_content,
+                rank=rank,
+                document_id=doc.metadata.get("document_id"),
+                page=doc.metadata.get("page"),
+                start=doc.metadata.get("start_index"),
+            )
+            for rank, doc in enumerate(docs)
+        ]
+        merged = sorted(self._merge_overlapping(passages), key=lambda passage: passage.rank)
+        return self._drop_near_duplicates(merged)
+
+    def _merge_overlapping(self, passages: list[Passage]) -> list[Passage]:
+        located = [p for p in passages if p.start is not None and p.page is not None]
+        merged = [p for p in passages if p.start is None or p.page is None]
+
+        by_page = lambda p: (str(p.document_id), p.page)
+        for _, group in groupby(sorted(located, key=lambda p: (by_page(p), p.start)), key=by_page):
+            current = None
+            for passage in group:
+                if current is not None and passage.start <= current.end + self.max_gap:
+                    if passage.end > current.end:
+                        overlap = current.end - passage.start
+                        joiner = "" if overlap >= 0 else " "
+                        current.text += joiner + passage.text[max(overlap, 0):]
+                    current.rank = min(current.rank, passage.rank)
+                    continue
+                current = Passage(passage.text, passage.rank, passage.document_id, passage.page, passage.start)
+                merged.append(current)
+        return merged
+
+    def _drop_near_duplicates(self, passages: list[Passage]) -> list[Passage]:
+        kept, kept_shingles = [], []
+        for passage in passages:
+            shingles = _shingles(passage.text)
+            if any(len(shingles & other) >= self.duplicate_threshold * len(shingles) for other in kept_shingles):
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+        return kept
+
+    def pack(self, passages: list[Passage]) -> list[Passage]:
+        """
+        Keeps passages in rank order while they fit the token budget, skipping
+        any that would overflow it. The best passage is truncated if it alone
+        exceeds the budget, so the context is never empty.
+        """
+        packed, used = [], 0
+        separator_tokens = estimate_tokens(self.separator)
+        for passage in passages:
+            tokens = estimate_tokens(passage.text) + (separator_tokens if packed else 0)
+            if used + tokens <= self.token_budget:
+                packed.append(passage)
+                used += tokens
+            elif not packed:
+                packed.append(Passage(passage.text[:self.token_budget * 4], passage.rank,
+                                      passage.document_id, passage.page, passage.start))
+                used = self.token_budget
+        return packed
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from loguru import logger
+from app.services.embeddings import EmbeddingClient
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC unicode with collapsed whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _as_list(vector) -> list[float]:
+    return vector.tolist() if isinstance(vector, np.ndarray) else vector
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model name, sha256 of normalized text):
+    an in-process LRU in front of an optional persistent MongoDB collection.
+    """
+    def __init__(self, model_name: str, collection: Optional[Collection] = None, max_entries: int = 100_000):
+        self.model_name = model_name
+        self.collection = collection
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _key(self, digest: str) -> str:
+        return f"{self.model_name}:{digest}"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, digests: list[str]) -> dict[str, np.ndarray]:
+        """
+        Returns the cached vectors for the given content hashes; missing hashes are omitted.
+        """
+        found, pending = {}, []
+        with self._lock:
+            for digest in digests:
+                vector = self._memory.get(self._key(digest))
+                if vector is None:
+                    pending.append(digest)
+                else:
+                    self._memory.move_to_end(self._key(digest))
+                    found[digest] = vector
+
+        if pending and self.collection is not None:
+            try:
+                cursor = self.collection.find(
+                    {"_id": {"$in": [self._key(d) for d in pending]}},
+                    {"vector": 1},
+                )
+                persisted = {doc["_id"]: np.frombuffer(doc["vector"], dtype=np.float32) for doc in cursor}
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed; treating as misses: {e}")
+                persisted = {}
+            with self._lock:
+                for digest in pending:
+                    vector = persisted.get(self._key(digest))
+                    if vector is not None:
+                        found[digest] = vector
+                        self._remember(self._key(digest), vector)
+                self.persistent_hits += len(persisted)
+
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(digests) - len(found)
+        return found
+
+    def put_many(self, vectors: dict[str, list[float]]):
+        if not vectors:
+            return
+        arrays = {digest: np.asarray(v, dtype=np.float32) for digest, v in vectors.items()}
+        with self._lock:
+            for digest, vector in arrays.items():
+                self._remember(self._key(digest), vector)
+
+        if self.collection is not None:
+            try:
+                self.collection.bulk_write([
+                    UpdateOne(
+                        {"_id": self._key(digest)},
+                        {"$setOnInsert": {"model": self.model_name, "vector": vector.tobytes()}},
+                        upsert=True,
+                    )
+                    for digest, vector in arrays.items()
+                ], ordered=False)
+            except Exception as e:
+                logger.warning(f"Failed to persist {len(arrays)} embeddings to cache: {e}")
+
+
+class CachedEmbeddingClient:
+    """
+    Read-through cache in front of an EmbeddingClient. Only texts whose hash
+    is not cached are sent to the provider, each distinct text at most once.
+    """
+    def __init__(self, client: EmbeddingClient, cache: EmbeddingCache):
+        self.client = client
+        self.cache = cache
+
+    @property
+    def model_name(self) -> str:
+        return self.client.model_name
+
+    def _plan(self, texts: list[str], cached: dict[str, np.ndarray], digests: list[str]):
+        missing = {}
+        for text, digest in zip(texts, digests):
+            if digest not in cached and digest not in missing:
+                missing[digest] = text
+        return missing
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        digests = [content_hash(text) for text in texts]
+        cached = self.cache.get_many(digests)
+        missing = self._plan(texts, cached, digests)
+        if missing:
+            fresh = dict(zip(missing, self.client.embed_documents(list(missing.values()))))
+            self.cache.put_many(fresh)
+            cached.update(fresh)
+        return [_as_list(cached[digest]) for digest in digests]
+
+    async def _aembed(self, texts: list[str]) -> tuple[list[list[float]], int]:
+        digests = [content_hash(text) for text in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, digests)
+        missing = self._plan(texts, cached, digests)
+        if missing:
+            fresh = dict(zip(missing, await self.client.aembed_documents(list(missing.values()))))
+            await asyncio.to_thread(self.cache.put_many, fresh)
+            cached.update(fresh)
+        return [_as_list(cached[digest]) for digest in digests], len(missing)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors, embedded = await self._aembed(texts)
+        logger.info(f"Embedded {embedded} of {len(texts)} chunks; the rest came from cache.")
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._aembed([text]))[0][0]
+
+    async def aclose(self):
+        await self.client.aclose()
@@ -0,0 +1,81 @@
+from typing import Optional
+import numpy as np
+from bson.binary import Binary
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Fields a chunk read needs for scoring and for building the index; everything
+# else stored on a chunk stays on the server.
+CHUNK_PROJECTION = {
+    "text": 1,
+    "metadata": 1,
+    "embedding": 1,
+    "embedding_dtype": 1,
+    "embedding_scale": 1,
+    "ivf": 1,
+}
+
+# Fields needed to decode an embedding on its own, e.g. for centroid training.
+EMBEDDING_PROJECTION = {"embedding": 1, "embedding_dtype": 1, "embedding_scale": 1}
+
+
+def encode_embedding(vector, dtype: str = "float32") -> dict:
+    """
+    Packs one embedding into the chunk fields stored in MongoDB: the raw bytes as
+    BSON binary plus the dtype, and for int8 the scale that maps it back to floats.
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+
+    values = np.asarray(vector, dtype=np.float32)
+    fields = {"embedding_dtype": dtype}
+    if dtype == "int8":
+        # Symmetric per-vector quantization; cosine scores ignore the scale but
+        # it is kept so the stored vector decodes back to its original magnitude.
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        values = np.round(values / scale).astype(np.int8)
+        fields["embedding_scale"] = scale
+    else:
+        values = values.astype(STORAGE_DTYPES[dtype], copy=False)
+    fields["embedding"] = Binary(values.tobytes())
+    return fields
+
+
+def decode_embedding(chunk: dict) -> np.ndarray:
+    """
+    Returns a chunk's embedding as float32, whether it is stored packed or as a
+    legacy BSON array of floats.
+    """
+    value = chunk["embedding"]
+    if isinstance(value, list):
+        return np.asarray(value, dtype=np.float32)
+
+    vector = np.frombuffer(value, dtype=STORAGE_DTYPES[chunk.get("embedding_dtype", "float32")])
+    if chunk.get("embedding_scale") is not None:
+        return vector.astype(np.float32) * np.float32(chunk["embedding_scale"])
+    return vector.astype(np.float32, copy=False)
+
+
+def decode_embeddings(chunks: list[dict], dim: Optional[int] = None) -> np.ndarray:
+    """
+    Decodes the embeddings of chunks read from MongoDB into one float32 matrix.
+    Packed vectors are viewed with np.frombuffer and copied once, straight into
+    their row, so no intermediate Python lists are built.
+    """
+    if not chunks:
+        return np.empty((0, dim or 0), dtype=np.float32)
+
+    if dim is None:
+        dim = decode_embedding(chunks[0]).shape[0]
+    matrix = np.empty((len(chunks), dim), dtype=np.float32)
+    for i, chunk in enumerate(chunks):
+        value = chunk["embedding"]
+        if isinstance(value, list):
+            matrix[i] = value
+            continue
+        # Assigning the frombuffer view casts float16/int8 to float32 in place.
+        matrix[i] = np.frombuffer(value, dtype=STORAGE_DTYPES[chunk.get("embedding_dtype", "float32")])
+        if chunk.get("embedding_scale") is not None:
+            matrix[i] *= chunk["embedding_scale"]
+    return matrix
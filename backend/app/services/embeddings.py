@@ -0,0 +1,234 @@
+import asyncio
+import random
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Optional
+import httpx
+from loguru import logger
+from app.core.config import settings
+
+
+class EmbeddingAPIError(Exception):
+    """
+    Raised when the embedding backend returns an error response.
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+
+class EmbeddingProvider(ABC):
+    """
+    A backend that turns a single batch of texts into embedding vectors.
+    Batching, concurrency and retries are handled by EmbeddingClient.
+    """
+    model_name: str
+
+    @abstractmethod
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    @abstractmethod
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    async def aclose(self):
+        pass
+
+
+class HuggingFaceInferenceProvider(EmbeddingProvider):
+    """
+    Calls a Hugging Face feature-extraction endpoint over HTTP.
+    """
+    def __init__(self, model_name: str, api_url: str, api_token: Optional[str] = None, timeout: float = 30.0):
+        self.model_name = model_name
+        self.api_url = api_url
+        headers = {"Authorization": f"Bearer {api_token}"} if api_token else {}
+        self._client = httpx.Client(headers=headers, timeout=timeout)
+        self._async_client = httpx.AsyncClient(headers=headers, timeout=timeout)
+
+    @staticmethod
+    def _parse(response: httpx.Response, count: int) -> list[list[float]]:
+        if response.status_code != 200:
+            retry_after = response.headers.get("Retry-After")
+            raise EmbeddingAPIError(
+                f"Embedding API returned {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        try:
+            vectors = response.json()
+        except ValueError as e:
+            raise EmbeddingAPIError(f"Embedding API returned invalid JSON: {response.text[:200]}", status_code=502) from e
+        if not isinstance(vectors, list):
+            raise EmbeddingAPIError(f"Embedding API returned {type(vectors).__name__} instead of a list.", status_code=502)
+        if len(vectors) != count:
+            raise EmbeddingAPIError(f"Embedding API returned {len(vectors)} vectors for {count} texts.", status_code=502)
+        return vectors
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        try:
+            response = self._client.post(self.api_url, json={"inputs": texts})
+        except httpx.TransportError as e:
+            raise EmbeddingAPIError(f"Embedding API request failed: {e}") from e
+        return self._parse(response, len(texts))
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        try:
+            response = await self._async_client.post(self.api_url, json={"inputs": texts})
+        except httpx.TransportError as e:
+            raise EmbeddingAPIError(f"Embedding API request failed: {e}") from e
+        return self._parse(response, len(texts))
+
+    async def aclose(self):
+        self._client.close()
+        await self._async_client.aclose()
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Runs a sentence-transformers model in-process. Encoding is CPU-bound,
+    so the async path runs it in a worker thread.
+    """
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local requires the 'sentence-transformers' package."
+            ) from e
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_batch, texts)
+
+
+class EmbeddingClient:
+    """
+    Splits texts into batches and sends them to an EmbeddingProvider with
+    bounded concurrency, per-batch timeouts and exponential backoff on
+    rate limiting (429) and server errors (5xx).
+    """
+    def __init__(
+        self,
+        provider: EmbeddingProvider,
+        batch_size: int = 32,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        batch_timeout: float = 30.0,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.provider = provider
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.batch_timeout = batch_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Keyed weakly so semaphores of closed event loops are dropped with them.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        return [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+    def _backoff(self, attempt: int, error: EmbeddingAPIError) -> float:
+        if error.retry_after is not None:
+            return min(error.retry_after, self.backoff_max)
+        # Full jitter keeps concurrent batches from retrying in lockstep.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _aembed_with_retries(self, batch: list[str]) -> list[list[float]]:
+        async with self._semaphore():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await asyncio.wait_for(self.provider.aembed_batch(batch), timeout=self.batch_timeout)
+                except asyncio.TimeoutError:
+                    error = EmbeddingAPIError(f"Embedding batch timed out after {self.batch_timeout}s")
+                except EmbeddingAPIError as e:
+                    error = e
+                if not error.retryable or attempt == self.max_retries:
+                    raise error
+                delay = self._backoff(attempt, error)
+                logger.warning(f"Embedding batch failed ({error}); retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _embed_with_retries(self, batch: list[str]) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.provider.embed_batch(batch)
+            except EmbeddingAPIError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"Embedding batch failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds texts concurrently, preserving input order.
+        """
+        if not texts:
+            return []
+        results = await asyncio.gather(*(self._aembed_with_retries(batch) for batch in self._batches(texts)))
+        return [vector for batch in results for vector in batch]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._aembed_with_retries([text]))[0]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [vector for batch in self._batches(texts) for vector in self._embed_with_retries(batch)]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_with_retries([text])[0]
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+
+def create_embedding_client() -> EmbeddingClient:
+    """
+    Builds the embedding client described by the application settings.
+    """
+    if settings.EMBEDDING_PROVIDER == "local":
+        logger.info(f"Loading local embedding model {settings.EMBEDDING_MODEL}...")
+        provider = LocalEmbeddingProvider(settings.EMBEDDING_MODEL)
+    else:
+        logger.info("Initializing Hugging Face Inference API client...")
+        provider = HuggingFaceInferenceProvider(
+            model_name=settings.EMBEDDING_MODEL,
+            api_url=settings.EMBEDDING_API_URL.format(model=settings.EMBEDDING_MODEL),
+            api_token=settings.HUGGINGFACE_API_TOKEN,
+            timeout=settings.EMBEDDING_BATCH_TIMEOUT_SECONDS,
+        )
+
+    return EmbeddingClient(
+        provider,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+        max_retries=settings.EMBEDDING_MAX_RETRIES,
+        batch_timeout=settings.EMBEDDING_BATCH_TIMEOUT_SECONDS,
+    )
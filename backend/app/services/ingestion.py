@@ -0,0 +1,434 @@
+import asyncio
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Awaitable, Callable, Optional
+from loguru import logger
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.core.config import settings
+from app.core.lifecycle import LazyResource
+from app.core.metrics import INGESTION_DOCUMENTS, INGESTION_STAGE_SECONDS, Gauge
+from app.core.tracing import current_trace_id
+from app.services.pdf_loader import PDFLoader
+from app.services.revision_diff import RevisionDiff
+from app.services.vector_store import MongoVectorStore, get_vector_store
+
+
+class IngestionStage(str, Enum):
+    QUEUED = "queued"
+    PARSING = "parsing"
+    EMBEDDING = "embedding"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+@dataclass
+class IngestionJob:
+    """
+    A queued PDF ingestion and its progress.
+    """
+    document_id: str
+    user_id: str
+    filename: str
+    file_path: str
+    # Tags the chunks this job writes, so a failed run can be removed and a
+    # successful one can replace an earlier upload of the same document.
+    revision: str = field(default_factory=lambda: str(uuid.uuid4()))
+    # The trace ID of the request that queued the job, carried into the worker's log lines.
+    trace_id: Optional[str] = field(default_factory=current_trace_id)
+    # Set when the upload replaces an existing document, which is then re-ingested incrementally.
+    replace: bool = False
+    stage: IngestionStage = IngestionStage.QUEUED
+    pages_total: int = 0
+    pages_processed: int = 0
+    chunks_total: int = 0
+    chunks_stored: int = 0
+    # Chunks whose stored embedding was reused instead of calling the embedding backend.
+    chunks_reused: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in (IngestionStage.COMPLETED, IngestionStage.FAILED)
+
+    def update(self, **changes):
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self.updated_at = time.time()
+
+
+class QueueFullError(Exception):
+    """
+    Raised when the ingestion queue cannot accept more jobs.
+    """
+
+
+class DocumentBusyError(Exception):
+    """
+    Raised when a document already has an ingestion queued or running.
+    """
+
+
+class IngestionJobStore:
+    """
+    One MongoDB record per document that every web worker sees:
+    - a claim, so only one ingestion of a document is queued or running at a
+      time across processes. The worker holding it renews heartbeat_at while
+      the job is pending; a claim not renewed for stale_seconds (e.g. the
+      process died) can be taken over, and its job reads as failed;
+    - the latest job's progress, so any worker can report it.
+    """
+    # Job fields mirrored to the record.
+    PROGRESS_FIELDS = ("stage", "filename", "pages_total", "pages_processed", "chunks_total",
+                       "chunks_stored", "chunks_reused", "error", "created_at", "updated_at")
+
+    def __init__(self, collection, stale_seconds: float):
+        self.collection = collection
+        self.stale_seconds = stale_seconds
+
+    @staticmethod
+    def _id(user_id: str, document_id: str) -> str:
+        return f"{user_id}:{document_id}"
+
+    def _progress(self, job: IngestionJob) -> dict:
+        progress = {name: getattr(job, name) for name in self.PROGRESS_FIELDS}
+        progress["stage"] = job.stage.value
+        return progress
+
+    async def claim(self, job: IngestionJob):
+        """
+        Claims the job's document; raises DocumentBusyError if another job holds it.
+        """
+        now = time.time()
+        try:
+            # With a live claim the filter matches nothing, and the upsert collides on _id.
+            await self.collection.update_one(
+                {"_id": self._id(job.user_id, job.document_id),
+                 "$or": [{"active": False}, {"heartbeat_at": {"$lt": now - self.stale_seconds}}]},
+                {"$set": {"user_id": job.user_id, "document_id": job.document_id, "job_id": job.revision,
+                          "active": True, "heartbeat_at": now, **self._progress(job)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            raise DocumentBusyError("The document is still being processed.")
+
+    async def release(self, job: IngestionJob):
+        """
+        Records the job's final state and gives up its claim.
+        """
+        await self.collection.update_one(
+            {"_id": self._id(job.user_id, job.document_id), "job_id": job.revision},
+            {"$set": {"active": False, **self._progress(job)}},
+        )
+
+    async def save(self, jobs: list[IngestionJob]):
+        """
+        Records the progress of pending jobs and renews their claims.
+        """
+        now = time.time()
+        if jobs:
+            await self.collection.bulk_write([
+                UpdateOne({"_id": self._id(job.user_id, job.document_id), "job_id": job.revision, "active": True},
+                          {"$set": {"heartbeat_at": now, **self._progress(job)}})
+                for job in jobs
+            ], ordered=False)
+
+    async def get(self, user_id: str, document_id: str) -> Optional[IngestionJob]:
+        record = await self.collection.find_one({"_id": self._id(user_id, document_id)})
+        if record is None:
+            return None
+        job = IngestionJob(document_id=document_id, user_id=user_id, file_path="", revision=record["job_id"],
+                           trace_id=None, **{name: record[name] for name in self.PROGRESS_FIELDS})
+        job.stage = IngestionStage(job.stage)
+        # Released unfinished (its worker shut down) or no longer renewed (its process died).
+        if not job.finished and (not record["active"] or record["heartbeat_at"] < time.time() - self.stale_seconds):
+            job.stage, job.error = IngestionStage.FAILED, "Ingestion was interrupted before it finished."
+        return job
+
+    async def forget(self, user_id: str, document_id: str):
+        await self.collection.delete_one({"_id": self._id(user_id, document_id), "active": False})
+
+
+class IngestionQueue(ABC):
+    """
+    Interface for queues that run PDF ingestion outside the request cycle.
+    """
+    @abstractmethod
+    async def enqueue(self, job: IngestionJob):
+        ...
+
+    @abstractmethod
+    async def get(self, user_id: str, document_id: str) -> Optional[IngestionJob]:
+        """
+        Returns the latest ingestion job of a document, or None if none is known.
+        """
+
+    @abstractmethod
+    async def forget(self, user_id: str, document_id: str):
+        """
+        Drops the finished jobs of a deleted document.
+        """
+
+
+class LocalIngestionQueue(IngestionQueue):
+    """
+    In-process queue served by a fixed pool of asyncio workers, so at most
+    max_concurrency documents are ingested at once. Workers start on the first
+    enqueue. Job state lives in memory. With a job_store, a document is
+    claimed there for as long as its job is pending, so other processes do
+    not ingest it at the same time, and its progress is mirrored there every
+    sync_interval seconds, so any process can report it.
+    """
+    sync_interval = 1.0
+
+    def __init__(self, process: Callable[[IngestionJob], Awaitable[None]],
+                 max_concurrency: int = 2, max_size: int = 100, max_finished_jobs: int = 1000,
+                 job_store: Optional[IngestionJobStore] = None):
+        self.process = process
+        self.max_concurrency = max_concurrency
+        self.max_size = max_size
+        self.max_finished_jobs = max_finished_jobs
+        self.job_store = job_store
+        # Keyed by (user_id, document_id): document ids are only unique per user.
+        self._jobs: "OrderedDict[tuple[str, str], IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._sync: Optional[asyncio.Task] = None
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+        if self.job_store is not None and (self._sync is None or self._sync.done()):
+            self._sync = asyncio.create_task(self._sync_jobs())
+
+    async def enqueue(self, job: IngestionJob):
+        """
+        Queues a job; raises DocumentBusyError if its document already has a
+        pending job, and QueueFullError if the queue is full.
+        """
+        self._ensure_workers()
+        current = self._jobs.get((job.user_id, job.document_id))
+        if current is not None and not current.finished:
+            raise DocumentBusyError("The document is still being processed.")
+        if self.job_store is not None:
+            await self.job_store.claim(job)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await self._release(job)
+            raise QueueFullError("The ingestion queue is full. Please retry later.")
+        self._jobs[(job.user_id, job.document_id)] = job
+        self._prune()
+        logger.info(f"Queued ingestion of document {job.document_id} ({self._queue.qsize()} waiting)")
+
+    async def get(self, user_id: str, document_id: str) -> Optional[IngestionJob]:
+        job = self._jobs.get((user_id, document_id))
+        # A newer job of the document may be pending in another process.
+        if (job is None or job.finished) and self.job_store is not None:
+            return await self.job_store.get(user_id, document_id) or job
+        return job
+
+    async def forget(self, user_id: str, document_id: str):
+        job = self._jobs.get((user_id, document_id))
+        if job is not None and job.finished:
+            del self._jobs[(user_id, document_id)]
+        if self.job_store is not None:
+            await self.job_store.forget(user_id, document_id)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _prune(self):
+        finished = [key for key, job in self._jobs.items() if job.finished]
+        for key in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[key]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                with logger.contextualize(trace_id=job.trace_id or "-"):
+                    await self.process(job)
+                INGESTION_DOCUMENTS.inc(outcome="completed")
+            except Exception as e:
+                INGESTION_DOCUMENTS.inc(outcome="failed")
+                logger.error(f"Ingestion of document {job.document_id} failed: {e}")
+                job.update(stage=IngestionStage.FAILED, error=str(e))
+            finally:
+                await self._release(job)
+                self._queue.task_done()
+                self._prune()
+
+    async def _release(self, job: IngestionJob):
+        if self.job_store is None:
+            return
+        try:
+            await self.job_store.release(job)
+        except Exception as e:
+            # The claim lapses on its own once it is no longer renewed.
+            logger.error(f"Could not release the claim on document {job.document_id}: {e}")
+
+    async def _sync_jobs(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.job_store.save([job for job in list(self._jobs.values()) if not job.finished])
+            except Exception as e:
+                logger.warning(f"Could not record ingestion progress: {e}")
+
+    def stage_counts(self) -> dict[str, int]:
+        counts = {stage.value: 0 for stage in IngestionStage}
+        for job in list(self._jobs.values()):
+            counts[job.stage.value] += 1
+        return counts
+
+    async def shutdown(self):
+        tasks = self._workers + ([self._sync] if self._sync is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._sync = None
+
+
+class IngestionPipeline:
+    """
+    Parses, chunks, embeds and stores a spooled PDF, reporting progress on the job.
+    """
+    # Chunks are embedded and written in batches so progress is visible on large documents.
+    store_batch_size = 256
+
+    def __init__(self, vector_store: MongoVectorStore):
+        self.vector_store = vector_store
+
+    async def run(self, job: IngestionJob):
+        committed = False
+        try:
+            job.update(stage=IngestionStage.PARSING)
+            pdf_loader = PDFLoader()
+            texts, chunk_ids = [], []
+            if job.replace:
+                await self.vector_store.arecover_revisions(job.user_id, job.document_id)
+            diff = None
+            if job.replace and settings.INCREMENTAL_REINGESTION:
+                stored = await self.vector_store.aget_document_chunks(job.user_id, job.document_id)
+                diff = RevisionDiff(stored, self.vector_store.embedding_model.model_name)
+            # A full replace is written next to the stored revision, hidden until it is complete.
+            hidden = job.replace and diff is None
+            if hidden:
+                await self.vector_store.ahide_revision(job.user_id, job.document_id, job.revision)
+
+            # Chunks are embedded (and, for new documents, stored) while later pages are still being parsed.
+            async for documents, pages_processed in pdf_loader.astream_chunks(job.file_path, batch_size=self.store_batch_size):
+                job.update(
+                    stage=IngestionStage.EMBEDDING,
+                    pages_total=pdf_loader.page_count,
+                    pages_processed=pages_processed,
+                    chunks_total=job.chunks_total + len(documents),
+                )
+                if diff is None:
+                    await self.vector_store.aadd_documents(
+                        documents=documents,
+                        user_id=job.user_id,
+                        document_id=job.document_id,
+                        start_index=job.chunks_stored,
+                        revision=job.revision,
+                        hidden=hidden,
+                    )
+                    job.update(chunks_stored=job.chunks_stored + len(documents))
+                else:
+                    await self._diff_batch(job, diff, documents)
+                texts.extend(doc.page_content for doc in documents)
+                chunk_ids.extend(doc.metadata["chunk_index"] for doc in documents)
+
+            if not job.chunks_total:
+                raise ValueError("No text could be extracted from the PDF.")
+
+            if diff is None:
+                await self._save_keyword_index(job, texts, chunk_ids, hidden)
+                if hidden:
+                    # The new revision is complete: switch readers to it and drop the one it replaces.
+                    await self.vector_store.apublish_revision(job.user_id, job.document_id, job.revision)
+            elif diff.changed:
+                await self.vector_store.aapply_revision(job.user_id, job.document_id, diff, texts, chunk_ids, job.revision)
+            committed = True
+            job.update(
+                stage=IngestionStage.COMPLETED,
+                pages_total=pdf_loader.page_count,
+                pages_processed=pdf_loader.page_count,
+                chunks_stored=job.chunks_total,
+            )
+            logger.success(f"Successfully processed and stored document {job.document_id} for user {job.user_id}")
+        except (Exception, asyncio.CancelledError):
+            # Also on cancellation (shutdown), so no half-written revision is left behind.
+            if not committed:
+                await self._discard_revision(job)
+            raise
+        finally:
+            if os.path.exists(job.file_path):
+                os.remove(job.file_path)
+                logger.info(f"Cleaned up temporary file: {job.file_path}")
+
+
+    async def _diff_batch(self, job: IngestionJob, diff: RevisionDiff, documents: list):
+        # Only text the stored revision does not already have goes to the embedding backend.
+        new_documents = diff.add(documents)
+        if new_documents:
+            with INGESTION_STAGE_SECONDS.time(stage="embed"):
+                embeddings = await self.vector_store.embedding_model.aembed_documents(
+                    [doc.page_content for doc in new_documents]
+                )
+            diff.add_embeddings(embeddings)
+        job.update(chunks_reused=diff.reused)
+
+    async def _save_keyword_index(self, job: IngestionJob, texts: list[str], chunk_ids: list[int], hidden: bool):
+        # Retrieval can rebuild a missing keyword index from the chunks, so this is best effort.
+        try:
+            await self.vector_store.asave_keyword_index(
+                job.user_id, job.document_id, texts, chunk_ids, job.revision, hidden=hidden
+            )
+        except Exception as e:
+            logger.warning(f"Could not store the keyword index of document {job.document_id}: {e}")
+
+    async def _discard_revision(self, job: IngestionJob):
+        # A failed run must not leave a partial set of chunks behind.
+        try:
+            await self.vector_store.adelete_document(job.user_id, job.document_id, revision=job.revision)
+        except Exception as e:
+            logger.error(f"Could not remove partial chunks of document {job.document_id}: {e}")
+
+
+_ingestion_queue = LazyResource(
+    "ingestion queue",
+    lambda: LocalIngestionQueue(
+        process=IngestionPipeline(get_vector_store()).run,
+        max_concurrency=settings.INGESTION_MAX_CONCURRENCY,
+        max_size=settings.INGESTION_QUEUE_MAX_SIZE,
+        job_store=IngestionJobStore(
+            get_vector_store().async_db.get_collection("ingestion_jobs"), settings.INGESTION_JOB_STALE_SECONDS
+        ),
+    ),
+    close=lambda queue: queue.shutdown(),
+)
+
+def get_ingestion_queue() -> IngestionQueue:
+    return _ingestion_queue.get()
+
+Gauge("ingestion_queue_pending", "Uploads waiting for an ingestion worker.", callback=lambda: (
+    [({}, _ingestion_queue.get().pending)] if _ingestion_queue.initialized else []
+))
+Gauge("ingestion_jobs", "Tracked ingestion jobs by stage, finished ones included.", ["stage"], callback=lambda: (
+    [({"stage": stage}, count) for stage, count in _ingestion_queue.get().stage_counts().items()]
+    if _ingestion_queue.initialized else []
+))
@@ -0,0 +1,138 @@
+import re
+from collections import Counter
+from typing import Hashable, Iterable, Optional
+import numpy as np
+from bson.binary import Binary
+from app.services.vector_index import _top_k
+
+# Identifiers such as "AB-1234", "7.3.2" or "E_404" are kept whole, and their
+# alphanumeric parts are indexed as well so "1234" still matches.
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_PATTERN.findall(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one document. Postings are stored CSR-style:
+    term t's chunk positions and term frequencies are postings[offsets[t]:offsets[t + 1]]
+    and frequencies[...], so the index is a handful of flat NumPy arrays.
+    """
+    def __init__(self, terms: list[str], offsets: np.ndarray, postings: np.ndarray, frequencies: np.ndarray,
+                 doc_lengths: np.ndarray, chunk_ids: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.frequencies = frequencies
+        self.doc_lengths = doc_lengths
+        self.chunk_ids = chunk_ids
+        self.k1 = k1
+        self.b = b
+
+        count = len(doc_lengths)
+        document_frequency = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((count - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        average_length = float(doc_lengths.mean()) if count else 0.0
+        self.length_norm = (k1 * (1 - b + b * doc_lengths / (average_length or 1.0))).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str], chunk_ids: Iterable[int], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        vocabulary: dict[str, int] = {}
+        term_postings: list[list[int]] = []
+        term_frequencies: list[list[int]] = []
+        doc_lengths = []
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                if term_id == len(term_postings):
+                    term_postings.append([])
+                    term_frequencies.append([])
+                term_postings[term_id].append(position)
+                term_frequencies[term_id].append(frequency)
+
+        lengths = np.fromiter((len(p) for p in term_postings), dtype=np.int64, count=len(term_postings))
+        offsets = np.zeros(len(term_postings) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        postings = np.fromiter((p for plist in term_postings for p in plist), dtype=np.int32, count=int(offsets[-1]))
+        frequencies = np.fromiter((f for flist in term_frequencies for f in flist), dtype=np.int64, count=int(offsets[-1]))
+        return cls(
+            list(vocabulary), offsets, postings, np.minimum(frequencies, 65535).astype(np.uint16),
+            np.asarray(doc_lengths, dtype=np.int32), np.fromiter(chunk_ids, dtype=np.int32), k1, b,
+        )
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.offsets, self.postings, self.frequencies, self.doc_lengths, self.chunk_ids, self.idf, self.length_norm)
+        return sum(a.nbytes for a in arrays) + sum(len(term) + 50 for term in self.terms)
+
+    def search(self, query: str, k: int) -> list[tuple[int, float]]:
+        """
+        Returns the top-k (chunk_index, BM25 score) pairs, best first.
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids or k <= 0:
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term_id in term_ids:
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            positions = self.postings[start:stop]
+            tf = self.frequencies[start:stop].astype(np.float32)
+            # A term's postings hold each chunk at most once, so fancy-index add is safe.
+            scores[positions] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[positions])
+
+        matched = np.flatnonzero(scores)
+        top = matched[_top_k(scores[matched], k)]
+        return [(int(self.chunk_ids[i]), float(scores[i])) for i in top]
+
+    def to_record(self) -> dict:
+        """
+        Serializes the index into fields of a MongoDB document.
+        """
+        return {
+            "terms": " ".join(self.terms),
+            "offsets": Binary(self.offsets.tobytes()),
+            "postings": Binary(self.postings.tobytes()),
+            "frequencies": Binary(self.frequencies.tobytes()),
+            "doc_lengths": Binary(self.doc_lengths.tobytes()),
+            "chunk_ids": Binary(self.chunk_ids.tobytes()),
+        }
+
+    @classmethod
+    def from_record(cls, record: dict, k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        return cls(
+            record["terms"].split(" ") if record["terms"] else [],
+            np.frombuffer(record["offsets"], dtype=np.int64),
+            np.frombuffer(record["postings"], dtype=np.int32),
+            np.frombuffer(record["frequencies"], dtype=np.uint16),
+            np.frombuffer(record["doc_lengths"], dtype=np.int32),
+            np.frombuffer(record["chunk_ids"], dtype=np.int32),
+            k1, b,
+        )
+
+
+def reciprocal_rank_fusion(rankings: list[list[Hashable]], k: int = 60, limit: Optional[int] = None) -> list[tuple[Hashable, float]]:
+    """
+    Fuses ranked lists of ids: each id scores sum(1 / (k + rank)) over the
+    lists it appears in. Returns (id, fused score) pairs, best first.
+    """
+    fused: dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return ordered[:limit] if limit is not None else ordered
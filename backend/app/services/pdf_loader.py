@@ -1,16 +1,161 @@
+import asyncio
+import multiprocessing
 import tempfile
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator
 from fastapi import UploadFile
-from langchain_community.document_loaders import PyMuPDFLoader
+from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from loguru import logger
+from app.core.config import settings
+from app.core.lifecycle import LazyResource
+from app.core.metrics import INGESTION_STAGE_SECONDS
+from app.core.scaling import cpu_count, per_worker
+from app.services.pdf_pages import count_pages, extract_pages
+
+def parser_worker_count() -> int:
+    return settings.PDF_PARSE_WORKERS or per_worker(cpu_count())
+
+# Workers are spawned rather than forked, since forking a threaded server is unsafe.
+_parser_pool = LazyResource(
+    "PDF parser pool",
+    lambda: ProcessPoolExecutor(max_workers=parser_worker_count(), mp_context=multiprocessing.get_context("spawn")),
+    close=lambda pool: pool.shutdown(wait=False, cancel_futures=True),
+)
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    """
+    Returns the shared process pool used for page extraction, creating it on first use.
+    """
+    return _parser_pool.get()
+
 
 class PDFLoader:
     """
     Handles loading and chunking of a PDF file.
     """
-    def __init__(self, upload_file: UploadFile):
+    # Size of the reads used to spool uploads to disk.
+    spool_chunk_size = 1024 * 1024
+
+    def __init__(self, upload_file: UploadFile = None):
         self.upload_file = upload_file
+        self.page_count = 0
+        # start_index records each chunk's offset within its page, which lets
+        # the context builder stitch overlapping neighbours back together.
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            add_start_index=True,
+        )
+
+    @classmethod
+    async def save_upload(cls, upload_file: UploadFile) -> str:
+        """
+        Streams an uploaded file to a temporary path that outlives the request,
+        without holding the whole file in memory. The caller is responsible for removing it.
+        """
+        with INGESTION_STAGE_SECONDS.time(stage="temp_write"):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+                tmp_path = tmp.name
+                try:
+                    await upload_file.seek(0)
+                    while chunk := await upload_file.read(cls.spool_chunk_size):
+                        tmp.write(chunk)
+                except BaseException:
+                    # A failed or cancelled spool leaves nothing behind for the caller to clean up.
+                    tmp.close()
+                    os.remove(tmp_path)
+                    raise
+
+        logger.info(f"PDF temporarily saved to {tmp_path}")
+        return tmp_path
+
+    def load_and_chunk_file(self, file_path: str) -> list:
+        """
+        Loads a PDF from disk using PyMuPDFLoader and splits it into smaller text chunks.
+        All pages are held in memory at once; prefer astream_chunks for large files.
+        """
+        from langchain_community.document_loaders import PyMuPDFLoader
+
+        # Load the document using the file path
+        loader = PyMuPDFLoader(file_path)
+        documents = loader.load()
+        self.page_count = len(documents)
+
+        # Split the document into chunks
+        chunked_documents = self.text_splitter.split_documents(documents)
+
+        logger.info(f"Successfully loaded and split PDF into {len(chunked_documents)} chunks.")
+        return chunked_documents
+
+    def iter_pages(self, file_path: str) -> Iterator[list[Document]]:
+        """
+        Yields the chunks of each page in page order. Page text is extracted in
+        the parser process pool, a batch of pages per task, so only the batches
+        in flight are held in memory.
+        """
+        self.page_count = count_pages(file_path)
+        step = settings.PDF_PAGES_PER_TASK
+        starts = range(0, self.page_count, step)
+        pool = get_parser_pool()
+
+        # Keep a bounded window of tasks in flight so results never pile up faster than they are consumed.
+        window = parser_worker_count() * 2
+        pending = [pool.submit(extract_pages, file_path, start, start + step) for start in starts[:window]]
+        next_start = window
+        while pending:
+            with INGESTION_STAGE_SECONDS.time(stage="parse"):
+                pages = pending.pop(0).result()
+            if next_start < len(starts):
+                pending.append(pool.submit(extract_pages, file_path, starts[next_start], starts[next_start] + step))
+                next_start += 1
+            for number, text in pages:
+                page = Document(page_content=text, metadata={
+                    "source": file_path,
+                    "file_path": file_path,
+                    "page": number,
+                    "total_pages": self.page_count,
+                })
+                with INGESTION_STAGE_SECONDS.time(stage="chunk"):
+                    chunks = self.text_splitter.split_documents([page])
+                yield chunks
+
+    async def astream_chunks(self, file_path: str, batch_size: int = 64, prefetch: int = 2) -> AsyncIterator[tuple[list[Document], int]]:
+        """
+        Yields (chunks, pages parsed so far) in batches of about batch_size chunks.
+        Parsing runs ahead of the consumer by up to `prefetch` batches, so embedding
+        can start before the last page has been parsed.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=prefetch)
+        done = object()
+
+        def next_batch(pages: Iterator[list[Document]], state: dict):
+            batch = []
+            for page_chunks in pages:
+                batch.extend(page_chunks)
+                state["pages"] += 1
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        async def produce():
+            pages, state = self.iter_pages(file_path), {"pages": 0}
+            try:
+                while batch := await asyncio.to_thread(next_batch, pages, state):
+                    await queue.put((batch, state["pages"]))
+                await queue.put(done)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await queue.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
 
     async def load_and_chunk(self) -> list:
         """
@@ -18,27 +163,8 @@ class PDFLoader:
         and splits it into smaller text chunks.
         """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-                await self.upload_file.seek(0)
-                content = await self.upload_file.read()
-                tmp.write(content)
-                tmp_path = tmp.name
-            
-            logger.info(f"PDF temporarily saved to {tmp_path}")
-
-            # Load the document using the temporary file path
-            loader = PyMuPDFLoader(tmp_path)
-            documents = loader.load()
-
-            # Split the document into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-            )
-            chunked_documents = text_splitter.split_documents(documents)
-            
-            logger.info(f"Successfully loaded and split PDF into {len(chunked_documents)} chunks.")
-            return chunked_documents
+            tmp_path = await self.save_upload(self.upload_file)
+            return self.load_and_chunk_file(tmp_path)
 
         except Exception as e:
             logger.error(f"Failed to load and chunk PDF: {e}")
@@ -48,4 +174,3 @@ class PDFLoader:
             if 'tmp_path' in locals() and os.path.exists(tmp_path):
                 os.remove(tmp_path)
                 logger.info(f"Cleaned up temporary file: {tmp_path}")
-
@@ -0,0 +1,19 @@
+"""
+Page text extraction run inside parser worker processes.
+
+Kept free of application imports so spawned workers start quickly.
+"""
+import fitz
+
+
+def count_pages(file_path: str) -> int:
+    with fitz.open(file_path) as pdf:
+        return pdf.page_count
+
+
+def extract_pages(file_path: str, start: int, stop: int) -> list[tuple[int, str]]:
+    """
+    Returns (page number, text) for pages [start, stop) of the PDF.
+    """
+    with fitz.open(file_path) as pdf:
+        return [(number, pdf[number].get_text()) for number in range(start, min(stop, pdf.page_count))]
@@ -1,29 +1,115 @@
+import asyncio
 import logging
+import time
+from typing import Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.services.vector_store import vector_store
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from app.core.lifecycle import LazyResource
+from app.core.metrics import CHAT_STAGE_SECONDS, register_cache
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.context_builder import ContextBuilder
+from app.services.vector_store import get_vector_store
 from app.core.config import settings
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+PROMPT_TEMPLATE = """
+        You are a helpful assistant specialized in answering questions based on the provided document context.
+        Your answers should be concise, accurate, and directly based on the information given.
+        Do not make up information. If the answer is not in the context, say "I couldn't find the answer in the provided document."
+
+        CONTEXT:
+        {context}
+
+        QUESTION:
+        {question}
+
+        ANSWER:
+        """
+
 def format_docs(docs):
     """Helper function to format retrieved documents into a single string."""
     return "\n\n".join(doc.page_content for doc in docs)
 
+class LLMTimingCallback(BaseCallbackHandler):
+    """
+    Records LLM time into chat_stage_seconds: "llm_first_token" when the
+    first token arrives (at the end of the call when nothing is streamed)
+    and "llm" when the call ends. One instance serves all runs.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._runs: dict[UUID, list] = {}
+
+    def _start(self, run_id: UUID):
+        self._runs[run_id] = [time.perf_counter(), False]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and not run[1]:
+            run[1] = True
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - run[0], stage="llm_first_token")
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            elapsed = time.perf_counter() - run[0]
+            if not run[1]:
+                CHAT_STAGE_SECONDS.observe(elapsed, stage="llm_first_token")
+            CHAT_STAGE_SECONDS.observe(elapsed, stage="llm")
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        self._runs.pop(run_id, None)
+
+
 class RAGPipeline:
     """
     A class to encapsulate the RAG pipeline logic.
+
+    The prompt and runnable graph are built once; answer_chain is the part
+    after retrieval, taking {"question", "docs"}. Each call supplies
+    {"question", "user_id", "document_id", "k", "query_embedding"} as input
+    and gets back the same dict plus "docs" (the retrieved chunks) and "answer".
+    aanswer and astream consult the semantic answer cache first.
     """
-    def __init__(self):
+    def __init__(self, llm=None, vector_store=None, answer_cache=None):
         logger.info("Initializing RAG pipeline...")
-        self.vector_store = vector_store
-        self.llm = self._init_llm()
+        self.vector_store = vector_store if vector_store is not None else get_vector_store()
+        self.llm = llm if llm is not None else self._init_llm()
+        if answer_cache is None and settings.ANSWER_CACHE_ENABLED:
+            answer_cache = SemanticAnswerCache(
+                threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                max_entries_per_document=settings.ANSWER_CACHE_MAX_ENTRIES_PER_DOCUMENT,
+                max_documents=settings.ANSWER_CACHE_MAX_DOCUMENTS,
+            )
+        self.answer_cache = answer_cache
+        if self.answer_cache is not None:
+            self.vector_store.change_listeners.append(self.answer_cache.invalidate)
+        self.context_builder = ContextBuilder(
+            token_budget=settings.CONTEXT_TOKEN_BUDGET,
+            duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD,
+        )
+        self.prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        self.chain = self._build_chain()
+        self.run_config = {"callbacks": [LLMTimingCallback()]}
 
     def _init_llm(self):
         try:
+            # Imported here: the Gemini client library is slow to import and only needed once.
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
             return ChatGoogleGenerativeAI(
                 model="gemini-1.5-flash",
                 google_api_key=settings.GOOGLE_GEMINI_API_KEY,
@@ -34,35 +120,232 @@ class RAGPipeline:
             logger.exception("Failed to initialize GoogleGenerativeAI. Check API key and dependencies.")
             raise
 
-    def _create_rag_chain(self, retriever):
-        prompt_template = """
-        You are a helpful assistant specialized in answering questions based on the provided document context.
-        Your answers should be concise, accurate, and directly based on the information given.
-        Do not make up information. If the answer is not in the context, say "I couldn't find the answer in the provided document."
+    def _retrieve(self, inputs: dict):
+        return self.vector_store.similarity_search(
+            inputs["question"],
+            user_id=inputs["user_id"],
+            document_id=inputs.get("document_id"),
+            k=inputs.get("k") or settings.RETRIEVAL_TOP_K,
+            query_embedding=inputs.get("query_embedding"),
+        )
 
-        CONTEXT:
-        {context}
+    async def _aretrieve(self, inputs: dict):
+        return await self.vector_store.asimilarity_search(
+            inputs["question"],
+            user_id=inputs["user_id"],
+            document_id=inputs.get("document_id"),
+            k=inputs.get("k") or settings.RETRIEVAL_TOP_K,
+            query_embedding=inputs.get("query_embedding"),
+        )
 
-        QUESTION:
-        {question}
+    def _build_chain(self):
+        self.answer_chain = (
+            RunnablePassthrough.assign(context=lambda inputs: self.context_builder.build(inputs["docs"]))
+            | self.prompt
+            | self.llm
+            | StrOutputParser()
+        )
+        # Retrieval runs as its own step so the retrieved docs come out first,
+        # ahead of the answer tokens, when the chain is streamed.
+        return (
+            RunnablePassthrough.assign(docs=RunnableLambda(self._retrieve, afunc=self._aretrieve))
+            .assign(answer=self.answer_chain)
+        )
 
-        ANSWER:
+    @staticmethod
+    def build_input(question: str, user_id: str, document_id: str = None, k: int = None, query_embedding=None) -> dict:
+        return {"question": question, "user_id": user_id, "document_id": document_id, "k": k, "query_embedding": query_embedding}
+
+    async def _prepare(self, question: str, user_id: str, document_id: str = None, k: int = None):
+        """
+        Embeds the question once, for both the cache lookup and retrieval,
+        and returns (chain input, cached answer or None, cache generation).
         """
-        prompt = ChatPromptTemplate.from_template(prompt_template)
+        with CHAT_STAGE_SECONDS.time(stage="query_embedding"):
+            query_embedding = await self.vector_store.embedding_model.aembed_query(question)
+        inputs = self.build_input(question, user_id, document_id, k, query_embedding)
+        if self.answer_cache is None:
+            return inputs, None, None
 
-        rag_chain = (
-        {"context": lambda docs: format_docs(retriever(docs)), "question": RunnablePassthrough()}
-        | prompt
-        | self.llm
-        | StrOutputParser()
-        )
-        return rag_chain
+        # Another worker may have changed the document since answers were cached.
+        self.vector_store.sync_document(user_id, document_id)
+        generation = self.answer_cache.generation(user_id)
+        cached = self.answer_cache.lookup(user_id, document_id, query_embedding)
+        if cached is not None:
+            logger.info(f"Answer cache hit for doc {document_id} (similarity {cached.similarity:.3f})")
+        return inputs, cached, generation
+
+    def _remember(self, inputs: dict, docs, answer: str, generation):
+        if self.answer_cache is not None and docs and answer:
+            self.answer_cache.store(
+                inputs["user_id"], inputs["document_id"], inputs["query_embedding"],
+                inputs["question"], answer, docs, generation=generation,
+            )
+
+    async def aanswer(self, question: str, user_id: str, document_id: str = None, k: int = None) -> dict:
+        """
+        Answers one question; returns the chain output with "docs" and "answer".
+        """
+        with CHAT_STAGE_SECONDS.time(stage="total"):
+            inputs, cached, generation = await self._prepare(question, user_id, document_id, k)
+            if cached is not None:
+                return {**inputs, "docs": cached.docs, "answer": cached.answer}
+
+            result = await self.chain.ainvoke(inputs, config=self.run_config)
+            self._remember(inputs, result["docs"], result["answer"], generation)
+            return result
+
+    async def abatch(self, inputs: list[dict]) -> list[dict]:
+        """
+        Answers several questions concurrently, at most RAG_MAX_CONCURRENCY at a time.
+        Each input is a dict as produced by build_input.
+        """
+        return await self.chain.abatch(inputs, config={**self.run_config, "max_concurrency": settings.RAG_MAX_CONCURRENCY})
+
+    async def astream(self, question: str, user_id: str, document_id: str = None, k: int = None):
+        """
+        Streams chain output chunks: the inputs, then {"docs": [...]}, then
+        {"answer": <token>} pieces as the LLM generates them.
+        """
+        with CHAT_STAGE_SECONDS.time(stage="total"):
+            inputs, cached, generation = await self._prepare(question, user_id, document_id, k)
+            if cached is not None:
+                yield {"docs": cached.docs}
+                yield {"answer": cached.answer}
+                return
+
+            docs, answer = None, []
+            async for chunk in self.chain.astream(inputs, config=self.run_config):
+                if "docs" in chunk:
+                    docs = chunk["docs"]
+                if chunk.get("answer"):
+                    answer.append(chunk["answer"])
+                yield chunk
+            self._remember(inputs, docs, "".join(answer), generation)
+
+    def _lookup_batch(self, user_id: str, document_id: str, query_embeddings) -> tuple[list, Optional[int]]:
+        """
+        Returns the cached answer or None for each query about a document, and
+        the cache generation to store new answers under.
+        """
+        if self.answer_cache is None:
+            return [None] * len(query_embeddings), None
+
+        # Another worker may have changed the document since answers were cached.
+        self.vector_store.sync_document(user_id, document_id)
+        generation = self.answer_cache.generation(user_id)
+        return [self.answer_cache.lookup(user_id, document_id, e) for e in query_embeddings], generation
+
+    async def _answer_retrieved(self, inputs: dict, docs, generation: Optional[int]) -> dict:
+        """
+        Answers one batch item whose chunks were already retrieved. Failures
+        are reported in the result rather than raised, so one bad item does
+        not end the batch.
+        """
+        result = {"document_id": inputs["document_id"], "question": inputs["question"]}
+        try:
+            answer = await self.answer_chain.ainvoke({"question": inputs["question"], "docs": docs}, config=self.run_config)
+            self._remember(inputs, docs, answer, generation)
+            return {**result, "docs": docs, "answer": answer, "cached": False}
+        except Exception as e:
+            logger.error(f"Batch item failed for doc {inputs['document_id']}: {e}")
+            return {**result, "error": "An internal error occurred while answering this question."}
+
+    async def astream_batch(self, questions: list[str], user_id: str, document_ids: list[str], k: int = None):
+        """
+        Answers every question about every document, yielding one result dict
+        per (document, question) pair as it completes, so results arrive in
+        completion order rather than request order.
+
+        All questions are embedded in one call, each document is searched for
+        all of them at once, and at most RAG_MAX_CONCURRENCY LLM calls run at a
+        time. Retrieval runs ahead of the LLM workers only as far as a small
+        queue allows, so memory stays bounded however large the batch is.
+        """
+        k = k or settings.RETRIEVAL_TOP_K
+        with CHAT_STAGE_SECONDS.time(stage="query_embedding"):
+            query_embeddings = await self.vector_store.embedding_model.aembed_documents(questions)
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=settings.RAG_MAX_CONCURRENCY * 2)
+        results: asyncio.Queue = asyncio.Queue()
+        workers = settings.RAG_MAX_CONCURRENCY
+
+        async def retrieve():
+            try:
+                for document_id in document_ids:
+                    # Cached answers are returned without retrieval; only the misses are searched.
+                    cached, generation = self._lookup_batch(user_id, document_id, query_embeddings)
+                    misses = []
+                    for question, query_embedding, hit in zip(questions, query_embeddings, cached):
+                        if hit is None:
+                            misses.append((question, query_embedding))
+                        else:
+                            await results.put({
+                                "document_id": document_id, "question": question,
+                                "docs": hit.docs, "answer": hit.answer, "cached": True,
+                            })
+                    if not misses:
+                        continue
+
+                    try:
+                        retrieved = await self.vector_store.abatch_similarity_search(
+                            [q for q, _ in misses], [e for _, e in misses], user_id, document_id, k
+                        )
+                    except Exception as e:
+                        logger.error(f"Batch retrieval failed for doc {document_id}: {e}")
+                        retrieved, error = None, "An internal error occurred while searching this document."
+                    else:
+                        error = "Document not found or has no content."
+                    if retrieved is None:
+                        for question, _ in misses:
+                            await results.put({"document_id": document_id, "question": question, "error": error})
+                        continue
+                    for (question, query_embedding), docs in zip(misses, retrieved):
+                        inputs = self.build_input(question, user_id, document_id, k, query_embedding)
+                        await jobs.put((inputs, docs, generation))
+            finally:
+                for _ in range(workers):
+                    await jobs.put(None)
+
+        async def answer():
+            try:
+                while (job := await jobs.get()) is not None:
+                    await results.put(await self._answer_retrieved(*job))
+            finally:
+                await results.put(None)
+
+        tasks = [asyncio.create_task(retrieve())] + [asyncio.create_task(answer()) for _ in range(workers)]
+        try:
+            finished = 0
+            while finished < workers:
+                result = await results.get()
+                if result is None:
+                    finished += 1
+                else:
+                    yield result
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
 
     def invoke(self, query: str, document_id: str, user_id: str):
         """
         Invokes the RAG pipeline for a given query and document.
         """
         logger.info(f"Invoking RAG pipeline for user {user_id} and doc {document_id}")
-        retriever = self.vector_store.get_retriever(document_id=document_id)
-        rag_chain = self._create_rag_chain(retriever)
-        return rag_chain.invoke(query)
\ No newline at end of file
+        return self.chain.invoke(self.build_input(query, user_id, document_id))["answer"]
+
+
+_rag_pipeline = LazyResource("RAG pipeline", RAGPipeline)
+
+def _answer_cache_stats():
+    if not _rag_pipeline.initialized or _rag_pipeline.get().answer_cache is None:
+        return None
+    return _rag_pipeline.get().answer_cache.stats()
+
+register_cache("answers", _answer_cache_stats)
+
+def get_rag_pipeline() -> RAGPipeline:
+    """
+    Returns the shared RAG pipeline, building it (and the LLM client) on first use.
+    """
+    return _rag_pipeline.get()
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from typing import Optional
+from langchain.docstore.document import Document
+from app.services.embedding_cache import content_hash
+
+# Metadata that places a chunk in its document.
+POSITION_FIELDS = ("page", "start_index", "chunk_index")
+
+
+def _position(metadata: dict) -> tuple:
+    return tuple(metadata.get(name) for name in POSITION_FIELDS)
+
+
+class RevisionDiff:
+    """
+    Matches the chunks of a re-uploaded PDF, as they are parsed, against the
+    stored chunks of the document it replaces. A new chunk whose text is
+    already stored reuses that stored chunk, embedding included:
+    - Kept: the stored chunk is in the same position and stays as it is.
+    - Shifted: the stored chunk only moved because chunks or pages before it
+      were added or removed. Shifts with the same offsets are applied
+      together as one $inc.
+    - Moved: the stored chunk's position fields are set individually.
+    New text is embedded and inserted. Only chunks embedded with the current
+    model are matched; older ones are replaced. Stored chunks nothing matched
+    are removed when the revision is applied. placements records every reused
+    chunk's new position, for writing the revision as copies instead.
+    """
+    def __init__(self, stored_chunks: list[dict], model_name: str):
+        self._stored: dict[str, list[dict]] = defaultdict(list)
+        self.removed_ids = set()
+        self._stored_total_pages = None
+        for chunk in stored_chunks:
+            self.removed_ids.add(chunk["_id"])
+            self._stored_total_pages = chunk["metadata"].get("total_pages")
+            if chunk.get("embedding_model") == model_name:
+                self._stored[content_hash(chunk["text"])].append(chunk)
+        self.documents: list[Document] = []
+        self.embeddings: list[list[float]] = []
+        # (chunk_index offset, page offset) -> stored chunk _ids shifted by it.
+        self.shifts: dict[tuple[int, int], list] = defaultdict(list)
+        # (stored chunk _id, position fields to set) for chunks that moved otherwise.
+        self.moves: list[tuple[object, dict]] = []
+        # Stored chunk _id -> its position fields in the new revision, for every reused chunk.
+        self.placements: dict[object, dict] = {}
+        self.total_pages = None
+        self.chunk_count = 0
+        self.kept = 0
+
+    def add(self, documents: list[Document]) -> list[Document]:
+        """
+        Numbers the next chunks of the upload and matches them. Returns the
+        ones with new text, which still need embedding; pass their vectors to add_embeddings.
+        """
+        new_documents = []
+        for doc in documents:
+            doc.metadata["chunk_index"] = self.chunk_count
+            self.chunk_count += 1
+            self.total_pages = doc.metadata.get("total_pages")
+            candidates = self._stored.get(content_hash(doc.page_content))
+            if not candidates:
+                new_documents.append(doc)
+                continue
+
+            position = _position(doc.metadata)
+            # Prefer a copy already in place, so repeated text (headers, footers) does not shuffle.
+            stored = next((c for c in candidates if _position(c["metadata"]) == position), candidates[0])
+            candidates.remove(stored)
+            self.removed_ids.discard(stored["_id"])
+            self._reuse(stored, doc.metadata)
+        self.documents.extend(new_documents)
+        return new_documents
+
+    def _reuse(self, stored: dict, metadata: dict):
+        page, start_index, chunk_index = _position(stored["metadata"])
+        new_page, new_start_index, new_chunk_index = _position(metadata)
+        self.placements[stored["_id"]] = {name: metadata.get(name) for name in POSITION_FIELDS}
+        if (page, start_index, chunk_index) == (new_page, new_start_index, new_chunk_index):
+            self.kept += 1
+        elif start_index == new_start_index and None not in (page, chunk_index, new_page):
+            self.shifts[(new_chunk_index - chunk_index, new_page - page)].append(stored["_id"])
+        else:
+            self.moves.append((stored["_id"], {f"metadata.{name}": metadata.get(name) for name in POSITION_FIELDS}))
+
+    def add_embeddings(self, embeddings: list[list[float]]):
+        self.embeddings.extend(embeddings)
+
+    @property
+    def new_total_pages(self) -> Optional[int]:
+        """
+        The page count to record on every chunk, if it changed.
+        """
+        return self.total_pages if self.total_pages != self._stored_total_pages else None
+
+    @property
+    def reused(self) -> int:
+        return self.kept + len(self.moves) + sum(len(ids) for ids in self.shifts.values())
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.documents or self.shifts or self.moves or self.removed_ids or self.new_total_pages is not None)
@@ -0,0 +1,170 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+import numpy as np
+from loguru import logger
+
+
+# Upper bound on the .npy header written before a matrix's data.
+NPY_HEADER_BYTES = 4096
+
+
+def _digest(parts: Iterable) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SharedIndexStore:
+    """
+    State shared by the web workers on one machine, kept as files in one
+    directory (ideally tmpfs, e.g. /dev/shm):
+    - Embedding matrices. A worker that builds an exact index publishes its
+      normalized matrix as an .npy file; the others memory-map it instead of
+      decoding the embeddings again, so a hot document's vectors
+      sit in memory once per machine rather than once per worker. Stored
+      embeddings never change, so a matrix is named after the ordered _ids
+      of its chunks and is never stale, only unused.
+    - Change versions. A worker that changes a document writes a new version
+      token for it; the others compare tokens before using what they cached.
+      Tokens read are reused for version_ttl seconds, so requests do not
+      each read a file, and other workers see a change that much later.
+
+    Files are replaced atomically with os.replace, so readers never see a
+    partial write. Matrices are pruned, least recently used first, once
+    together they exceed max_bytes; a worker still mapping a pruned file
+    keeps its copy until it lets the index go.
+    """
+    version_ttl = 0.5
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.matrix_dir = os.path.join(directory, "matrices")
+        self.version_dir = os.path.join(directory, "versions")
+        os.makedirs(self.matrix_dir, exist_ok=True)
+        os.makedirs(self.version_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # (user_id, document_id) -> (token, monotonic time it was read).
+        self._versions: dict[tuple, tuple[Optional[str], float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _write(self, directory: str, name: str, write):
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # --- Change versions ---
+
+    def _version_path(self, user_id: str, document_id: Optional[str]) -> str:
+        return os.path.join(self.version_dir, _digest([user_id, document_id or ""]))
+
+    def version(self, user_id: str, document_id: Optional[str]) -> Optional[str]:
+        """
+        Returns the current version token of a document, or of all of a
+        user's documents when document_id is None; None if never changed.
+        """
+        key, now = (user_id, document_id), time.monotonic()
+        cached = self._versions.get(key)
+        if cached is not None and now - cached[1] < self.version_ttl:
+            return cached[0]
+        try:
+            with open(self._version_path(user_id, document_id)) as f:
+                token = f.read()
+        except FileNotFoundError:
+            token = None
+        self._versions[key] = (token, now)
+        return token
+
+    def bump(self, user_id: str, document_id: Optional[str]) -> str:
+        token = uuid.uuid4().hex
+        self._write(self.version_dir, os.path.basename(self._version_path(user_id, document_id)),
+                    lambda f: f.write(token.encode()))
+        self._versions[(user_id, document_id)] = (token, time.monotonic())
+        return token
+
+    # --- Embedding matrices ---
+
+    def _matrix_path(self, chunk_ids: list) -> str:
+        return os.path.join(self.matrix_dir, f"{_digest(chunk_ids)}.npy")
+
+    def load_matrix(self, chunk_ids: list) -> Optional[np.ndarray]:
+        """
+        Memory-maps the published matrix for exactly these chunks, in this
+        order, or returns None if no worker has published it.
+        """
+        path = self._matrix_path(chunk_ids)
+        try:
+            # A plain ndarray view of the map, so results are not np.memmap too.
+            matrix = np.asarray(np.load(path, mmap_mode="r"))
+            # Marks it recently used for pruning.
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            matrix = None
+        with self._lock:
+            if matrix is None or matrix.shape[0] != len(chunk_ids):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return matrix
+
+    def save_matrix(self, chunk_ids: list, matrix: np.ndarray) -> np.ndarray:
+        """
+        Publishes a normalized matrix for these chunks and returns it mapped
+        from the shared file, so this worker shares the pages too. Returns the
+        matrix unchanged if it cannot be written, or if it is larger than
+        max_bytes or the free space left in the directory.
+        """
+        path = self._matrix_path(chunk_ids)
+        try:
+            # Checked first: filling tmpfs takes memory from every process on the machine.
+            needed = matrix.nbytes + NPY_HEADER_BYTES
+            if needed > min(self.max_bytes, shutil.disk_usage(self.matrix_dir).free):
+                logger.warning(f"Not publishing a {needed / 2**20:.1f} MB embedding matrix: "
+                               f"it exceeds the shared index cap or the free space in {self.matrix_dir}.")
+                return matrix
+            self._write(self.matrix_dir, os.path.basename(path), lambda f: np.save(f, matrix))
+            self._prune(keep=path)
+            return np.asarray(np.load(path, mmap_mode="r"))
+        except OSError as e:
+            logger.warning(f"Could not publish a shared embedding matrix: {e}")
+            return matrix
+
+    def _prune(self, keep: str):
+        entries = []
+        for entry in os.scandir(self.matrix_dir):
+            try:
+                if entry.name.endswith(".npy") and entry.path != keep:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -1,13 +1,321 @@
+import asyncio
+import hashlib
 import logging
-from typing import List
-from langchain.chains.summarize import load_summarize_chain
+import threading
+import weakref
+from collections import OrderedDict
+from typing import List, Optional
 from langchain.docstore.document import Document
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from pymongo import UpdateOne
 from ..core.config import settings
+from ..core.lifecycle import LazyResource
+from ..core.metrics import register_cache
+from .embedding_cache import content_hash
+from .tokens import estimate_tokens
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+MAP_PROMPT_TEMPLATE = """
+        Write a concise summary of the following excerpt from a document.
+        Keep names, figures, dates and identifiers exactly as written.
+
+        EXCERPT:
+        {text}
+
+        CONCISE SUMMARY:
+        """
+
+REDUCE_PROMPT_TEMPLATE = """
+        The following are summaries of consecutive parts of one document, in order.
+        Combine them into a single coherent summary that keeps the key facts.
+
+        SUMMARIES:
+        {text}
+
+        COMBINED SUMMARY:
+        """
+
+# Bump when a prompt changes so summaries cached under the old one are not reused.
+PROMPT_VERSION = "1"
+
+
+class SummaryCache:
+    """
+    Summaries keyed by (model, prompt version, step, content hash): an
+    in-process LRU in front of an optional persistent MongoDB collection.
+    """
+    def __init__(self, model_name: str, collection=None, max_entries: int = 10_000):
+        self.model_name = model_name
+        self.collection = collection
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, step: str, digest: str) -> str:
+        return f"{self.model_name}:{PROMPT_VERSION}:{step}:{digest}"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def _remember(self, key: str, summary: str):
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, keys: list[str]) -> dict[str, str]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+        pending = [key for key in keys if key not in found]
+        if pending and self.collection is not None:
+            try:
+                async for doc in self.collection.find({"_id": {"$in": pending}}, {"summary": 1}):
+                    found[doc["_id"]] = doc["summary"]
+            except Exception as e:
+                logger.warning(f"Summary cache lookup failed; treating as misses: {e}")
+
+        with self._lock:
+            for key in pending:
+                if key in found:
+                    self._remember(key, found[key])
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, summaries: dict[str, str]):
+        if not summaries:
+            return
+        with self._lock:
+            for key, summary in summaries.items():
+                self._remember(key, summary)
+
+        if self.collection is not None:
+            try:
+                await self.collection.bulk_write([
+                    UpdateOne({"_id": key}, {"$set": {"summary": summary}}, upsert=True)
+                    for key, summary in summaries.items()
+                ], ordered=False)
+            except Exception as e:
+                logger.warning(f"Failed to persist {len(summaries)} summaries to cache: {e}")
+
+
+class SummarizationEngine:
+    """
+    Map-reduce summarizer. Chunks are summarized (map) with bounded
+    concurrency, then the summaries are merged (reduce) in groups that fit a
+    token budget, level by level, until one summary remains.
+
+    Every map and reduce output is cached by the hash of its input, so
+    re-summarizing a revised document only calls the LLM for changed chunks
+    and for the reduce groups that contain them.
+    """
+    def __init__(self, llm=None, cache: Optional[SummaryCache] = None):
+        self.llm = llm if llm is not None else self._init_llm()
+        model_name = getattr(self.llm, "model", None) or type(self.llm).__name__
+        self.cache = cache if cache is not None else SummaryCache(model_name, max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES)
+        self.map_chain = ChatPromptTemplate.from_template(MAP_PROMPT_TEMPLATE) | self.llm | StrOutputParser()
+        self.reduce_chain = ChatPromptTemplate.from_template(REDUCE_PROMPT_TEMPLATE) | self.llm | StrOutputParser()
+        # One limit on LLM calls shared by every summary this engine runs, per event loop.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _init_llm(self):
+        try:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(
+                model=settings.SUMMARY_MODEL,
+                google_api_key=settings.GOOGLE_GEMINI_API_KEY,
+                temperature=0.1
+            )
+        except Exception:
+            logger.exception("Failed to initialize GoogleGenerativeAI. Check API key and dependencies.")
+            raise
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(settings.SUMMARY_MAX_CONCURRENCY)
+        return semaphore
+
+    async def _run_cached(self, chain, step: str, texts: list[str]) -> list[str]:
+        """
+        Runs chain over texts, reusing cached outputs. Missing inputs are
+        generated concurrently within the engine's limit of
+        SUMMARY_MAX_CONCURRENCY calls, which concurrent summaries share, and
+        outputs are cached as they finish (persisted SUMMARY_MAP_BATCH_SIZE at
+        a time), so a failure keeps the work already done.
+        """
+        keys = [self.cache.key(step, content_hash(text)) for text in texts]
+        results = await self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys((key, text) for key, text in zip(keys, texts) if key not in results))
+        logger.info(f"{step}: {len(texts) - len(missing)} of {len(texts)} inputs cached, {len(missing)} to generate.")
+        if not missing:
+            return [results[key] for key in keys]
+
+        semaphore = self._semaphore()
+
+        async def generate(key: str, text: str) -> tuple[str, str]:
+            async with semaphore:
+                return key, (await chain.ainvoke({"text": text})).strip()
+
+        tasks = [asyncio.ensure_future(generate(key, text)) for key, text in missing]
+        fresh = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, output = await next_done
+                fresh[key] = results[key] = output
+                if len(fresh) >= settings.SUMMARY_MAP_BATCH_SIZE:
+                    await self.cache.put_many(fresh)
+                    fresh = {}
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # On failure, also keep outputs that finished but were not collected yet.
+            for task in tasks:
+                if not task.cancelled() and task.exception() is None:
+                    key, output = task.result()
+                    if key not in results:
+                        fresh[key] = output
+            await self.cache.put_many(fresh)
+        return [results[key] for key in keys]
+
+    @staticmethod
+    def split_to_budget(summary: str, token_budget: int) -> list[str]:
+        """
+        Splits a summary into consecutive pieces within the estimated token
+        budget, at whitespace where possible.
+        """
+        max_chars = max(1, (token_budget - 1) * 4)
+        pieces = []
+        while estimate_tokens(summary) > token_budget:
+            cut = max(summary.rfind(" ", 0, max_chars), summary.rfind("\n", 0, max_chars))
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(summary[:cut])
+            summary = summary[cut:].lstrip()
+        pieces.append(summary)
+        return pieces
+
+    @classmethod
+    def group_by_budget(cls, summaries: list[str], token_budget: int) -> list[list[str]]:
+        """
+        Splits consecutive summaries into groups whose estimated size fits the
+        budget. Summaries over half the budget are split first, so any two fit
+        together and every group but the last holds at least two, which keeps
+        each reduce level shrinking.
+        """
+        half_budget = max(1, token_budget // 2)
+        groups, current, used = [], [], 0
+        for summary in summaries:
+            for piece in cls.split_to_budget(summary, half_budget):
+                tokens = estimate_tokens(piece)
+                if current and used + tokens > token_budget:
+                    groups.append(current)
+                    current, used = [], 0
+                current.append(piece)
+                used += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    async def summarize(self, texts: list[str]) -> str:
+        """
+        Summarizes a document given its chunk texts in reading order.
+        """
+        if not texts:
+            return "The document is empty and cannot be summarized."
+
+        summaries = await self._run_cached(self.map_chain, "map", texts)
+        level = 0
+        while len(summaries) > 1:
+            level += 1
+            groups = self.group_by_budget(summaries, settings.SUMMARY_REDUCE_TOKEN_BUDGET)
+            if len(groups) >= len(summaries):
+                # Only partial summaries longer than half the budget can cause this; stop before looping.
+                raise RuntimeError("Partial summaries are too long to merge within SUMMARY_REDUCE_TOKEN_BUDGET.")
+            logger.info(f"Reduce level {level}: {len(summaries)} summaries in {len(groups)} groups.")
+            summaries = await self._run_cached(self.reduce_chain, "reduce", ["\n\n".join(group) for group in groups])
+        return summaries[0]
+
+
+class DocumentSummaryService:
+    """
+    Serves whole-document summaries. A finished summary is stored per
+    (user_id, document_id) together with a fingerprint of the chunks it was
+    built from, and reused until the chunks change. Concurrent requests for
+    the same document share one summarization.
+    """
+    def __init__(self, engine: SummarizationEngine, collection=None):
+        self.engine = engine
+        self.collection = collection
+        self._inflight: dict[tuple, asyncio.Future] = {}
+
+    @staticmethod
+    def fingerprint(texts: list[str]) -> str:
+        digest = hashlib.sha256(f"{PROMPT_VERSION}:{settings.SUMMARY_REDUCE_TOKEN_BUDGET}".encode())
+        for text in texts:
+            digest.update(content_hash(text).encode())
+        return digest.hexdigest()
+
+    async def forget(self, user_id: str, document_id: str):
+        if self.collection is not None:
+            await self.collection.delete_one({"_id": f"{user_id}:{document_id}"})
+
+    async def get_summary(self, user_id: str, document_id: str, texts: list[str]) -> tuple[str, bool]:
+        """
+        Returns (summary, served_from_cache) for a document's chunk texts.
+        """
+        fingerprint = self.fingerprint(texts)
+        record_id = f"{user_id}:{document_id}"
+        if self.collection is not None:
+            record = await self.collection.find_one({"_id": record_id, "fingerprint": fingerprint})
+            if record is not None:
+                return record["summary"], True
+
+        key = (user_id, document_id, fingerprint)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending), False
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            summary = await self.engine.summarize(texts)
+            if self.collection is not None:
+                await self.collection.replace_one(
+                    {"_id": record_id},
+                    {"_id": record_id, "user_id": user_id, "document_id": document_id,
+                     "fingerprint": fingerprint, "summary": summary},
+                    upsert=True,
+                )
+            future.set_result(summary)
+            return summary, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+
 async def summarize_document(documents: List[Document]) -> str:
     """
     Generates a summary for a list of document chunks.
@@ -18,29 +326,40 @@ async def summarize_document(documents: List[Document]) -> str:
     Returns:
         A string containing the summary.
     """
-
     if not documents:
         logger.warning("Summarization called with no documents.")
         return "The document is empty and cannot be summarized."
 
     logger.info(f"Starting summarization for a document with {len(documents)} chunks.")
-    
     try:
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            google_api_key=settings.GOOGLE_GEMINI_API_KEY,
-            temperature=0.1
-        )
-
-        # "map_reduce" is efficient for large documents. It summarizes each chunk (map)
-        # and then combines the summaries into a final summary (reduce).
-        summary_chain = load_summarize_chain(llm, chain_type="map_reduce")
-        
-        summary = await summary_chain.arun(documents)
-        
+        summary = await get_summary_service().engine.summarize([doc.page_content for doc in documents])
         logger.info("Summarization completed successfully.")
         return summary
-
-    except Exception as e:
+    except Exception:
         logger.exception("An error occurred during document summarization.")
         raise
+
+
+def _create_summary_service() -> DocumentSummaryService:
+    from .vector_store import get_vector_store
+
+    async_db = get_vector_store().async_db
+    engine = SummarizationEngine(cache=SummaryCache(
+        settings.SUMMARY_MODEL,
+        collection=async_db.get_collection("chunk_summaries"),
+        max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+    ))
+    return DocumentSummaryService(engine, async_db.get_collection("document_summaries"))
+
+
+_summary_service = LazyResource("summary service", _create_summary_service)
+register_cache(
+    "summaries",
+    lambda: _summary_service.get().engine.cache.stats() if _summary_service.initialized else None,
+)
+
+def get_summary_service() -> DocumentSummaryService:
+    """
+    Returns the shared summary service, creating it (and the LLM client) on first use.
+    """
+    return _summary_service.get()
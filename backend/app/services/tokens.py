@@ -0,0 +1,6 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (about four characters per token for English text),
+    used for budgeting prompts without a tokenizer round trip.
+    """
+    return len(text) // 4 + 1
@@ -0,0 +1,330 @@
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+import numpy as np
+from langchain.docstore.document import Document
+from loguru import logger
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    """
+    Returns a contiguous float32 copy of the embeddings with L2-normalized rows.
+    """
+    matrix = np.array(embeddings, dtype=np.float32, order="C", ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _normalize_query(query_embedding) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    return query / query_norm if query_norm else query
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the positions of the k highest scores, best first.
+    """
+    k = min(k, scores.shape[0])
+    if k < scores.shape[0]:
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(scores[top])[::-1]]
+
+
+class VectorIndexBackend(ABC):
+    """
+    Interface for in-memory similarity indexes over a set of document chunks.
+    Indexes are immutable once built; extended() returns a new index so that
+    concurrent searches never observe a half-updated structure.
+    """
+    documents: list[Document]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def chunk_lookup(self) -> dict:
+        """
+        Maps each chunk's metadata['chunk_index'] (its position here, for chunks
+        stored without one) to the chunk. Built once per index.
+        """
+        lookup = getattr(self, "_chunk_lookup", None)
+        if lookup is None:
+            lookup = self._chunk_lookup = {
+                doc.metadata.get("chunk_index", i): doc for i, doc in enumerate(self.documents)
+            }
+        return lookup
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        ...
+
+    @abstractmethod
+    def search(self, query_embedding, k: int) -> list[tuple[Document, float]]:
+        """
+        Returns the top-k (document, cosine similarity) pairs, best first.
+        """
+
+    def search_batch(self, query_embeddings, k: int) -> list[list[tuple[Document, float]]]:
+        """
+        Runs search for each query embedding; backends that can score all
+        queries at once override this.
+        """
+        return [self.search(query_embedding, k) for query_embedding in query_embeddings]
+
+    @abstractmethod
+    def extended(self, embeddings, documents: list[Document]) -> "VectorIndexBackend":
+        """
+        Returns a new index containing this index's chunks plus the given ones.
+        """
+
+
+class ExactIndex(VectorIndexBackend):
+    """
+    Exact similarity index. Embeddings are held as one contiguous float32 matrix
+    with L2-normalized rows, so a query is scored with a single matrix-vector product.
+    """
+    def __init__(self, embeddings, documents: list[Document]):
+        matrix = normalize_rows(embeddings) if len(documents) else np.empty((0, 0), dtype=np.float32)
+        if matrix.shape[0] != len(documents):
+            raise ValueError("Embeddings must be a 2D array with one row per document chunk.")
+
+        self.matrix = matrix
+        self.documents = documents
+
+    @classmethod
+    def from_normalized(cls, matrix: np.ndarray, documents: list[Document]) -> "ExactIndex":
+        """
+        Wraps a matrix whose rows are already L2-normalized without copying it,
+        e.g. a read-only memory map shared with other workers.
+        """
+        if matrix.ndim != 2 or matrix.shape[0] != len(documents):
+            raise ValueError("Embeddings must be a 2D array with one row per document chunk.")
+        index = cls.__new__(cls)
+        index.matrix = matrix
+        index.documents = documents
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes
+
+    def search(self, query_embedding, k: int) -> list[tuple[Document, float]]:
+        if not self.documents or k <= 0:
+            return []
+
+        scores = self.matrix @ _normalize_query(query_embedding)
+        return [(self.documents[i], float(scores[i])) for i in _top_k(scores, k)]
+
+    def search_batch(self, query_embeddings, k: int) -> list[list[tuple[Document, float]]]:
+        """
+        Scores every query against the matrix with one matrix-matrix product.
+        """
+        if not self.documents or k <= 0 or not len(query_embeddings):
+            return [[] for _ in query_embeddings]
+
+        scores = normalize_rows(query_embeddings) @ self.matrix.T
+        return [
+            [(self.documents[i], float(row[i])) for i in _top_k(row, k)]
+            for row in scores
+        ]
+
+    def extended(self, embeddings, documents: list[Document]) -> "ExactIndex":
+        if not len(self.documents):
+            return ExactIndex(embeddings, documents)
+        index = ExactIndex.__new__(ExactIndex)
+        index.matrix = np.concatenate([self.matrix, normalize_rows(embeddings)])
+        index.documents = self.documents + documents
+        return index
+
+
+# Centroid training looks at no more than this many rows per list.
+TRAINING_ROWS_PER_LIST = 64
+
+
+def train_ivf_centroids(matrix: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Trains IVF coarse centroids with spherical k-means on normalized rows.
+    Training uses a bounded sample so cost does not grow with the collection.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = max(1, min(nlist, matrix.shape[0]))
+    sample_size = min(matrix.shape[0], nlist * TRAINING_ROWS_PER_LIST)
+    sample = matrix[rng.choice(matrix.shape[0], sample_size, replace=False)]
+
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        members = np.unique(assignments[order], return_index=True)
+        sums = centroids.copy()  # empty lists keep their previous centroid
+        sums[members[0]] = np.add.reduceat(sample[order], members[1], axis=0)
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_to_centroids(embeddings, centroids: np.ndarray) -> np.ndarray:
+    """
+    Returns the nearest centroid for each row of embeddings.
+    """
+    return np.argmax(normalize_rows(embeddings) @ centroids.T, axis=1).astype(np.int32)
+
+
+def default_nlist(count: int) -> int:
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+class IVFFlatIndex(VectorIndexBackend):
+    """
+    Approximate inverted-file index. Chunks are bucketed by their nearest
+    centroid, and a query only scores the chunks in its nprobe closest buckets.
+    """
+    def __init__(self, embeddings, documents: list[Document], centroids: np.ndarray,
+                 assignments: Optional[np.ndarray] = None, nprobe: int = 16):
+        matrix = normalize_rows(embeddings)
+        if matrix.shape[0] != len(documents):
+            raise ValueError("Embeddings must be a 2D array with one row per document chunk.")
+
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        if assignments is None:
+            assignments = self.assign(matrix)
+        self._build(matrix, documents, np.asarray(assignments, dtype=np.int32))
+
+    def _build(self, matrix: np.ndarray, documents: list[Document], assignments: np.ndarray):
+        # Rows are stored grouped by list so each probe scores one contiguous slice.
+        order = np.argsort(assignments, kind="stable")
+        self.matrix = np.ascontiguousarray(matrix[order])
+        self.documents = [documents[i] for i in order]
+        self.assignments = assignments[order]
+        self.offsets = np.searchsorted(self.assignments, np.arange(len(self.centroids) + 1))
+
+    def assign(self, embeddings) -> np.ndarray:
+        return assign_to_centroids(embeddings, self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + self.centroids.nbytes + self.assignments.nbytes
+
+    def search(self, query_embedding, k: int) -> list[tuple[Document, float]]:
+        if not self.documents or k <= 0:
+            return []
+
+        query = _normalize_query(query_embedding)
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        rows = np.concatenate([np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes])
+        if not rows.size:
+            return []
+
+        scores = self.matrix[rows] @ query
+        return [(self.documents[rows[i]], float(scores[i])) for i in _top_k(scores, k)]
+
+    def extended(self, embeddings, documents: list[Document]) -> "IVFFlatIndex":
+        matrix = normalize_rows(embeddings)
+        index = IVFFlatIndex.__new__(IVFFlatIndex)
+        index.centroids = self.centroids
+        index.nprobe = self.nprobe
+        index._build(
+            np.concatenate([self.matrix, matrix]),
+            self.documents + documents,
+            np.concatenate([self.assignments, index.assign(matrix)]),
+        )
+        return index
+
+
+class VectorIndexCache:
+    """
+    Thread-safe LRU cache of document indexes, bounded by the total size
+    of their embedding matrices.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._indexes: "OrderedDict[Hashable, VectorIndexBackend]" = OrderedDict()
+        self._size = 0
+        self._generations: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._indexes),
+            "bytes": self._size,
+        }
+
+    def get(self, key: Hashable) -> Optional[VectorIndexBackend]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return index
+
+    def generation(self, key: Hashable) -> int:
+        """
+        Returns the invalidation counter for a key. Read it before loading the
+        data for an index and pass it to put() so a stale build is discarded.
+        """
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def put(self, key: Hashable, index: VectorIndexBackend, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                logger.info(f"Discarding stale vector index for {key}.")
+                return
+            self._put_locked(key, index)
+
+    def _put_locked(self, key: Hashable, index: VectorIndexBackend):
+        previous = self._indexes.pop(key, None)
+        if previous is not None:
+            self._size -= previous.nbytes
+
+        if index.nbytes > self.max_bytes:
+            logger.warning(f"Index for {key} ({index.nbytes} bytes) exceeds the cache budget; not caching.")
+            return
+
+        self._indexes[key] = index
+        self._size += index.nbytes
+        while self._size > self.max_bytes:
+            evicted_key, evicted = self._indexes.popitem(last=False)
+            self._size -= evicted.nbytes
+            logger.info(f"Evicted vector index for {evicted_key} from cache.")
+
+    def update(self, key: Hashable, fn: Callable[[VectorIndexBackend], VectorIndexBackend]):
+        """
+        Atomically replaces a cached index with fn(index), invalidating any
+        build of the key that is still in flight. Missing keys are left missing.
+        """
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            index = self._indexes.get(key)
+            if index is not None:
+                self._put_locked(key, fn(index))
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            index = self._indexes.pop(key, None)
+            if index is not None:
+                self._size -= index.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._size = 0
@@ -1,8 +1,34 @@
-from pymongo import MongoClient
-# --- THE FIX: Import the class with the correct name ---
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import ConfigurationError, DuplicateKeyError, OperationFailure
 from langchain.docstore.document import Document
 from app.core.config import settings
+from app.core.database import CHUNK_COLLECTION_NAME, DATABASE_NAME, mongo_client_options
+from app.core.lifecycle import LazyResource
+from app.core.metrics import CHAT_STAGE_SECONDS, INGESTION_STAGE_SECONDS, Gauge, register_cache
+from app.core.scaling import cpu_count, per_worker
+from app.services.embedding_codec import CHUNK_PROJECTION, EMBEDDING_PROJECTION, decode_embeddings, encode_embedding
+from app.services.embeddings import create_embedding_client
+from app.services.embedding_cache import CachedEmbeddingClient, EmbeddingCache
+from app.services.keyword_index import BM25Index, reciprocal_rank_fusion
+from app.services.revision_diff import RevisionDiff
+from app.services.shared_index import SharedIndexStore
+from app.services.vector_index import (
+    TRAINING_ROWS_PER_LIST,
+    ExactIndex,
+    IVFFlatIndex,
+    VectorIndexBackend,
+    VectorIndexCache,
+    assign_to_centroids,
+    default_nlist,
+    normalize_rows,
+    train_ivf_centroids,
+)
 from loguru import logger
 import numpy as np
 
@@ -10,31 +36,82 @@ class MongoVectorStore:
     """
     Manages storing and retrieving document embeddings from MongoDB using
     the Hugging Face Inference API for embeddings.
+
+    The a-prefixed methods are the request path: they use the Motor client and
+    run index builds and scoring on a thread pool, so the event loop is never
+    blocked. The sync methods remain for scripts and background threads.
     """
-    def __init__(self):
+    def __init__(self, client: Optional[MongoClient] = None, async_client: Optional[AsyncIOMotorClient] = None):
         try:
-            self.client = MongoClient(settings.MONGO_CONNECTION_STRING)
-            self.db = self.client.get_database("chat_with_pdf_db")
-            self.collection = self.db.get_collection("document_embeddings_hf")
-
-            # --- CRITICAL CHANGE: Use the corrected class name here ---
-            logger.info("Initializing Hugging Face Inference API client...")
-            self.embedding_model = HuggingFaceEndpointEmbeddings(
-                huggingfacehub_api_token=settings.HUGGINGFACE_API_TOKEN,
-                model="sentence-transformers/all-MiniLM-L6-v2"
+            self.client = client or MongoClient(settings.MONGO_CONNECTION_STRING, **mongo_client_options())
+            self.db = self.client.get_database(DATABASE_NAME)
+            self.collection = self.db.get_collection(CHUNK_COLLECTION_NAME)
+            self.ann_collection = self.db.get_collection("vector_indexes")
+            self.keyword_collection = self.db.get_collection("keyword_indexes")
+            self.revision_collection = self.db.get_collection("revision_states")
+
+            self.async_client = async_client or AsyncIOMotorClient(settings.MONGO_CONNECTION_STRING, **mongo_client_options("async"))
+            self.async_db = self.async_client.get_database(DATABASE_NAME)
+            self.async_collection = self.async_db.get_collection(CHUNK_COLLECTION_NAME)
+            self.async_ann_collection = self.async_db.get_collection("vector_indexes")
+            self.async_keyword_collection = self.async_db.get_collection("keyword_indexes")
+            self.async_revision_collection = self.async_db.get_collection("revision_states")
+
+            self.index_cache = VectorIndexCache(max_bytes=settings.VECTOR_INDEX_CACHE_MB * 1024 * 1024)
+            self.keyword_cache = VectorIndexCache(max_bytes=settings.KEYWORD_INDEX_CACHE_MB * 1024 * 1024)
+            self.search_executor = ThreadPoolExecutor(
+                max_workers=settings.VECTOR_SEARCH_THREADS or per_worker(cpu_count(), minimum=2),
+                thread_name_prefix="vector-search",
             )
-            
-            logger.success("Successfully connected to MongoDB and initialized Hugging Face embedding client.")
+            # In-flight async index builds, so concurrent misses on one key share a single load.
+            self._index_builds: dict[tuple, asyncio.Future] = {}
+            # Callbacks run with (user_id, document_id) whenever a document's chunks change;
+            # document_id is None when another worker changed some of the user's documents.
+            self.change_listeners: list[Callable[[str, Optional[str]], None]] = []
+            # Matrices and change versions shared with the other web workers, if configured.
+            self.shared_index = SharedIndexStore(
+                settings.SHARED_INDEX_DIR, settings.SHARED_INDEX_MAX_MB * 1024 * 1024
+            ) if settings.SHARED_INDEX_DIR else None
+            # Shared version tokens this process has caught up with, by (user_id, document_id).
+            self._seen_versions: dict[tuple, Optional[str]] = {}
+            # Whether the deployment runs multi-document transactions; None until first tried.
+            self._transactions_supported: Optional[bool] = None
+
+            embedding_client = create_embedding_client()
+            self.embedding_cache = EmbeddingCache(
+                model_name=embedding_client.model_name,
+                collection=self.db.get_collection("embedding_cache") if settings.EMBEDDING_CACHE_PERSISTENT else None,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            )
+            self.embedding_model = CachedEmbeddingClient(embedding_client, self.embedding_cache)
+
+            logger.success("Successfully connected to MongoDB and initialized the embedding client.")
         except Exception as e:
             logger.error(f"Failed to initialize MongoVectorStore: {e}")
             raise
 
-    # The rest of the file remains exactly the same.
-    # The add_documents and get_retriever methods will work perfectly.
+    async def aping(self):
+        """
+        Round-trips to MongoDB; raises if the server cannot be reached.
+        """
+        await self.async_client.admin.command("ping")
+
+    async def aclose(self):
+        """
+        Closes the embedding client and both MongoDB connection pools, and
+        stops the search threads.
+        """
+        await self.embedding_model.aclose()
+        self.async_client.close()
+        self.client.close()
+        self.search_executor.shutdown(wait=False, cancel_futures=True)
 
-    def add_documents(self, documents: list[Document], user_id: str, document_id: str):
+    def add_documents(self, documents: list[Document], user_id: str, document_id: str,
+                      start_index: int = 0, revision: Optional[str] = None):
         """
         Embeds document chunks via API call and adds them to the vector store.
+        Chunks are numbered from start_index in metadata['chunk_index']; pass
+        revision to tag them so a replace can later prune the previous revision.
         """
         try:
             texts_to_embed = [doc.page_content for doc in documents]
@@ -43,71 +120,1024 @@ class MongoVectorStore:
                 return
 
             embeddings = self.embedding_model.embed_documents(texts_to_embed)
+            self._store_embedded(documents, embeddings, user_id, document_id, start_index, revision)
+        except Exception as e:
+            logger.error(f"Error adding documents to vector store: {e}")
+            raise
 
-            docs_to_insert = []
-            for i, doc in enumerate(documents):
-                doc.metadata["user_id"] = user_id
-                doc.metadata["document_id"] = document_id
-                docs_to_insert.append({
-                    "text": doc.page_content,
-                    "embedding": embeddings[i],
-                    "metadata": doc.metadata
-                })
-
-            if docs_to_insert:
-                self.collection.insert_many(docs_to_insert)
+    async def aadd_documents(self, documents: list[Document], user_id: str, document_id: str,
+                             start_index: int = 0, revision: Optional[str] = None, hidden: bool = False):
+        """
+        Async variant of add_documents. Embedding batches are sent concurrently,
+        chunks are written through Motor, and IVF assignment and index updates
+        run on the search thread pool. Pass hidden for a revision registered
+        with ahide_revision, whose chunks must not reach the cached indexes yet.
+        """
+        try:
+            texts_to_embed = [doc.page_content for doc in documents]
+            if not texts_to_embed:
+                logger.warning("No text found in documents to embed.")
+                return
 
-            logger.success(f"All {len(documents)} chunks have been successfully embedded and stored.")
+            with INGESTION_STAGE_SECONDS.time(stage="embed"):
+                embeddings = await self.embedding_model.aembed_documents(texts_to_embed)
+            with INGESTION_STAGE_SECONDS.time(stage="store"):
+                await self._astore_embedded(documents, embeddings, user_id, document_id, start_index, revision, hidden)
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {e}")
             raise
 
-    def get_retriever(self, user_id: str, document_id: str, k: int = 5):
+    async def _run_in_executor(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.search_executor, partial(fn, *args, **kwargs))
+
+    def _store_embedded(self, documents: list[Document], embeddings: list[list[float]], user_id: str, document_id: str,
+                        start_index: int = 0, revision: Optional[str] = None):
         """
-        Returns a retriever that performs vector similarity search.
+        Writes already-embedded chunks to MongoDB and updates the vector indexes.
         """
-        def vector_similarity_retriever(query: str):
+        ivf_state = self._load_ivf_state(user_id) if settings.VECTOR_INDEX_BACKEND != "exact" else None
+        docs_to_insert = self._build_chunks(documents, embeddings, user_id, document_id, ivf_state, start_index, revision)
+        for batch in self._write_batches(docs_to_insert):
+            self.collection.insert_many(batch, ordered=False)
+        self._update_indexes_after_write(user_id, document_id, embeddings, documents, ivf_state)
+
+        logger.success(f"All {len(documents)} chunks have been successfully embedded and stored.")
+
+    async def _astore_embedded(self, documents: list[Document], embeddings: list[list[float]], user_id: str, document_id: str,
+                               start_index: int = 0, revision: Optional[str] = None, hidden: bool = False):
+        ivf_state = await self._aload_ivf_state(user_id) if settings.VECTOR_INDEX_BACKEND != "exact" else None
+        docs_to_insert = await self._run_in_executor(
+            self._build_chunks, documents, embeddings, user_id, document_id, ivf_state, start_index, revision
+        )
+        for batch in self._write_batches(docs_to_insert):
+            await self.async_collection.insert_many(batch, ordered=False)
+
+        retrain = False
+        if ivf_state is not None:
+            state = await self.async_ann_collection.find_one_and_update(
+                {"_id": user_id, "version": ivf_state["version"]},
+                {"$inc": {"count": len(documents)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            retrain = self._needs_retrain(state)
+            if retrain:
+                await self.async_ann_collection.delete_one({"_id": user_id, "version": ivf_state["version"]})
+        if hidden:
+            # Caches pick the chunks up when the revision is published.
+            if retrain:
+                self.index_cache.invalidate((user_id, None))
+        else:
+            await self._run_in_executor(self._refresh_indexes, user_id, document_id, embeddings, documents, retrain)
+
+        logger.success(f"All {len(documents)} chunks have been successfully embedded and stored.")
+
+    @staticmethod
+    def _write_batches(chunks: list[dict]):
+        # Bounded, unordered batches: one failed insert does not stop the rest
+        # of the batch, and no single request carries an entire document.
+        size = settings.MONGO_WRITE_BATCH_SIZE
+        for start in range(0, len(chunks), size):
+            yield chunks[start:start + size]
+
+    def _build_chunks(self, documents: list[Document], embeddings: list[list[float]], user_id: str, document_id: str,
+                      ivf_state, start_index: Optional[int] = 0, revision: Optional[str] = None) -> list[dict]:
+        # Chunks are assigned to the user's IVF lists on write so the ANN
+        # index stays current without a rebuild. A start_index of None keeps
+        # the chunk_index each document already has.
+        if ivf_state is not None:
+            assignments = assign_to_centroids(embeddings, ivf_state["centroids"])
+
+        docs_to_insert = []
+        for i, doc in enumerate(documents):
+            doc.metadata["user_id"] = user_id
+            doc.metadata["document_id"] = document_id
+            if start_index is not None:
+                doc.metadata["chunk_index"] = start_index + i
+            chunk = {
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+                **encode_embedding(embeddings[i], settings.EMBEDDING_STORAGE_DTYPE),
+                # Lets a later re-upload tell whether this vector can be reused.
+                "embedding_model": self.embedding_model.model_name,
+            }
+            if ivf_state is not None:
+                chunk["ivf"] = {"version": ivf_state["version"], "list": int(assignments[i])}
+            if revision is not None:
+                chunk["revision"] = revision
+            docs_to_insert.append(chunk)
+        return docs_to_insert
+
+    async def aget_document_chunks(self, user_id: str, document_id: str) -> list[dict]:
+        """
+        Returns a document's stored chunks without their embeddings, for diffing a re-upload against them.
+        """
+        return await self.async_collection.find(
+            await self._avisible_chunk_query(user_id, document_id),
+            {"text": 1, "metadata": 1, "embedding_model": 1},
+        ).to_list(length=None)
+
+    async def aapply_revision(self, user_id: str, document_id: str, diff: RevisionDiff, texts: list[str],
+                              chunk_ids: list[int], revision: str):
+        """
+        Applies an incremental re-upload in one step:
+        - inserts the diff's new chunks, which already carry their chunk_index;
+        - updates the position of reused chunks in place;
+        - deletes the stored chunks the revision no longer has;
+        - swaps in the BM25 index built from every chunk of the revision.
+
+        Where the deployment supports multi-document transactions (replica
+        sets and sharded clusters, including Atlas), the writes run in one, so
+        searches see either the old revision or the new one. On a standalone
+        server the revision is instead written hidden, reused chunks as copies
+        that keep their stored embeddings, and published with one write.
+        """
+        ivf_state = await self._aload_ivf_state(user_id) if settings.VECTOR_INDEX_BACKEND != "exact" else None
+        chunks = await self._run_in_executor(
+            self._build_chunks, diff.documents, diff.embeddings, user_id, document_id, ivf_state, None, revision
+        )
+        keyword_index = await self._run_in_executor(self._build_keyword_index, texts, chunk_ids)
+        keyword_record = self._keyword_record(user_id, document_id, keyword_index, revision)
+        removed_ids = list(diff.removed_ids)
+        net_change = len(chunks) - len(removed_ids)
+        # Shifted chunks are updated a run at a time, so edits cost a statement each, not one per later chunk.
+        updates = [
+            UpdateMany({"_id": {"$in": ids}}, {"$inc": {"metadata.chunk_index": chunk_shift, "metadata.page": page_shift}})
+            for (chunk_shift, page_shift), ids in diff.shifts.items()
+        ] + [UpdateOne({"_id": chunk_id}, {"$set": fields}) for chunk_id, fields in diff.moves]
+
+        async def apply(session):
+            for batch in self._write_batches(chunks):
+                await self.async_collection.insert_many(batch, ordered=False, session=session)
+            for start in range(0, len(updates), settings.MONGO_WRITE_BATCH_SIZE):
+                batch = updates[start:start + settings.MONGO_WRITE_BATCH_SIZE]
+                await self.async_collection.bulk_write(batch, ordered=False, session=session)
+            if diff.new_total_pages is not None:
+                await self.async_collection.update_many(
+                    {"metadata.user_id": user_id, "metadata.document_id": document_id},
+                    {"$set": {"metadata.total_pages": diff.new_total_pages}}, session=session,
+                )
+            if removed_ids:
+                await self.async_collection.delete_many({"_id": {"$in": removed_ids}}, session=session)
+            await self.async_keyword_collection.replace_one(
+                {"_id": keyword_record["_id"]}, keyword_record, upsert=True, session=session
+            )
+            if net_change:
+                return await self.async_ann_collection.find_one_and_update(
+                    {"_id": user_id}, {"$inc": {"count": net_change}},
+                    return_document=ReturnDocument.AFTER, session=session,
+                )
+
+        async def apply_hidden():
+            await self._aapply_hidden_revision(user_id, document_id, diff, chunks, keyword_record, revision)
+
+        with INGESTION_STAGE_SECONDS.time(stage="store"):
+            state = await self._arun_atomically(apply, apply_hidden)
+        if self._needs_retrain(state):
+            await self.async_ann_collection.delete_one({"_id": user_id, "version": state["version"]})
+
+        # Replaced chunks cannot be subtracted from a cached index, so both go.
+        self.index_cache.invalidate((user_id, document_id))
+        self.index_cache.invalidate((user_id, None))
+        self.keyword_cache.invalidate((user_id, document_id))
+        self._notify_change(user_id, document_id)
+        logger.info(f"Applied revision of document {document_id}: {len(chunks)} chunks written, "
+                    f"{diff.reused - diff.kept} moved, {len(removed_ids)} removed.")
+
+    async def _aapply_hidden_revision(self, user_id: str, document_id: str, diff: RevisionDiff, chunks: list[dict],
+                                      keyword_record: dict, revision: str):
+        """
+        Writes a whole revision next to the stored one while it is hidden: the
+        new chunks plus a copy of every reused chunk at its new position, so
+        no stored chunk changes until apublish_revision makes it the live one.
+        """
+        await self.ahide_revision(user_id, document_id, revision)
+        copies = []
+        reused_ids = list(diff.placements)
+        for start in range(0, len(reused_ids), settings.MONGO_WRITE_BATCH_SIZE):
+            async for chunk in self.async_collection.find({"_id": {"$in": reused_ids[start:start + settings.MONGO_WRITE_BATCH_SIZE]}}):
+                chunk["metadata"].update(diff.placements[chunk.pop("_id")])
+                if diff.new_total_pages is not None:
+                    chunk["metadata"]["total_pages"] = diff.new_total_pages
+                chunk["revision"] = revision
+                copies.append(chunk)
+        for batch in self._write_batches(chunks + copies):
+            await self.async_collection.insert_many(batch, ordered=False)
+        # The replaced revision is subtracted when apublish_revision deletes it.
+        await self.async_ann_collection.update_one({"_id": user_id}, {"$inc": {"count": len(chunks) + len(copies)}})
+        await self.async_keyword_collection.replace_one(
+            {"_id": keyword_record["_id"]}, {**keyword_record, "hidden": True}, upsert=True
+        )
+        await self.apublish_revision(user_id, document_id, revision)
+
+    async def _arun_atomically(self, apply, fallback):
+        """
+        Runs apply(session) in a transaction, or fallback() when the deployment
+        has no transaction support (standalone servers, mongomock).
+        """
+        if self._transactions_supported is not False:
             try:
-                query_embedding = self.embedding_model.embed_query(query)
-                
-                results = list(self.collection.find({
-                    "metadata.user_id": user_id,
-                    "metadata.document_id": document_id
-                }))
-                
-                if not results:
-                    logger.warning(f"No documents found for user {user_id} and document {document_id}")
-                    return []
-                
-                scored_docs = []
-                for result in results:
-                    doc_embedding = result['embedding']
-                    similarity_score = np.dot(query_embedding, doc_embedding)
-                    
-                    metadata = result['metadata'].copy()
-                    metadata['similarity_score'] = float(similarity_score)
-                    
-                    scored_docs.append({
-                        'document': Document(
-                            page_content=result['text'], 
-                            metadata=metadata
-                        ),
-                        'score': similarity_score
-                    })
-                
-                scored_docs.sort(key=lambda x: x['score'], reverse=True)
-                top_docs = [item['document'] for item in scored_docs[:k]]
-                
-                logger.info(f"Retrieved {len(top_docs)} similar documents for query.")
-                return top_docs
-                
+                async with await self.async_client.start_session() as session:
+                    result = await session.with_transaction(apply)
+                self._transactions_supported = True
+                return result
+            except (NotImplementedError, ConfigurationError):
+                pass
+            except OperationFailure as e:
+                # IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos".
+                if e.code != 20 or self._transactions_supported:
+                    raise
+            self._transactions_supported = False
+            logger.warning("MongoDB does not support transactions here; document revisions are written hidden and published.")
+        return await fallback()
+
+    def document_exists(self, user_id: str, document_id: str) -> bool:
+        return self.collection.count_documents(
+            {"metadata.user_id": user_id, "metadata.document_id": document_id}, limit=1
+        ) > 0
+
+    async def adocument_exists(self, user_id: str, document_id: str) -> bool:
+        return await self.async_collection.count_documents(
+            {"metadata.user_id": user_id, "metadata.document_id": document_id}, limit=1
+        ) > 0
+
+    async def aget_document_texts(self, user_id: str, document_id: str) -> list[str]:
+        """
+        Returns the text of a document's chunks in reading order.
+        """
+        chunks = await self.async_collection.find(
+            await self._avisible_chunk_query(user_id, document_id),
+            {"text": 1, "metadata.chunk_index": 1},
+        ).sort("metadata.chunk_index", ASCENDING).to_list(length=None)
+        return [chunk["text"] for chunk in chunks]
+
+    # Every chunk query filters on user and then document; the chunk ordinal
+    # lets a document's chunks be read back in order from the same index.
+    CHUNK_INDEXES = [
+        ([("metadata.user_id", ASCENDING), ("metadata.document_id", ASCENDING), ("metadata.chunk_index", ASCENDING)],
+         {"name": "user_document_chunk"}),
+    ]
+
+    def ensure_indexes(self):
+        for keys, options in self.CHUNK_INDEXES:
+            self.collection.create_index(keys, **options)
+        self.revision_collection.create_index("user_id")
+
+    async def aensure_indexes(self):
+        """
+        Creates the chunk collection's indexes if they are missing. Called at startup.
+        """
+        for keys, options in self.CHUNK_INDEXES:
+            await self.async_collection.create_index(keys, **options)
+        await self.async_revision_collection.create_index("user_id")
+        logger.info(f"Ensured indexes on {CHUNK_COLLECTION_NAME}.")
+
+    @staticmethod
+    def _revision_query(user_id: str, document_id: str, revision: Optional[str] = None,
+                        keep_revision: Optional[str] = None) -> dict:
+        query = {"metadata.user_id": user_id, "metadata.document_id": document_id}
+        if revision is not None:
+            query["revision"] = revision
+        if keep_revision is not None:
+            query["revision"] = {"$ne": keep_revision}
+        return query
+
+    # --- Revision visibility ---
+    # A replace that is not applied in one step writes its chunks next to the
+    # stored revision. A revision_states record per document keeps readers on
+    # one revision meanwhile: chunks of the revisions in "hidden" are skipped,
+    # and once a revision is published as "live", every other one is, until
+    # they are deleted and the record with them.
+
+    @staticmethod
+    def _revision_state_id(user_id: str, document_id: str) -> str:
+        return f"{user_id}:{document_id}"
+
+    def _revision_state_filter(self, user_id: str, document_id: Optional[str]) -> dict:
+        if document_id is None:
+            return {"user_id": user_id}
+        return {"_id": self._revision_state_id(user_id, document_id)}
+
+    @staticmethod
+    def _visible_query(query: dict, states: list[dict]) -> dict:
+        excluded = []
+        for state in states:
+            scope = {"metadata.document_id": state["document_id"]}
+            if state.get("live"):
+                excluded.append({**scope, "revision": {"$ne": state["live"]}})
+            elif state.get("hidden"):
+                excluded.append({**scope, "revision": {"$in": state["hidden"]}})
+        return {**query, "$nor": excluded} if excluded else query
+
+    def _visible_chunk_query(self, user_id: str, document_id: Optional[str]) -> dict:
+        states = list(self.revision_collection.find(self._revision_state_filter(user_id, document_id)))
+        return self._visible_query(self._chunk_query(user_id, document_id), states)
+
+    async def _avisible_chunk_query(self, user_id: str, document_id: Optional[str]) -> dict:
+        """
+        The chunk query for a document, or all of a user's documents, that
+        leaves out chunks of unpublished revisions.
+        """
+        states = await self.async_revision_collection.find(
+            self._revision_state_filter(user_id, document_id)
+        ).to_list(length=None)
+        return self._visible_query(self._chunk_query(user_id, document_id), states)
+
+    async def ahide_revision(self, user_id: str, document_id: str, revision: str):
+        """
+        Keeps a revision's chunks out of every read until apublish_revision,
+        so searches go on seeing only the stored revision while it is written.
+        """
+        await self.async_revision_collection.update_one(
+            {"_id": self._revision_state_id(user_id, document_id)},
+            {"$set": {"user_id": user_id, "document_id": document_id}, "$addToSet": {"hidden": revision}},
+            upsert=True,
+        )
+
+    async def apublish_revision(self, user_id: str, document_id: str, revision: str):
+        """
+        Makes a fully written hidden revision the document's only visible one
+        with a single update, then deletes the revisions it replaces.
+        """
+        await self.async_revision_collection.update_one(
+            {"_id": self._revision_state_id(user_id, document_id)},
+            {"$set": {"live": revision}, "$pull": {"hidden": revision}},
+        )
+        self.index_cache.invalidate((user_id, document_id))
+        self.index_cache.invalidate((user_id, None))
+        self.keyword_cache.invalidate((user_id, document_id))
+        self._notify_change(user_id, document_id)
+        await self.async_keyword_collection.update_one(
+            {"_id": self._keyword_record_id(user_id, document_id), "revision": revision}, {"$unset": {"hidden": ""}}
+        )
+        try:
+            await self.adelete_document(user_id, document_id, keep_revision=revision)
+        except Exception as e:
+            # They stay hidden, and the next replace removes them.
+            logger.error(f"Could not remove the replaced revisions of document {document_id}: {e}")
+
+    async def arecover_revisions(self, user_id: str, document_id: str):
+        """
+        Settles a replace that stopped part way (e.g. the process died) before
+        the next one starts: a published revision replaces the others, and
+        unpublished ones are deleted. Replaces of a document must not overlap.
+        """
+        state_id = self._revision_state_id(user_id, document_id)
+        state = await self.async_revision_collection.find_one({"_id": state_id})
+        if state is None:
+            return
+        if state.get("live"):
+            await self.adelete_document(user_id, document_id, keep_revision=state["live"])
+            return
+        for revision in state.get("hidden", []):
+            await self.adelete_document(user_id, document_id, revision=revision)
+        await self.async_revision_collection.delete_one({"_id": state_id})
+
+    def _forget_revision_state(self, collection, user_id: str, document_id: str, revision: Optional[str]):
+        """
+        Updates the revision state after a delete: a discarded revision is
+        neither hidden nor live any more, and deleting every other revision
+        (or all of them) leaves nothing to keep readers off. Returns an
+        awaitable for Motor.
+        """
+        state_id = self._revision_state_id(user_id, document_id)
+        if revision is not None:
+            return collection.bulk_write([
+                UpdateOne({"_id": state_id}, {"$pull": {"hidden": revision}}),
+                UpdateOne({"_id": state_id, "live": revision}, {"$unset": {"live": ""}}),
+            ])
+        return collection.delete_one({"_id": state_id})
+
+    def _forget_chunks(self, user_id: str, document_id: str, deleted: int):
+        # Removed chunks cannot be subtracted from a cached index, so both go.
+        self.index_cache.invalidate((user_id, document_id))
+        self.index_cache.invalidate((user_id, None))
+        self.keyword_cache.invalidate((user_id, document_id))
+        self._notify_change(user_id, document_id)
+        logger.info(f"Deleted {deleted} chunks of document {document_id} for user {user_id}.")
+
+    def delete_document(self, user_id: str, document_id: str, revision: Optional[str] = None,
+                        keep_revision: Optional[str] = None) -> int:
+        """
+        Deletes a document's chunks and returns how many were removed. Pass
+        revision to delete only that revision (e.g. a failed ingestion), or
+        keep_revision to delete every other one (finishing a replace).
+        """
+        deleted = self.collection.delete_many(self._revision_query(user_id, document_id, revision, keep_revision)).deleted_count
+        if revision is None and keep_revision is None:
+            self.keyword_collection.delete_one({"_id": self._keyword_record_id(user_id, document_id)})
+        self._forget_revision_state(self.revision_collection, user_id, document_id, revision)
+        if deleted:
+            self.ann_collection.update_one({"_id": user_id}, {"$inc": {"count": -deleted}})
+            self._forget_chunks(user_id, document_id, deleted)
+        return deleted
+
+    async def adelete_document(self, user_id: str, document_id: str, revision: Optional[str] = None,
+                               keep_revision: Optional[str] = None) -> int:
+        result = await self.async_collection.delete_many(self._revision_query(user_id, document_id, revision, keep_revision))
+        deleted = result.deleted_count
+        if revision is None and keep_revision is None:
+            await self.async_keyword_collection.delete_one({"_id": self._keyword_record_id(user_id, document_id)})
+        await self._forget_revision_state(self.async_revision_collection, user_id, document_id, revision)
+        if deleted:
+            await self.async_ann_collection.update_one({"_id": user_id}, {"$inc": {"count": -deleted}})
+            self._forget_chunks(user_id, document_id, deleted)
+        return deleted
+
+    def _notify_change(self, user_id: str, document_id: str):
+        self._publish_change(user_id, document_id)
+        self._run_change_listeners(user_id, document_id)
+
+    def _run_change_listeners(self, user_id: str, document_id: Optional[str]):
+        for listener in self.change_listeners:
+            try:
+                listener(user_id, document_id)
             except Exception as e:
-                logger.error(f"Error in vector similarity search: {e}")
+                logger.error(f"Document change listener failed for {document_id}: {e}")
+
+    def _publish_change(self, user_id: str, document_id: str):
+        """
+        Tells the other web workers that a document changed. This process
+        catches up on its own next sync_document, like any other worker.
+        """
+        if self.shared_index is not None:
+            self.shared_index.bump(user_id, document_id)
+            self.shared_index.bump(user_id, None)
+
+    def sync_document(self, user_id: str, document_id: Optional[str] = None):
+        """
+        Drops what this process cached for a document, or for all of the
+        user's documents when document_id is None, if a web worker changed it
+        since this process last checked. Call before using cached state; a
+        no-op without SHARED_INDEX_DIR.
+        """
+        if self.shared_index is None:
+            return
+        key = (user_id, document_id)
+        version = self.shared_index.version(user_id, document_id)
+        # Nothing is cached for a key before its first check.
+        seen = self._seen_versions.setdefault(key, version)
+        if seen == version:
+            return
+
+        self._seen_versions[key] = version
+        self.index_cache.invalidate(key)
+        if document_id is not None:
+            self.keyword_cache.invalidate(key)
+        self._run_change_listeners(user_id, document_id)
+
+    def _update_indexes_after_write(self, user_id: str, document_id: str, embeddings, documents: list[Document], ivf_state):
+        retrain = False
+        if ivf_state is not None:
+            state = self.ann_collection.find_one_and_update(
+                {"_id": user_id, "version": ivf_state["version"]},
+                {"$inc": {"count": len(documents)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            retrain = self._needs_retrain(state)
+            if retrain:
+                self.ann_collection.delete_one({"_id": user_id, "version": ivf_state["version"]})
+        self._refresh_indexes(user_id, document_id, embeddings, documents, retrain)
+
+    @staticmethod
+    def _needs_retrain(state) -> bool:
+        # The centroids no longer describe the data well once it has grown this much.
+        return bool(state) and state["count"] > state["trained_count"] * settings.IVF_RETRAIN_GROWTH
+
+    def _refresh_indexes(self, user_id: str, document_id: str, embeddings, documents: list[Document], retrain: bool):
+        self.index_cache.invalidate((user_id, document_id))
+        self._notify_change(user_id, document_id)
+
+        if retrain:
+            # Rebuilt, with fresh centroids, on next load.
+            self.index_cache.invalidate((user_id, None))
+            return
+
+        new_docs = [Document(page_content=doc.page_content, metadata=doc.metadata) for doc in documents]
+        self.index_cache.update((user_id, None), lambda index: index.extended(embeddings, new_docs))
+
+    def _use_ivf(self, count: int) -> bool:
+        backend = settings.VECTOR_INDEX_BACKEND
+        return backend == "ivf" or (backend == "auto" and count >= settings.IVF_MIN_CHUNKS)
+
+    @staticmethod
+    def _decode_ivf_state(state):
+        if state is None:
+            return None
+        state["centroids"] = np.frombuffer(state["centroids"], dtype=np.float32).reshape(state["nlist"], state["dim"])
+        return state
+
+    def _load_ivf_state(self, user_id: str):
+        return self._decode_ivf_state(self.ann_collection.find_one({"_id": user_id}))
+
+    async def _aload_ivf_state(self, user_id: str):
+        return self._decode_ivf_state(await self.async_ann_collection.find_one({"_id": user_id}))
+
+    def _ivf_sample_pipeline(self, user_id: str, count: int) -> list[dict]:
+        # A random sample across all of the user's documents, as large as centroid training uses.
+        size = min(count, default_nlist(count) * TRAINING_ROWS_PER_LIST)
+        return [
+            {"$match": self._chunk_query(user_id, None)},
+            {"$sample": {"size": max(1, size)}},
+            {"$project": EMBEDDING_PROJECTION},
+        ]
+
+    @staticmethod
+    def _train_ivf_state(user_id: str, sample: list, count: int, embeddings: np.ndarray):
+        """
+        Trains centroids for a user on a sample of all their chunks. The chunks
+        being loaded are used instead if the sample does not match their
+        dimension, e.g. while documents are re-embedded with a new model.
+        """
+        matrix = decode_embeddings(sample) if sample else embeddings
+        if matrix.shape[1] != embeddings.shape[1]:
+            matrix = embeddings
+        centroids = train_ivf_centroids(normalize_rows(matrix), default_nlist(count))
+        return {
+            "_id": user_id,
+            "version": str(uuid.uuid4()),
+            "nlist": int(centroids.shape[0]),
+            "dim": int(centroids.shape[1]),
+            "centroids": centroids,
+            # Growth is measured against everything the user has stored, not just the training sample.
+            "trained_count": count,
+            "count": count,
+        }
+
+    @staticmethod
+    def _ivf_state_write(previous, state) -> tuple[Optional[dict], dict]:
+        # Only the trainer that replaces the state it read wins; the others adopt the winner's.
+        document = dict(state, centroids=state["centroids"].tobytes())
+        if previous is None:
+            return None, document
+        return {"_id": state["_id"], "version": previous["version"]}, document
+
+    def _persist_ivf_state(self, previous, state):
+        match, document = self._ivf_state_write(previous, state)
+        try:
+            if match is None:
+                self.ann_collection.insert_one(document)
+            elif not self.ann_collection.replace_one(match, document).matched_count:
+                return self._load_ivf_state(state["_id"]) or state
+        except DuplicateKeyError:
+            return self._load_ivf_state(state["_id"]) or state
+        logger.info(f"Trained IVF index for user {state['_id']} with {state['nlist']} lists.")
+        return state
+
+    async def _apersist_ivf_state(self, previous, state):
+        match, document = self._ivf_state_write(previous, state)
+        try:
+            if match is None:
+                await self.async_ann_collection.insert_one(document)
+            elif not (await self.async_ann_collection.replace_one(match, document)).matched_count:
+                return await self._aload_ivf_state(state["_id"]) or state
+        except DuplicateKeyError:
+            return await self._aload_ivf_state(state["_id"]) or state
+        logger.info(f"Trained IVF index for user {state['_id']} with {state['nlist']} lists.")
+        return state
+
+    def _ensure_ivf_state(self, user_id: str, embeddings: np.ndarray):
+        state = self._load_ivf_state(user_id)
+        if state is not None and state["dim"] == embeddings.shape[1]:
+            return state
+        count = self.collection.count_documents(self._chunk_query(user_id, None))
+        sample = list(self.collection.aggregate(self._ivf_sample_pipeline(user_id, count)))
+        return self._persist_ivf_state(state, self._train_ivf_state(user_id, sample, count, embeddings))
+
+    async def _aensure_ivf_state(self, user_id: str, embeddings: np.ndarray):
+        state = await self._aload_ivf_state(user_id)
+        if state is not None and state["dim"] == embeddings.shape[1]:
+            return state
+        count = await self.async_collection.count_documents(self._chunk_query(user_id, None))
+        sample = await self.async_collection.aggregate(self._ivf_sample_pipeline(user_id, count)).to_list(length=None)
+        trained = await self._run_in_executor(self._train_ivf_state, user_id, sample, count, embeddings)
+        return await self._apersist_ivf_state(state, trained)
+
+    @staticmethod
+    def _build_ivf_index(state, results: list, embeddings: np.ndarray) -> tuple[IVFFlatIndex, list]:
+        """
+        Builds the IVF index from stored assignments, assigning chunks written
+        before these centroids existed. Returns the index and the writes that
+        persist those new assignments.
+        """
+        assignments = np.array([
+            r["ivf"]["list"] if r.get("ivf", {}).get("version") == state["version"] else -1
+            for r in results
+        ], dtype=np.int32)
+
+        writes = []
+        missing = np.flatnonzero(assignments < 0)
+        if missing.size:
+            fresh = assign_to_centroids(embeddings[missing], state["centroids"])
+            assignments[missing] = fresh
+            writes = [
+                UpdateMany(
+                    {"_id": {"$in": [results[i]["_id"] for i in missing[fresh == list_id]]}},
+                    {"$set": {"ivf": {"version": state["version"], "list": int(list_id)}}},
+                )
+                for list_id in np.unique(fresh)
+            ]
+
+        documents = [Document(page_content=r['text'], metadata=r['metadata']) for r in results]
+        index = IVFFlatIndex(embeddings, documents, state["centroids"], assignments, nprobe=settings.IVF_NPROBE)
+        return index, writes
+
+    def _load_index(self, user_id: str, document_id: Optional[str] = None) -> VectorIndexBackend:
+        """
+        Returns the cached index for a document, or for all of the user's
+        documents when document_id is None, building it from MongoDB on a miss.
+        """
+        self.sync_document(user_id, document_id)
+        key = (user_id, document_id)
+        index = self.index_cache.get(key)
+        if index is not None:
+            return index
+
+        generation = self.index_cache.generation(key)
+        results = list(self.collection.find(self._visible_chunk_query(user_id, document_id), CHUNK_PROJECTION))
+        return self._build_index(key, results, generation)
+
+    @staticmethod
+    def _chunk_query(user_id: str, document_id: Optional[str]) -> dict:
+        query = {"metadata.user_id": user_id}
+        if document_id is not None:
+            query["metadata.document_id"] = document_id
+        return query
+
+    def _build_index(self, key: tuple, results: list, generation: int) -> VectorIndexBackend:
+        user_id, document_id = key
+        if not results:
+            return ExactIndex([], [])
+
+        if self._use_ivf(len(results)):
+            embeddings = decode_embeddings(results)
+            index, writes = self._build_ivf_index(self._ensure_ivf_state(user_id, embeddings), results, embeddings)
+            if writes:
+                self.collection.bulk_write(writes, ordered=False)
+        else:
+            documents = [Document(page_content=r['text'], metadata=r['metadata']) for r in results]
+            index = self._build_exact_index(results, documents)
+        return self._cache_index(key, index, generation)
+
+    async def _abuild_index(self, key: tuple, results: list, generation: int) -> VectorIndexBackend:
+        """
+        Async variant of _build_index: the IVF state and assignments are read
+        and written through Motor, and only decoding, training and building run
+        on the search thread pool.
+        """
+        if not results or not self._use_ivf(len(results)):
+            return await self._run_in_executor(self._build_index, key, results, generation)
+
+        embeddings = await self._run_in_executor(decode_embeddings, results)
+        state = await self._aensure_ivf_state(key[0], embeddings)
+        index, writes = await self._run_in_executor(self._build_ivf_index, state, results, embeddings)
+        if writes:
+            await self.async_collection.bulk_write(writes, ordered=False)
+        return self._cache_index(key, index, generation)
+
+    def _cache_index(self, key: tuple, index: VectorIndexBackend, generation: int) -> VectorIndexBackend:
+        user_id, document_id = key
+        self.index_cache.put(key, index, generation=generation)
+        logger.info(f"Built {type(index).__name__} for user {user_id}, document {document_id} with {len(index)} chunks.")
+        return index
+
+    def _build_exact_index(self, results: list, documents: list[Document]) -> ExactIndex:
+        """
+        Maps the matrix another worker published for exactly these chunks, if
+        any, instead of decoding the embeddings; otherwise decodes them and
+        publishes the matrix.
+        """
+        if self.shared_index is None:
+            return ExactIndex(decode_embeddings(results), documents)
+
+        chunk_ids = [r["_id"] for r in results]
+        matrix = self.shared_index.load_matrix(chunk_ids)
+        if matrix is None:
+            matrix = self.shared_index.save_matrix(chunk_ids, normalize_rows(decode_embeddings(results)))
+        return ExactIndex.from_normalized(matrix, documents)
+
+    async def _aload_index(self, user_id: str, document_id: Optional[str] = None) -> VectorIndexBackend:
+        """
+        Async variant of _load_index: chunks are fetched through Motor and the
+        index is built on the search thread pool.
+        """
+        key = (user_id, document_id)
+        index = self.index_cache.get(key)
+        if index is not None:
+            return index
+
+        pending = self._index_builds.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._index_builds[key] = future
+        try:
+            generation = self.index_cache.generation(key)
+            with CHAT_STAGE_SECONDS.time(stage="mongo_fetch"):
+                results = await self.async_collection.find(
+                    await self._avisible_chunk_query(user_id, document_id), CHUNK_PROJECTION
+                ).to_list(length=None)
+            index = await self._abuild_index(key, results, generation)
+            future.set_result(index)
+            return index
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the exception; keep the future from warning when there are none.
+            future.exception()
+            raise
+        finally:
+            del self._index_builds[key]
+
+    def _keyword_record_id(self, user_id: str, document_id: str) -> str:
+        return f"{user_id}:{document_id}"
+
+    def _build_keyword_index(self, texts: list[str], chunk_ids: list[int]) -> BM25Index:
+        return BM25Index.build(texts, chunk_ids, k1=settings.BM25_K1, b=settings.BM25_B)
+
+    def _keyword_record(self, user_id: str, document_id: str, index: BM25Index, revision: Optional[str],
+                        hidden: bool = False) -> dict:
+        record = {
+            "_id": self._keyword_record_id(user_id, document_id),
+            "user_id": user_id,
+            "document_id": document_id,
+            "revision": revision,
+            **index.to_record(),
+        }
+        if hidden:
+            record["hidden"] = True
+        return record
+
+    def save_keyword_index(self, user_id: str, document_id: str, texts: list[str], chunk_ids: list[int],
+                           revision: Optional[str] = None, hidden: bool = False):
+        """
+        Builds the document's BM25 index from its chunk texts and persists it
+        next to the chunks, replacing any earlier one. A hidden record belongs
+        to an unpublished revision; until then searches index the visible chunks.
+        """
+        index = self._build_keyword_index(texts, chunk_ids)
+        record = self._keyword_record(user_id, document_id, index, revision, hidden)
+        self.keyword_collection.replace_one({"_id": record["_id"]}, record, upsert=True)
+        self.keyword_cache.invalidate((user_id, document_id))
+        self._publish_change(user_id, document_id)
+
+    async def asave_keyword_index(self, user_id: str, document_id: str, texts: list[str], chunk_ids: list[int],
+                                  revision: Optional[str] = None, hidden: bool = False):
+        index = await self._run_in_executor(self._build_keyword_index, texts, chunk_ids)
+        record = self._keyword_record(user_id, document_id, index, revision, hidden)
+        await self.async_keyword_collection.replace_one({"_id": record["_id"]}, record, upsert=True)
+        self.keyword_cache.invalidate((user_id, document_id))
+        self._publish_change(user_id, document_id)
+        logger.info(f"Stored BM25 index for document {document_id} ({len(index.terms)} terms).")
+
+    def _keyword_index_from(self, key: tuple, record: Optional[dict], index: VectorIndexBackend, generation: int) -> BM25Index:
+        if record is not None and not record.get("hidden"):
+            keyword_index = BM25Index.from_record(record, k1=settings.BM25_K1, b=settings.BM25_B)
+        else:
+            # Documents ingested before keyword indexes existed, or whose stored
+            # index is for an unpublished revision: index the loaded chunks.
+            lookup = index.chunk_lookup()
+            keyword_index = self._build_keyword_index([doc.page_content for doc in lookup.values()], list(lookup))
+        self.keyword_cache.put(key, keyword_index, generation=generation)
+        return keyword_index
+
+    def _load_keyword_index(self, user_id: str, document_id: str, index: VectorIndexBackend) -> BM25Index:
+        key = (user_id, document_id)
+        keyword_index = self.keyword_cache.get(key)
+        if keyword_index is None:
+            generation = self.keyword_cache.generation(key)
+            record = self.keyword_collection.find_one({"_id": self._keyword_record_id(user_id, document_id)})
+            keyword_index = self._keyword_index_from(key, record, index, generation)
+        return keyword_index
+
+    async def _aload_keyword_record(self, user_id: str, document_id: str):
+        """
+        Returns the cached BM25 index, or the persisted record to build it from.
+        """
+        key = (user_id, document_id)
+        keyword_index = self.keyword_cache.get(key)
+        if keyword_index is not None:
+            return keyword_index, None, None
+        generation = self.keyword_cache.generation(key)
+        record = await self.async_keyword_collection.find_one({"_id": self._keyword_record_id(user_id, document_id)})
+        return None, record, generation
+
+    def _use_hybrid(self, document_id: Optional[str]) -> bool:
+        # Keyword scores are only comparable within one document's index.
+        return settings.RETRIEVAL_MODE == "hybrid" and document_id is not None
+
+    @staticmethod
+    def _vector_results(hits: list[tuple[Document, float]]) -> list[Document]:
+        top_docs = []
+        for doc, score in hits:
+            metadata = doc.metadata.copy()
+            metadata['similarity_score'] = score
+            top_docs.append(Document(page_content=doc.page_content, metadata=metadata))
+        return top_docs
+
+    @staticmethod
+    def _fused_results(vector_hits: list[tuple[Document, float]], keyword_hits: list[tuple[int, float]],
+                       index: VectorIndexBackend, k: int) -> list[Document]:
+        """
+        Merges vector and BM25 rankings with reciprocal rank fusion. Each chunk
+        keeps its cosine similarity (None if only the keyword search found it)
+        and gets its BM25 and fused scores in metadata.
+        """
+        lookup = index.chunk_lookup()
+        keyword_docs = [(lookup[chunk_id], score) for chunk_id, score in keyword_hits if chunk_id in lookup]
+        chunks = {id(doc): doc for doc, _ in vector_hits + keyword_docs}
+        similarity = {id(doc): score for doc, score in vector_hits}
+        keyword = {id(doc): score for doc, score in keyword_docs}
+
+        fused = reciprocal_rank_fusion(
+            [[id(doc) for doc, _ in vector_hits], [id(doc) for doc, _ in keyword_docs]],
+            k=settings.HYBRID_RRF_K,
+            limit=k,
+        )
+        top_docs = []
+        for key, score in fused:
+            doc = chunks[key]
+            metadata = doc.metadata.copy()
+            metadata['similarity_score'] = similarity.get(key)
+            metadata['keyword_score'] = keyword.get(key)
+            metadata['fusion_score'] = score
+            top_docs.append(Document(page_content=doc.page_content, metadata=metadata))
+        return top_docs
+
+    def similarity_search(self, query: str, user_id: str, document_id: Optional[str] = None, k: int = 5,
+                          query_embedding: Optional[list[float]] = None) -> list[Document]:
+        """
+        Returns the k chunks most relevant to the query, with their cosine score
+        in metadata['similarity_score']. Searches one document, or all of the
+        user's documents when document_id is None. Pass query_embedding to
+        reuse an embedding the caller already has.
+
+        With RETRIEVAL_MODE "hybrid", single-document searches also rank
+        chunks with the document's BM25 index and fuse both rankings.
+        """
+        try:
+            if query_embedding is None:
+                query_embedding = self.embedding_model.embed_query(query)
+
+            index = self._load_index(user_id, document_id)
+            if not len(index):
+                logger.warning(f"No documents found for user {user_id} and document {document_id}")
                 return []
-        
+
+            if self._use_hybrid(document_id):
+                depth = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+                keyword_index = self._load_keyword_index(user_id, document_id, index)
+                top_docs = self._fused_results(
+                    index.search(query_embedding, depth), keyword_index.search(query, depth), index, k
+                )
+            else:
+                top_docs = self._vector_results(index.search(query_embedding, k))
+
+            logger.info(f"Retrieved {len(top_docs)} similar documents for query.")
+            return top_docs
+
+        except Exception as e:
+            logger.error(f"Error in vector similarity search: {e}")
+            return []
+
+    async def asimilarity_search(self, query: str, user_id: str, document_id: Optional[str] = None, k: int = 5,
+                                 query_embedding: Optional[list[float]] = None) -> list[Document]:
+        """
+        Async variant of similarity_search that never blocks the event loop.
+        In hybrid mode both indexes are loaded and searched concurrently.
+        """
+        embedding_task = None
+        try:
+            hybrid = self._use_hybrid(document_id)
+            if query_embedding is None:
+                embedding_task = asyncio.ensure_future(self.embedding_model.aembed_query(query))
+
+            index, keyword_index = await self._aload_search_indexes(user_id, document_id, hybrid)
+            if embedding_task is not None:
+                query_embedding = await embedding_task
+
+            if not len(index):
+                logger.warning(f"No documents found for user {user_id} and document {document_id}")
+                return []
+
+            with CHAT_STAGE_SECONDS.time(stage="scoring"):
+                if hybrid:
+                    depth = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+                    vector_hits, keyword_hits = await asyncio.gather(
+                        self._run_in_executor(index.search, query_embedding, depth),
+                        self._run_in_executor(keyword_index.search, query, depth),
+                    )
+                    top_docs = self._fused_results(vector_hits, keyword_hits, index, k)
+                else:
+                    hits = await self._run_in_executor(index.search, query_embedding, k)
+                    top_docs = self._vector_results(hits)
+
+            logger.info(f"Retrieved {len(top_docs)} similar documents for query.")
+            return top_docs
+
+        except Exception as e:
+            if embedding_task is not None:
+                embedding_task.cancel()
+            logger.error(f"Error in vector similarity search: {e}")
+            return []
+
+    async def _aload_search_indexes(self, user_id: str, document_id: Optional[str], hybrid: bool):
+        """
+        Loads the vector index and, in hybrid mode, the document's BM25 index
+        concurrently. Returns (index, keyword index or None).
+        """
+        self.sync_document(user_id, document_id)
+        if not hybrid:
+            return await self._aload_index(user_id, document_id), None
+
+        index, (keyword_index, record, generation) = await asyncio.gather(
+            self._aload_index(user_id, document_id), self._aload_keyword_record(user_id, document_id)
+        )
+        if keyword_index is None and len(index):
+            keyword_index = await self._run_in_executor(
+                self._keyword_index_from, (user_id, document_id), record, index, generation
+            )
+        return index, keyword_index
+
+    async def abatch_similarity_search(self, queries: list[str], query_embeddings: list[list[float]], user_id: str,
+                                       document_id: str, k: int = 5) -> Optional[list[list[Document]]]:
+        """
+        Retrieves the top-k chunks of one document for each of several
+        already-embedded queries. All queries are scored against the document's
+        matrix in one matrix multiply. Returns one list per query, or None if
+        the document has no chunks. Unlike asimilarity_search, errors propagate.
+        """
+        hybrid = self._use_hybrid(document_id)
+        index, keyword_index = await self._aload_search_indexes(user_id, document_id, hybrid)
+        if not len(index):
+            return None
+
+        with CHAT_STAGE_SECONDS.time(stage="scoring"):
+            if not hybrid:
+                hits = await self._run_in_executor(index.search_batch, query_embeddings, k)
+                return [self._vector_results(query_hits) for query_hits in hits]
+
+            depth = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+            vector_hits, keyword_hits = await asyncio.gather(
+                self._run_in_executor(index.search_batch, query_embeddings, depth),
+                self._run_in_executor(lambda: [keyword_index.search(query, depth) for query in queries]),
+            )
+            return [
+                self._fused_results(query_vector_hits, query_keyword_hits, index, k)
+                for query_vector_hits, query_keyword_hits in zip(vector_hits, keyword_hits)
+            ]
+
+    def get_retriever(self, user_id: str, document_id: Optional[str] = None, k: int = 5):
+        """
+        Returns a retriever that performs vector similarity search over one
+        document, or over all of the user's documents when document_id is None.
+        """
+        def vector_similarity_retriever(query: str):
+            return self.similarity_search(query, user_id=user_id, document_id=document_id, k=k)
+
         return vector_similarity_retriever
 
-vector_store = MongoVectorStore()
+    def aget_retriever(self, user_id: str, document_id: Optional[str] = None, k: int = 5):
+        """
+        Async variant of get_retriever; the returned retriever is a coroutine function.
+        """
+        async def vector_similarity_retriever(query: str):
+            return await self.asimilarity_search(query, user_id=user_id, document_id=document_id, k=k)
+
+        return vector_similarity_retriever
+
+_vector_store = LazyResource("vector store", MongoVectorStore, close=lambda store: store.aclose())
 
 def get_vector_store() -> MongoVectorStore:
-    return vector_store
+    """
+    Returns the shared vector store, connecting on first use.
+    """
+    return _vector_store.get()
+
+def _if_created(read: Callable[[MongoVectorStore], object], default=None):
+    # Metrics callbacks must not create the store just to report on it.
+    return lambda: read(_vector_store.get()) if _vector_store.initialized else default
+
+register_cache("embeddings", _if_created(lambda store: store.embedding_cache.stats()))
+register_cache("vector_indexes", _if_created(lambda store: store.index_cache.stats()))
+register_cache("keyword_indexes", _if_created(lambda store: store.keyword_cache.stats()))
+register_cache("shared_matrices", _if_created(
+    lambda store: store.shared_index.stats() if store.shared_index is not None else None
+))
+Gauge("index_cache_bytes", "Bytes held by the in-memory index caches.", ["cache"], callback=_if_created(
+    lambda store: [({"cache": "vector"}, store.index_cache.size_bytes), ({"cache": "keyword"}, store.keyword_cache.size_bytes)],
+    default=[],
+))
+Gauge("search_executor_queued_tasks", "Index builds and searches waiting for a search thread.", callback=_if_created(
+    lambda store: [({}, store.search_executor._work_queue.qsize())],
+    default=[],
+))
+
+def __getattr__(name: str):
+    # Keeps `from app.services.vector_store import vector_store` working, lazily.
+    if name == "vector_store":
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,22 @@
+"""
+Offline benchmarks of the backend; run each with python -m benchmarks.<name>
+from backend/.
+
+Importing the package fills in placeholders for the settings the app
+requires, so every benchmark loads app.core.config without a .env. Values
+already in the environment win; nothing here is contacted.
+"""
+import os
+
+OFFLINE_ENV = {
+    "MONGO_CONNECTION_STRING": "mongodb://localhost:27017",
+    "GOOGLE_GEMINI_API_KEY": "offline",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "offline",
+    "SUPABASE_JWT_SECRET": "offline-benchmark-secret",
+    "SUPABASE_ANON_KEY": "offline",
+    "HUGGINGFACE_API_TOKEN": "offline",
+}
+
+for _name, _value in OFFLINE_ENV.items():
+    os.environ.setdefault(_name, _value)
@@ -0,0 +1,68 @@
+"""
+Recall@k versus latency for the exact and IVF-flat vector index backends.
+
+Usage (from backend/):
+    python -m benchmarks.ann_recall --chunks 50000 --queries 200 --k 5
+
+Vectors are drawn from a mixture of Gaussians so they cluster the way real
+sentence embeddings do; uniformly random vectors make every ANN index look bad.
+"""
+import argparse
+import time
+import numpy as np
+from langchain.docstore.document import Document
+from app.services.vector_index import (
+    ExactIndex,
+    IVFFlatIndex,
+    default_nlist,
+    normalize_rows,
+    train_ivf_centroids,
+)
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=count)
+    return (centers[labels] + 0.35 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def measure(index, queries: np.ndarray, k: int):
+    results, start = [], time.perf_counter()
+    for query in queries:
+        results.append({int(doc.page_content) for doc, _ in index.search(query, k)})
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return results, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    embeddings = synthetic_embeddings(args.chunks, args.dim, clusters=max(8, args.chunks // 500), rng=rng)
+    queries = synthetic_embeddings(args.queries, args.dim, clusters=max(8, args.chunks // 500), rng=rng)
+    documents = [Document(page_content=str(i)) for i in range(args.chunks)]
+
+    exact = ExactIndex(embeddings, documents)
+    truth, exact_ms = measure(exact, queries, args.k)
+    print(f"{'backend':<18}{'recall@' + str(args.k):>10}{'ms/query':>12}")
+    print(f"{'exact':<18}{1.0:>10.3f}{exact_ms:>12.3f}")
+
+    start = time.perf_counter()
+    centroids = train_ivf_centroids(normalize_rows(embeddings), default_nlist(args.chunks))
+    print(f"(IVF training: {len(centroids)} lists in {time.perf_counter() - start:.2f}s)")
+
+    for nprobe in args.nprobe:
+        ivf = IVFFlatIndex(embeddings, documents, centroids, nprobe=nprobe)
+        found, ivf_ms = measure(ivf, queries, args.k)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{'ivf nprobe=' + str(nprobe):<18}{recall:>10.3f}{ivf_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
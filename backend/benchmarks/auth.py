@@ -0,0 +1,87 @@
+"""
+Per-request cost of the get_current_user dependency.
+
+Usage (from backend/):
+    python -m benchmarks.auth --requests 20000
+
+Compares the previous behaviour (jwt.decode plus an INFO log line on every
+request) with verify_token on a cold cache (the first request with a token)
+and a warm cache (every later request with it), for HS256 tokens signed with
+SUPABASE_JWT_SECRET and RS256 tokens checked against a JWKS key set. The JWKS
+document is served from memory, so no network time is included. Log lines go
+to a sink that discards them, so only formatting cost is counted.
+"""
+import argparse
+import asyncio
+import time
+from jose import jwk, jwt
+from loguru import logger
+
+
+def make_token(key, algorithm: str, headers=None) -> str:
+    now = int(time.time())
+    claims = {"sub": "bench-user", "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + 3600}
+    return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+
+async def per_call(label: str, fn, requests: int):
+    start = time.perf_counter()
+    for _ in range(requests):
+        await fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:34} {1e6 * elapsed / requests:9.1f} us/request")
+
+
+async def run(args):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from app.core import security
+    from app.core.config import settings
+
+    secret = settings.SUPABASE_JWT_SECRET
+    hs_token = make_token(secret, "HS256")
+
+    async def legacy():
+        payload = jwt.decode(hs_token, secret, algorithms=["HS256"], audience="authenticated")
+        logger.info(f"Successfully validated token for user_id: {payload.get('sub')}")
+
+    async def cold(token):
+        security.token_cache.clear()
+        await security.verify_token(token)
+
+    await per_call("HS256 decode + INFO log (before)", legacy, args.requests)
+    await per_call("HS256 verify_token, cold cache", lambda: cold(hs_token), args.requests)
+    await per_call("HS256 verify_token, warm cache", lambda: security.verify_token(hs_token), args.requests)
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    public_jwk = {**jwk.construct(pem, "RS256").public_key().to_dict(), "kid": "bench"}
+    rs_token = make_token(pem, "RS256", headers={"kid": "bench"})
+
+    key_set = security.JWKSKeySet("memory://jwks")
+    fetches = 0
+
+    async def fetch():
+        nonlocal fetches
+        fetches += 1
+        return {"keys": [public_jwk]}
+
+    key_set._fetch = fetch
+    security.jwks_key_set = key_set
+    await per_call("RS256 verify_token, cold cache", lambda: cold(rs_token), args.requests // 10)
+    await per_call("RS256 verify_token, warm cache", lambda: security.verify_token(rs_token), args.requests)
+    print(f"JWKS fetches: {fetches}   token cache: {security.token_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(lambda _: None, level="INFO")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
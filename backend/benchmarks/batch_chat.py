@@ -0,0 +1,93 @@
+"""
+Wall time of answering many questions about many documents one pair at a time
+(what a client of /chat does today) versus RAGPipeline.astream_batch (what
+/chat/batch runs).
+
+Usage (from backend/):
+    python -m benchmarks.batch_chat --documents 20 --questions 10 --chunks 200
+
+Documents are stored in mongomock with the hash-based fake embedder; the LLM
+is FakeStreamingLLM with --llm-latency seconds per answer. The answer cache is
+disabled so every pair reaches the LLM. Also reports retrieval alone: one
+asimilarity_search per pair versus one abatch_similarity_search per document.
+"""
+import argparse
+import asyncio
+import time
+import mongomock
+from loguru import logger
+from mongomock_motor import AsyncMongoMockClient
+from langchain.docstore.document import Document
+from benchmarks.fakes import FakeEmbeddings, FakeStreamingLLM
+
+
+async def run(args):
+    from app.core.config import settings
+    from app.services.rag_pipeline import RAGPipeline
+    from app.services.vector_store import MongoVectorStore
+
+    client = mongomock.MongoClient()
+    store = MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model = FakeEmbeddings(dim=args.dim)
+    settings.RAG_MAX_CONCURRENCY = args.concurrency
+
+    document_ids = [f"doc-{d}" for d in range(args.documents)]
+    for document_id in document_ids:
+        texts = [f"{document_id} clause {i}: the supplier shall notify the buyer within {i % 30 + 1} days."
+                 for i in range(args.chunks)]
+        await store.aadd_documents([Document(page_content=t, metadata={"page": i // 4}) for i, t in enumerate(texts)],
+                                   "bench", document_id)
+        await store.asave_keyword_index("bench", document_id, texts, list(range(len(texts))))
+    questions = [f"What is notice period number {q}?" for q in range(args.questions)]
+    embeddings = await store.embedding_model.aembed_documents(questions)
+
+    start = time.perf_counter()
+    for document_id in document_ids:
+        for question, embedding in zip(questions, embeddings):
+            await store.asimilarity_search(question, "bench", document_id, k=args.k, query_embedding=embedding)
+    per_pair = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for document_id in document_ids:
+        await store.abatch_similarity_search(questions, embeddings, "bench", document_id, k=args.k)
+    batched = time.perf_counter() - start
+    pairs = len(document_ids) * len(questions)
+    print(f"retrieval, {pairs} pairs: per pair {per_pair:7.3f} s   batched {batched:7.3f} s   ({per_pair / batched:.1f}x)")
+
+    llm = FakeStreamingLLM(first_token_latency=args.llm_latency, token_latency=0.0)
+    pipeline = RAGPipeline(llm=llm, vector_store=store)
+    pipeline.answer_cache = None
+
+    start = time.perf_counter()
+    for document_id in document_ids:
+        for question in questions:
+            await pipeline.aanswer(question, "bench", document_id, k=args.k)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first = None
+    count = 0
+    async for _ in pipeline.astream_batch(questions, "bench", document_ids, k=args.k):
+        first = first or time.perf_counter() - start
+        count += 1
+    streamed = time.perf_counter() - start
+    print(f"answers,   {count} pairs: serial {serial:7.3f} s   batch {streamed:7.3f} s   ({serial / streamed:.1f}x)   "
+          f"first result after {1000 * first:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
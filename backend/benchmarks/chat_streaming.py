@@ -0,0 +1,58 @@
+"""
+Time-to-first-token for the streaming chat path versus the blocking one.
+
+Usage (from backend/):
+    python -m benchmarks.chat_streaming --first-token-ms 300 --token-ms 20
+
+Uses the real RAG chain with a fake LLM and a fake vector store, so the numbers
+show chain overhead plus the simulated model latency, not Gemini's.
+"""
+import argparse
+import asyncio
+import time
+from benchmarks.fakes import FakeStreamingLLM, FakeVectorStore
+
+
+async def measure(args):
+    from app.services.rag_pipeline import RAGPipeline
+
+    llm = FakeStreamingLLM(first_token_latency=args.first_token_ms / 1000, token_latency=args.token_ms / 1000)
+    pipeline = RAGPipeline(llm=llm, vector_store=FakeVectorStore())
+    # The same question repeats every run; measure the model path, not cache hits.
+    pipeline.answer_cache = None
+    question = dict(question="What is the refund policy?", user_id="bench", document_id="doc")
+
+    blocking, sources, first_token, total = [], [], [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        await pipeline.aanswer(**question)
+        blocking.append(time.perf_counter() - start)
+
+        start, seen_sources, seen_token = time.perf_counter(), None, None
+        async for chunk in pipeline.astream(**question):
+            now = time.perf_counter() - start
+            if "docs" in chunk and seen_sources is None:
+                seen_sources = now
+            if chunk.get("answer") and seen_token is None:
+                seen_token = now
+        total.append(time.perf_counter() - start)
+        sources.append(seen_sources)
+        first_token.append(seen_token)
+
+    mean = lambda values: 1000 * sum(values) / len(values)
+    print(f"blocking ainvoke, full answer:  {mean(blocking):8.1f} ms")
+    print(f"streaming, sources event:       {mean(sources):8.1f} ms")
+    print(f"streaming, first token:         {mean(first_token):8.1f} ms")
+    print(f"streaming, last token:          {mean(total):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--runs", type=int, default=10)
+    asyncio.run(measure(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Chunk write throughput, per-document query cost with and without the compound
+index, and an orphan check for the delete and replace paths.
+
+Usage (from backend/):
+    python -m benchmarks.chunk_writes --documents 50 --chunks 400
+    python -m benchmarks.chunk_writes --mongo-uri mongodb://localhost:27017
+
+Runs against mongomock by default; mongomock ignores indexes, so the query plan
+comparison (documents examined, IXSCAN vs COLLSCAN) is only printed against a
+real mongod. Writes go to a throwaway database that is dropped afterwards.
+"""
+import argparse
+import time
+import uuid
+import mongomock
+import numpy as np
+from loguru import logger
+from pymongo import MongoClient
+from langchain.docstore.document import Document
+from benchmarks.fakes import FakeEmbeddings
+
+
+def build_store(args):
+    from app.services.vector_index import VectorIndexCache
+    from app.services.vector_store import MongoVectorStore
+    from mongomock_motor import AsyncMongoMockClient
+
+    if args.mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client, async_client = MongoClient(args.mongo_uri), AsyncIOMotorClient(args.mongo_uri)
+    else:
+        client = mongomock.MongoClient()
+        async_client = AsyncMongoMockClient(mock_mongo_client=client)
+    store = MongoVectorStore(client=client, async_client=async_client)
+
+    # Point every collection at a scratch database.
+    database = f"bench_{uuid.uuid4().hex[:8]}"
+    store.db = client.get_database(database)
+    store.collection = store.db.get_collection("document_embeddings_hf")
+    store.ann_collection = store.db.get_collection("vector_indexes")
+    store.embedding_model = FakeEmbeddings(dim=args.dim)
+    store.index_cache = VectorIndexCache(max_bytes=0)
+    return store, client, database
+
+
+def chunks_for(document: int, count: int) -> list[Document]:
+    return [Document(page_content=f"doc {document} chunk {i}", metadata={"page": i // 4}) for i in range(count)]
+
+
+def embed(store, documents: list[Document]):
+    return store.embedding_model.embed_documents([doc.page_content for doc in documents])
+
+
+def timed_writes(store, args, batched: bool) -> float:
+    from app.core.config import settings
+
+    store.collection.drop()
+    batch_size = settings.MONGO_WRITE_BATCH_SIZE
+    settings.MONGO_WRITE_BATCH_SIZE = batch_size if batched else 10 ** 9
+    elapsed = 0.0
+    try:
+        for d in range(args.documents):
+            documents = chunks_for(d, args.chunks)
+            embeddings = embed(store, documents)
+            start = time.perf_counter()
+            chunks = store._build_chunks(documents, embeddings, "bench", f"doc-{d}", None)
+            for batch in store._write_batches(chunks):
+                store.collection.insert_many(batch, ordered=not batched)
+            elapsed += time.perf_counter() - start
+    finally:
+        settings.MONGO_WRITE_BATCH_SIZE = batch_size
+    return elapsed
+
+
+def query_cost(store, repeats: int = 20):
+    query = store._chunk_query("bench", "doc-7")
+    start = time.perf_counter()
+    for _ in range(repeats):
+        list(store.collection.find(query, {"_id": 1}))
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+    plan = None
+    if isinstance(store.collection, mongomock.Collection):
+        return elapsed_ms, plan
+    stats = store.collection.find(query).explain()["executionStats"]
+    return elapsed_ms, (stats["totalDocsExamined"], stats["executionStages"].get("inputStage", stats["executionStages"]).get("stage"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=400)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+
+    logger.remove()
+    store, client, database = build_store(args)
+    total = args.documents * args.chunks
+    try:
+        single = timed_writes(store, args, batched=False)
+        batched = timed_writes(store, args, batched=True)
+        print(f"write {total} chunks, one insert_many per document:  {single * 1000:9.1f} ms")
+        print(f"write {total} chunks, unordered bounded batches:     {batched * 1000:9.1f} ms")
+
+        elapsed_ms, plan = query_cost(store)
+        store.ensure_indexes()
+        indexed_ms, indexed_plan = query_cost(store)
+        print(f"one document's chunks, no index:     {elapsed_ms:8.2f} ms" + (f"  examined={plan[0]} {plan[1]}" if plan else ""))
+        print(f"one document's chunks, with index:   {indexed_ms:8.2f} ms" + (f"  examined={indexed_plan[0]} {indexed_plan[1]}" if indexed_plan else ""))
+
+        # Replace doc-3 with a new revision, then delete doc-4 outright.
+        revision = str(uuid.uuid4())
+        documents = chunks_for(3, args.chunks // 2)
+        store.add_documents(documents, "bench", "doc-3", revision=revision)
+        store.delete_document("bench", "doc-3", keep_revision=revision)
+        store.delete_document("bench", "doc-4")
+        remaining = store.collection.count_documents({"metadata.document_id": "doc-3"})
+        stale = store.collection.count_documents({"metadata.document_id": "doc-3", "revision": {"$ne": revision}})
+        deleted = store.collection.count_documents({"metadata.document_id": "doc-4"})
+        print(f"replace doc-3: {remaining} chunks (expected {len(documents)}), {stale} from the old revision")
+        print(f"delete doc-4:  {deleted} chunks left")
+    finally:
+        client.drop_database(database)
+
+
+if __name__ == "__main__":
+    main()
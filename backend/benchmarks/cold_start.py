@@ -0,0 +1,68 @@
+"""
+Cold-start cost of the API: how long `import app.main` takes in a fresh
+interpreter, and which imports dominate it, from `python -X importtime`.
+
+Usage (from backend/):
+    python -m benchmarks.cold_start --runs 5 --top 15
+
+Each run starts a new interpreter, so nothing is shared between runs except
+the OS file cache (the first run is discarded as a warm-up). Reports the
+median wall time of the process and of the app.main import, then the
+imports with the largest cumulative time in the median run. Also reports
+whether importing created any lifecycle resources (it should not).
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+PROBE = (
+    "import app.main\n"
+    "from app.core import lifecycle\n"
+    "print('created:', [r.name for r in lifecycle._created])\n"
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """
+    Returns {module: (self us, cumulative us)} from -X importtime output.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once() -> tuple[float, dict, str]:
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr), result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    run_once()
+    runs = sorted((run_once() for _ in range(args.runs)), key=lambda run: run[1]["app.main"][1])
+    wall, modules, probe_output = runs[len(runs) // 2]
+
+    print(f"process wall time (median of {args.runs}): {statistics.median(r[0] for r in runs):.3f} s")
+    print(f"import app.main (median):               {modules['app.main'][1] / 1e6:.3f} s")
+    print(probe_output)
+    print(f"\n{'cumulative':>11} {'self':>9}  module")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{cumulative_us / 1000:9.1f}ms {self_us / 1000:7.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
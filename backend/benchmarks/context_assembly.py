@@ -0,0 +1,91 @@
+"""
+Prompt size and stub-LLM latency with the old format_docs context versus the
+ContextBuilder, for several retrieval depths.
+
+Usage (from backend/):
+    python -m benchmarks.context_assembly --pages 40 --prefill-us 150 --budget 1500
+
+Pages are split with the production splitter (1000 characters, 200 overlap).
+Retrieval is simulated the way it behaves on real questions: the top hits
+cluster around a few relevant spots, so neighbouring chunks come back
+together, and a boilerplate paragraph repeated on every page (a disclaimer,
+say) shows up several times. Tokens are estimated at four characters each;
+the stub LLM charges --prefill-us per prompt token before its first token.
+"""
+import argparse
+import asyncio
+import random
+import time
+from langchain.docstore.document import Document
+from benchmarks.fakes import FakeStreamingLLM
+
+BOILERPLATE = ("This document is provided for information only and does not constitute legal advice. "
+               "Terms are subject to change without notice; consult the latest revision before relying on it. ")
+
+
+def make_chunks(pages: int, rnd: random.Random) -> list[list[Document]]:
+    from app.services.pdf_loader import PDFLoader
+
+    vocabulary = "refund return policy receipt warranty shipping invoice customer order period days item store credit".split()
+    by_page = []
+    for page in range(pages):
+        body = " ".join(rnd.choice(vocabulary) for _ in range(700))
+        text = BOILERPLATE * 2 + body
+        by_page.append(PDFLoader().text_splitter.split_documents(
+            [Document(page_content=text, metadata={"page": page, "document_id": "doc"})]
+        ))
+    return by_page
+
+
+def simulate_retrieval(by_page: list[list[Document]], k: int, rnd: random.Random) -> list[Document]:
+    hits = []
+    hot_pages = rnd.sample(range(len(by_page)), 3)
+    while len(hits) < k:
+        page = by_page[rnd.choice(hot_pages)]
+        centre = rnd.randrange(len(page))
+        for chunk in page[max(0, centre - 1):centre + 2]:
+            if chunk not in hits:
+                hits.append(chunk)
+    return hits[:k]
+
+
+async def run(args):
+    from app.services.context_builder import ContextBuilder
+    from app.services.rag_pipeline import PROMPT_TEMPLATE, format_docs
+    from app.services.tokens import estimate_tokens
+    from langchain_core.prompts import ChatPromptTemplate
+
+    rnd = random.Random(0)
+    by_page = make_chunks(args.pages, rnd)
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    llm = FakeStreamingLLM(first_token_latency=0.05, token_latency=0, prompt_token_latency=args.prefill_us / 1e6)
+    chain = prompt | llm
+    builder = ContextBuilder(token_budget=args.budget)
+
+    print(f"{'k':>3} {'format_docs tokens':>19} {'builder tokens':>15} {'format_docs ms':>15} {'builder ms':>11} {'build us':>9}")
+    for k in (3, 5, 10, 20):
+        docs = simulate_retrieval(by_page, k, rnd)
+        start = time.perf_counter()
+        built = builder.build(docs)
+        build_us = (time.perf_counter() - start) * 1e6
+
+        row = []
+        for context in (format_docs(docs), built):
+            messages = prompt.format_messages(context=context, question="What is the refund period?")
+            tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+            start = time.perf_counter()
+            await chain.ainvoke({"context": context, "question": "What is the refund period?"})
+            row.append((tokens, (time.perf_counter() - start) * 1000))
+        print(f"{k:3d} {row[0][0]:19d} {row[1][0]:15d} {row[0][1]:15.1f} {row[1][1]:11.1f} {build_us:9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--prefill-us", type=float, default=150)
+    parser.add_argument("--budget", type=int, default=1500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Embedding client throughput against a local stub feature-extraction server.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_client --chunks 2000 --latency-ms 50 --error-rate 0.05
+
+The stub answers like the Hugging Face endpoint, sleeps for a fixed latency per
+request and fails a fraction of requests with 429/503 to exercise the retry path.
+Throughput is reported in chunks per second for each batch size / concurrency pair.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.services.embeddings import EmbeddingClient, HuggingFaceInferenceProvider
+
+DIM = 384
+
+
+def stub_vector(text: str) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(DIM)]
+
+
+def make_handler(latency: float, error_rate: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_response(random.choice([429, 503]))
+                self.end_headers()
+                return
+            payload = json.dumps([stub_vector(text) for text in body["inputs"]]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+async def run(url: str, texts: list[str], batch_size: int, concurrency: int) -> float:
+    provider = HuggingFaceInferenceProvider("stub", url)
+    client = EmbeddingClient(provider, batch_size=batch_size, max_concurrency=concurrency,
+                             backoff_base=0.05, backoff_max=0.5)
+    start = time.perf_counter()
+    vectors = await client.aembed_documents(texts)
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+    assert len(vectors) == len(texts)
+    return len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.latency_ms / 1000, args.error_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    texts = [f"chunk {i} " * 20 for i in range(args.chunks)]
+
+    print(f"{'batch':>6}{'concurrency':>13}{'chunks/s':>12}")
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            rate = asyncio.run(run(url, texts, batch_size, concurrency))
+            print(f"{batch_size:>6}{concurrency:>13}{rate:>12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
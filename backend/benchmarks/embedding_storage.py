@@ -0,0 +1,81 @@
+"""
+Bytes on the wire and decode time for chunk embeddings stored as BSON float
+arrays versus packed float32 / float16 / int8 binary.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_storage --chunks 20000 --dim 384
+
+Chunks are BSON-encoded and decoded in process, which is what the driver does
+with every document a find() returns, so the sizes are what crosses the wire.
+Each chunk carries ~700 bytes of text and metadata besides its embedding.
+The legacy format builds the matrix from Python lists, as the retriever used
+to; packed formats decode via np.frombuffer. Also reports top-5 agreement with
+exact float32 scores for the quantized formats.
+"""
+import argparse
+import time
+import bson
+import numpy as np
+from app.services.embedding_codec import decode_embeddings, encode_embedding
+from app.services.vector_index import ExactIndex
+
+
+def make_chunks(vectors: np.ndarray, dtype):
+    chunks = []
+    for i, vector in enumerate(vectors):
+        chunk = {
+            "_id": bson.ObjectId(),
+            "text": f"Chunk {i}: " + "lorem ipsum " * 60,
+            "metadata": {"user_id": "bench", "document_id": "doc", "page": i // 4, "source": "handbook.pdf"},
+        }
+        if dtype is None:
+            chunk["embedding"] = vector.tolist()
+        else:
+            chunk.update(encode_embedding(vector, dtype))
+        chunks.append(chunk)
+    return chunks
+
+
+def measure(chunks: list[dict], vectors_only: bool):
+    payloads = [bson.encode(chunk) for chunk in chunks]
+    start = time.perf_counter()
+    decoded = [bson.decode(payload) for payload in payloads]
+    if vectors_only:
+        matrix = np.array([chunk["embedding"] for chunk in decoded], dtype=np.float32)
+    else:
+        matrix = decode_embeddings(decoded)
+    elapsed = time.perf_counter() - start
+    return sum(len(payload) for payload in payloads), elapsed, matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    documents = [None] * args.chunks
+
+    baseline = ExactIndex(vectors, documents)
+    expected = [set(np.argsort(baseline.matrix @ (q / np.linalg.norm(q)))[-5:]) for q in queries]
+
+    print(f"{'format':22} {'MB read':>9} {'decode ms':>10} {'top-5 agreement':>16}")
+    for label, dtype in (
+        ("legacy float array", None),
+        ("float32 binary", "float32"),
+        ("float16 binary", "float16"),
+        ("int8 binary", "int8"),
+    ):
+        size, elapsed, matrix = measure(make_chunks(vectors, dtype), vectors_only=dtype is None)
+        index = ExactIndex(matrix, documents)
+        found = [set(np.argsort(index.matrix @ (q / np.linalg.norm(q)))[-5:]) for q in queries]
+        agreement = np.mean([len(a & b) / 5 for a, b in zip(found, expected)])
+        print(f"{label:22} {size / 1e6:9.1f} {elapsed * 1000:10.1f} {agreement:16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Deterministic stand-ins for the LLM, embedding backend and vector store used
+by the benchmarks.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+import numpy as np
+from langchain.docstore.document import Document
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from app.services.embeddings import EmbeddingProvider
+
+
+class FakeStreamingLLM(BaseChatModel):
+    """
+    Chat model that answers with a fixed text after `first_token_latency`
+    seconds, then emits one word every `token_latency` seconds. Set
+    `prompt_token_latency` to also charge per estimated prompt token before
+    the first token, the way prefill time grows with prompt size.
+    """
+    answer: str = "The refund policy allows returns within thirty days of purchase with a receipt."
+    first_token_latency: float = 0.3
+    token_latency: float = 0.02
+    prompt_token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> list[str]:
+        words = self.answer.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _prefill(self, messages: list[BaseMessage]) -> float:
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        return self.first_token_latency + self.prompt_token_latency * (prompt_chars // 4)
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._prefill(messages) + self.token_latency * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._prefill(messages) + self.token_latency * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens()):
+            time.sleep(self._prefill(messages) if i == 0 else self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens()):
+            await asyncio.sleep(self._prefill(messages) if i == 0 else self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeSummarizingLLM(BaseChatModel):
+    """
+    Chat model that "summarizes" by echoing the first `words` words of the
+    prompt's last paragraph after `latency` seconds, and counts its calls.
+    """
+    latency: float = 0.2
+    words: int = 30
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-summarizing"
+
+    def get_num_tokens(self, text: str) -> int:
+        return len(text) // 4 + 1
+
+    def _reply(self, messages: list[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        paragraphs = [p for p in str(messages[-1].content).split("\n\n") if p.strip()]
+        body = paragraphs[-2] if len(paragraphs) > 1 else paragraphs[-1]
+        text = " ".join(body.split()[:self.words])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: Optional[list[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+class FakeEmbeddings:
+    """
+    Deterministic unit vectors derived from the text hash.
+    """
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_name = "fake"
+
+    def embed_query(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).normal(size=self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return self.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+    async def aclose(self):
+        pass
+
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """
+    FakeEmbeddings behind the EmbeddingProvider interface, so the real
+    EmbeddingClient batching runs. Each batch takes `latency` seconds.
+    """
+    def __init__(self, dim: int = 384, latency: float = 0.0):
+        self.model_name = "fake"
+        self.latency = latency
+        self._embeddings = FakeEmbeddings(dim)
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency)
+        return self._embeddings.embed_documents(texts)
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.latency)
+        return self._embeddings.embed_documents(texts)
+
+
+class FakeVectorStore:
+    """
+    Returns k fixed chunks for any query without touching MongoDB.
+    """
+    def __init__(self):
+        self.embedding_model = FakeEmbeddings()
+        self.change_listeners = []
+
+    def sync_document(self, user_id: str, document_id: str = None):
+        pass
+
+    def similarity_search(self, query: str, user_id: str, document_id: str = None, k: int = 5,
+                          query_embedding=None) -> list[Document]:
+        return [
+            Document(page_content=f"Chunk {i}: returns are accepted within thirty days.", metadata={"page": i, "similarity_score": 0.9 - i / 100})
+            for i in range(k)
+        ]
+
+    async def asimilarity_search(self, query: str, user_id: str, document_id: str = None, k: int = 5,
+                                 query_embedding=None) -> list[Document]:
+        return self.similarity_search(query, user_id, document_id, k, query_embedding)
+
+    async def abatch_similarity_search(self, queries: list[str], query_embeddings, user_id: str,
+                                       document_id: str, k: int = 5) -> list[list[Document]]:
+        return [self.similarity_search(query, user_id, document_id, k) for query in queries]
@@ -0,0 +1,74 @@
+"""
+Exact-identifier recall and latency of vector-only versus hybrid (vector + BM25
+with reciprocal rank fusion) retrieval.
+
+Usage (from backend/):
+    python -m benchmarks.hybrid_retrieval --chunks 5000 --queries 200
+
+Chunks are boilerplate prose, each mentioning one part number such as
+"PX-40213"; every query asks for one part number. Embeddings come from the
+hash-based fake embedder, so the vector side carries no meaning here: the recall
+numbers isolate what the keyword side adds, and the latency numbers show what
+hybrid mode costs on top of the vector search. Runs against mongomock with
+warm index caches.
+"""
+import argparse
+import asyncio
+import random
+import time
+import mongomock
+import numpy as np
+from loguru import logger
+from mongomock_motor import AsyncMongoMockClient
+from langchain.docstore.document import Document
+from benchmarks.fakes import FakeEmbeddings
+
+
+async def run(args):
+    from app.core.config import settings
+    from app.services.vector_store import MongoVectorStore
+
+    client = mongomock.MongoClient()
+    store = MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model = FakeEmbeddings(dim=args.dim)
+
+    rnd = random.Random(0)
+    codes = [f"PX-{rnd.randrange(10000, 99999)}" for _ in range(args.chunks)]
+    texts = [
+        f"Section {i // 20}. Inspect the assembly and replace part {code} if the seal is worn. "
+        "Torque the fasteners to specification and record the service interval."
+        for i, code in enumerate(codes)
+    ]
+    documents = [Document(page_content=text, metadata={"page": i // 4}) for i, text in enumerate(texts)]
+    await store.aadd_documents(documents, "bench", "doc")
+    await store.asave_keyword_index("bench", "doc", texts, list(range(len(texts))))
+
+    targets = rnd.sample(range(args.chunks), args.queries)
+    for mode in ("vector", "hybrid"):
+        settings.RETRIEVAL_MODE = mode
+        await store.asimilarity_search("warm up", "bench", "doc", k=args.k)
+        found, latencies = 0, []
+        for target in targets:
+            question = f"Which step mentions {codes[target]}?"
+            query_embedding = await store.embedding_model.aembed_query(question)
+            start = time.perf_counter()
+            results = await store.asimilarity_search(question, "bench", "doc", k=args.k, query_embedding=query_embedding)
+            latencies.append(time.perf_counter() - start)
+            found += any(doc.metadata["chunk_index"] == target for doc in results)
+        print(f"{mode:7} recall@{args.k}: {found / len(targets):6.3f}   "
+              f"p50 {1000 * np.percentile(latencies, 50):6.2f} ms   p99 {1000 * np.percentile(latencies, 99):6.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Chat throughput of the gunicorn deployment as the number of worker
+processes grows, on one machine and fully offline.
+
+Usage (from backend/):
+    python -m benchmarks.multiworker --workers 1 2 4 --requests 2000 --concurrency 64
+
+For each worker count, gunicorn is started with gunicorn.conf.py and a fresh
+SHARED_INDEX_DIR. Each worker builds the app around:
+- a mongomock store, seeded with the same --chunks chunks under the same
+  _ids, so the workers publish and map one shared embedding matrix as they
+  would against a real MongoDB;
+- hash-based embeddings;
+- FakeStreamingLLM, with --llm-first-token-ms and --llm-token-ms.
+
+Once every worker has seeded its store, --warmup requests load the indexes
+everywhere. Then --requests distinct questions are sent to /api/v1/chat,
+--concurrency at a time, with a real HS256 token.
+
+Reported per worker count:
+- requests/s, and the speedup over the first worker count;
+- p50/p95 latency;
+- the proportional set size (PSS) of master and workers together, in
+  which pages mapped by several workers are shared between them.
+
+The LLM latencies default to 0, so requests are CPU-bound (auth, retrieval,
+scoring, serialization) and throughput can only grow with cores; on a
+machine with fewer cores than workers expect no speedup. The load generator
+is a single asyncio process on the same machine and takes cores of its own.
+"""
+import argparse
+import asyncio
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.pdf_parsing import LOREM
+from benchmarks.suite import USER_ID, percentile_ms, questions
+
+DOCUMENT_ID = "bench-document"
+
+
+def create_app():
+    """
+    gunicorn app factory for one worker; configured from BENCH_* variables.
+    """
+    import mongomock
+    from loguru import logger
+    from mongomock_motor import AsyncMongoMockClient
+    from langchain.docstore.document import Document
+    from app.main import app
+    from app.services import rag_pipeline, vector_store
+    from benchmarks.fakes import FakeEmbeddingProvider, FakeEmbeddings, FakeStreamingLLM
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    dim, chunks = int(os.environ["BENCH_DIM"]), int(os.environ["BENCH_CHUNKS"])
+
+    client = mongomock.MongoClient()
+    store = vector_store.MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model.client.provider = FakeEmbeddingProvider(dim=dim)
+    texts = [LOREM.format(page=i // 4, para=i % 4) for i in range(chunks)]
+    documents = [Document(page_content=text, metadata={"page": i // 4, "total_pages": chunks // 4 + 1})
+                 for i, text in enumerate(texts)]
+    records = store._build_chunks(documents, FakeEmbeddings(dim).embed_documents(texts), USER_ID, DOCUMENT_ID, None)
+    for i, record in enumerate(records):
+        record["_id"] = f"{DOCUMENT_ID}:{i}"
+    store.collection.insert_many(records)
+    store.save_keyword_index(USER_ID, DOCUMENT_ID, texts, list(range(chunks)))
+    vector_store._vector_store.set(store)
+
+    llm = FakeStreamingLLM(first_token_latency=float(os.environ["BENCH_LLM_FIRST_TOKEN"]),
+                           token_latency=float(os.environ["BENCH_LLM_TOKEN"]))
+    rag_pipeline._rag_pipeline.set(rag_pipeline.RAGPipeline(llm=llm, vector_store=store))
+
+    with open(os.path.join(os.environ["BENCH_READY_DIR"], str(os.getpid())), "w"):
+        pass
+    return app
+
+
+def pss_mb(pid: int) -> float:
+    """
+    Proportional set size of a process and its descendants, from /proc.
+    """
+    total = 0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as smaps:
+                total += next(int(line.split()[1]) for line in smaps if line.startswith("Pss:"))
+            for children in glob.glob(f"/proc/{current}/task/*/children"):
+                with open(children) as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+async def drive(args, port: int) -> dict:
+    from httpx import AsyncClient, Limits
+    from jose import jwt
+
+    now = int(time.time())
+    token = jwt.encode(
+        {"sub": USER_ID, "aud": "authenticated", "role": "authenticated", "iat": now, "exp": now + 3600},
+        # The secret the workers verify with: the environment's, or the benchmarks' placeholder.
+        os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256",
+    )
+    async with AsyncClient(base_url=f"http://127.0.0.1:{port}", headers={"Authorization": f"Bearer {token}"},
+                           limits=Limits(max_connections=args.concurrency), timeout=None) as http:
+        async def ask(question: str) -> float:
+            started = time.perf_counter()
+            response = await http.post("/api/v1/chat", json={"question": question, "document_id": DOCUMENT_ID})
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        async def run(pending) -> list[float]:
+            latencies = []
+
+            async def worker():
+                for question in pending:
+                    latencies.append(await ask(question))
+
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            return latencies
+
+        await run(iter(questions(args.warmup, args.chunks // 4 + 1, args.seed + 1)))
+        start = time.perf_counter()
+        latencies = await run(iter(questions(args.requests, args.chunks // 4 + 1, args.seed)))
+        elapsed = time.perf_counter() - start
+    return {
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+    }
+
+
+def run_workers(args, workers: int, port: int) -> dict:
+    ready_dir, shared_dir = tempfile.mkdtemp(), tempfile.mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers), "PORT": str(port), "SHARED_INDEX_DIR": shared_dir,
+        "BENCH_READY_DIR": ready_dir, "BENCH_DIM": str(args.dim), "BENCH_CHUNKS": str(args.chunks),
+        "BENCH_LLM_FIRST_TOKEN": str(args.llm_first_token_ms / 1000), "BENCH_LLM_TOKEN": str(args.llm_token_ms / 1000),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning",
+         "benchmarks.multiworker:create_app()"],
+        env=env,
+    )
+    try:
+        deadline = time.monotonic() + args.start_timeout
+        while len(os.listdir(ready_dir)) < workers:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {server.returncode}.")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{workers} workers did not start within {args.start_timeout}s.")
+            time.sleep(0.1)
+        # The socket accepts connections once a worker has loaded the app; give the last one a moment.
+        time.sleep(1.0)
+        result = asyncio.run(drive(args, port))
+        result["pss_mb"] = pss_mb(server.pid)
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(ready_dir, ignore_errors=True)
+        shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0)
+    parser.add_argument("--llm-token-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--start-timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.chunks} chunks, {args.requests} requests at concurrency {args.concurrency}")
+    print(f"{'workers':>7}{'req/s':>9}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'PSS MB':>9}")
+    first = None
+    for workers in args.workers:
+        result = run_workers(args, workers, args.port)
+        first = first or result["requests_per_sec"]
+        print(f"{workers:>7}{result['requests_per_sec']:>9.1f}{result['requests_per_sec'] / first:>9.2f}"
+              f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['pss_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
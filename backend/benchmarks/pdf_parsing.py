@@ -0,0 +1,99 @@
+"""
+Peak RSS and pages/sec for the in-memory and streaming PDF parsing paths.
+
+Usage (from backend/):
+    python -m benchmarks.pdf_parsing --pages 1000
+
+Each mode runs in a fresh subprocess so its peak RSS is measured in isolation;
+the largest parser worker's peak RSS is reported separately.
+The fixture is generated with PyMuPDF and cached under benchmarks/.fixtures/.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import fitz
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), ".fixtures")
+LOREM = (
+    "Section {page}.{para}: The operator shall inspect the assembly before each shift. "
+    "Torque values for fastener class B are listed in table 4-{para}. Error code E{page:04d} "
+    "indicates a sensor fault; replace part PN-{page}-{para} and reset the controller. "
+)
+
+
+def make_fixture(pages: int) -> str:
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    path = os.path.join(FIXTURE_DIR, f"synthetic_{pages}.pdf")
+    if not os.path.exists(path):
+        pdf = fitz.open()
+        for page_number in range(pages):
+            page = pdf.new_page()
+            text = "".join(LOREM.format(page=page_number, para=p) for p in range(12))
+            page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=9)
+        pdf.save(path)
+        pdf.close()
+    return path
+
+
+def run_mode(mode: str, path: str) -> dict:
+    from app.services.pdf_loader import PDFLoader
+
+    loader = PDFLoader()
+    start = time.perf_counter()
+    if mode == "in-memory":
+        chunks = len(loader.load_and_chunk_file(path))
+    else:
+        async def consume():
+            # Stand in for the embedding stage: drop each batch once it has been seen.
+            count = 0
+            async for documents, _ in loader.astream_chunks(path):
+                count += len(documents)
+            return count
+        chunks = asyncio.run(consume())
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if mode == "streaming":
+        from app.services.pdf_loader import get_parser_pool
+        get_parser_pool().shutdown()
+    worker_peak_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {
+        "mode": mode,
+        "pages": loader.page_count,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "pages_per_sec": loader.page_count / elapsed,
+        "peak_rss_mb": peak_kb / 1024,
+        "worker_peak_rss_mb": worker_peak_kb / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--mode", choices=["in-memory", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.path)))
+        return
+
+    path = make_fixture(args.pages)
+    print(f"{'mode':<12}{'pages':>7}{'chunks':>8}{'pages/s':>10}{'peak RSS MB':>13}{'worker RSS MB':>15}")
+    for mode in ["in-memory", "streaming"]:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.pdf_parsing", "--mode", mode, "--path", path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<12}{result['pages']:>7}{result['chunks']:>8}{result['pages_per_sec']:>10.1f}{result['peak_rss_mb']:>13.1f}{result['worker_peak_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Per-request overhead of rebuilding the RAG chain versus reusing the prebuilt one,
+and serial ainvoke versus abatch for several questions.
+
+Usage (from backend/):
+    python -m benchmarks.rag_chain_overhead --requests 500 --batch 20 --llm-ms 200
+
+The overhead runs use a zero-latency fake LLM so only LangChain's own cost is
+measured. The batch run uses --llm-ms of simulated model latency.
+"""
+import argparse
+import asyncio
+import time
+from langchain_core.prompts import ChatPromptTemplate
+from benchmarks.fakes import FakeStreamingLLM, FakeVectorStore
+
+
+async def per_request_overhead(requests: int):
+    from app.services.rag_pipeline import PROMPT_TEMPLATE, RAGPipeline
+
+    pipeline = RAGPipeline(llm=FakeStreamingLLM(first_token_latency=0, token_latency=0), vector_store=FakeVectorStore())
+    inputs = pipeline.build_input("What is the refund policy?", user_id="bench", document_id="doc")
+
+    def rebuilt_chain():
+        # What every /chat request used to do: parse the template and rebuild the graph.
+        pipeline.prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+        return pipeline._build_chain()
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        rebuilt_chain()
+    build_only = (time.perf_counter() - start) / requests
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await rebuilt_chain().ainvoke(inputs)
+    before = (time.perf_counter() - start) / requests
+
+    chain = pipeline._build_chain()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await chain.ainvoke(inputs)
+    after = (time.perf_counter() - start) / requests
+
+    print(f"chain construction only:        {build_only * 1e6:9.0f} us/request")
+    print(f"rebuild per request (before):   {before * 1e6:9.0f} us/request")
+    print(f"prebuilt chain (after):         {after * 1e6:9.0f} us/request")
+
+
+async def batch_vs_serial(batch: int, llm_ms: float):
+    from app.services.rag_pipeline import RAGPipeline
+
+    llm = FakeStreamingLLM(first_token_latency=llm_ms / 1000, token_latency=0)
+    pipeline = RAGPipeline(llm=llm, vector_store=FakeVectorStore())
+    inputs = [pipeline.build_input(f"Question {i}?", user_id="bench", document_id="doc") for i in range(batch)]
+
+    start = time.perf_counter()
+    for item in inputs:
+        await pipeline.chain.ainvoke(item)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await pipeline.abatch(inputs)
+    batched = time.perf_counter() - start
+
+    print(f"{batch} questions, serial ainvoke:  {serial * 1000:9.1f} ms")
+    print(f"{batch} questions, abatch:          {batched * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--llm-ms", type=float, default=200)
+    args = parser.parse_args()
+    asyncio.run(per_request_overhead(args.requests))
+    asyncio.run(batch_vs_serial(args.batch, args.llm_ms))
+
+
+if __name__ == "__main__":
+    main()
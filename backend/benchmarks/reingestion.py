@@ -0,0 +1,125 @@
+"""
+Cost of re-uploading a revised PDF: full re-ingestion versus the incremental
+replace that keeps unchanged chunks and reuses stored embeddings.
+
+Usage (from backend/):
+    python -m benchmarks.reingestion --pages 200 --changed 2 --embed-latency-ms 50
+
+The revision edits --changed evenly spaced pages of the original, which
+shifts the chunk ordinals after each edit the way a real revision does.
+
+Each mode ingests the original into a fresh mongomock store, then times the
+replace. Modes:
+- full (cold cache): the embedding cache is emptied before the replace.
+- full (warm cache): it keeps the vectors from the first upload.
+- incremental: the cache is emptied as well, so only the diff can save
+  embedding calls.
+
+Reported for the replace: chunks sent to the embedding backend, chunks
+inserted into MongoDB, and (incremental only) chunks moved in place.
+
+mongomock has no transactions, so the incremental replace runs the way it
+does on a standalone server: reused chunks are copied into the hidden new
+revision with their stored embeddings, and show up as inserted rather than
+moved. With transactions, only new text is inserted and reused chunks move
+in place, one $inc per run of shifted chunks.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import fitz
+import mongomock
+from loguru import logger
+from mongomock_motor import AsyncMongoMockClient
+from benchmarks.pdf_parsing import FIXTURE_DIR, LOREM, make_fixture
+
+
+def make_revision(pages: int, changed: int) -> str:
+    path = os.path.join(FIXTURE_DIR, f"synthetic_{pages}_revised_{changed}.pdf")
+    if not os.path.exists(path):
+        edited = set(range(0, pages, max(1, pages // changed))[:changed])
+        pdf = fitz.open(make_fixture(pages))
+        for number in edited:
+            page = pdf[number]
+            page.add_redact_annot(page.rect)
+            page.apply_redactions()
+            text = "Revised. " + "".join(LOREM.format(page=number + 10_000, para=p) for p in range(6))
+            page.insert_textbox(fitz.Rect(40, 40, 560, 800), text, fontsize=9)
+        pdf.save(path)
+        pdf.close()
+    return path
+
+
+async def ingest(pipeline, path: str, replace: bool):
+    from app.services.ingestion import IngestionJob
+
+    # The pipeline removes the file it ingests.
+    handle, copy = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    shutil.copyfile(path, copy)
+    job = IngestionJob(document_id="doc", user_id="bench", filename="revision.pdf", file_path=copy, replace=replace)
+    await pipeline.run(job)
+    return job
+
+
+async def run_mode(args, mode: str, original: str, revision: str):
+    from app.core.config import settings
+    from app.services.embeddings import EmbeddingClient
+    from app.services.ingestion import IngestionPipeline
+    from app.services.vector_store import MongoVectorStore
+    from benchmarks.fakes import FakeEmbeddingProvider
+
+    class CountingProvider(FakeEmbeddingProvider):
+        texts = 0
+
+        async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+            self.texts += len(texts)
+            return await super().aembed_batch(texts)
+
+    client = mongomock.MongoClient()
+    store = MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    provider = CountingProvider(latency=args.embed_latency_ms / 1000)
+    store.embedding_model.client = EmbeddingClient(
+        provider, batch_size=settings.EMBEDDING_BATCH_SIZE, max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+    )
+    pipeline = IngestionPipeline(store)
+    await ingest(pipeline, original, replace=False)
+
+    if mode != "full (warm cache)":
+        store.embedding_cache._memory.clear()
+        store.db.get_collection("embedding_cache").delete_many({})
+    settings.INCREMENTAL_REINGESTION = mode == "incremental"
+    provider.texts = 0
+    positions = {chunk["_id"]: chunk["metadata"] for chunk in store.collection.find({}, {"metadata": 1})}
+    start = time.perf_counter()
+    job = await ingest(pipeline, revision, replace=True)
+    elapsed = time.perf_counter() - start
+    inserted = store.collection.count_documents({"revision": job.revision})
+    moved = sum(1 for chunk in store.collection.find({"revision": {"$ne": job.revision}}, {"metadata": 1})
+                if chunk["metadata"] != positions[chunk["_id"]])
+    print(f"{mode:<20}{elapsed:>9.2f}{job.chunks_total:>8}{provider.texts:>10}{inserted:>10}{moved:>7}")
+
+
+async def run(args):
+    original, revision = make_fixture(args.pages), make_revision(args.pages, args.changed)
+    print(f"{args.pages} pages, {args.changed} changed")
+    print(f"{'mode':<20}{'seconds':>9}{'chunks':>8}{'embedded':>10}{'inserted':>10}{'moved':>7}")
+    for mode in ["full (cold cache)", "full (warm cache)", "incremental"]:
+        await run_mode(args, mode, original, revision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changed", type=int, default=2)
+    parser.add_argument("--embed-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    logger.remove()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
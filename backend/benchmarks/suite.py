@@ -0,0 +1,281 @@
+"""
+End-to-end benchmark of the upload and chat paths through the real FastAPI
+app, fully offline, with results written to JSON for run-to-run comparison.
+
+Usage (from backend/):
+    python -m benchmarks.suite --pages 10 100 1000 --output results.json
+    python -m benchmarks.suite --output after.json --baseline results.json
+
+Each PDF size runs in a fresh subprocess, so the memory figures are not
+mixed between sizes.
+
+Setup in each subprocess:
+- The app is served in-process over httpx's ASGI transport, with its
+  lifespan running.
+- mongomock stands in for MongoDB.
+- A hash-based embedding provider runs behind the real EmbeddingClient and
+  embedding cache, taking --embed-latency-ms per batch.
+- FakeStreamingLLM stands in for Gemini, with --llm-first-token-ms and
+  --llm-token-ms.
+- Requests carry a real HS256 token, so auth runs too.
+
+Steps for each size:
+- A synthetic PDF is generated with PyMuPDF and cached under
+  benchmarks/.fixtures/.
+- It is uploaded through /api/v1/upload, and /documents/{id}/status is
+  polled until ingestion finishes.
+- One warm-up question is asked, then --chat-requests distinct questions are
+  sent to /api/v1/chat, --concurrency at a time.
+
+Reported per size:
+- ingestion pages/s and chunks/s;
+- chat p50/p95/p99 latency and requests/s;
+- RSS after each phase, peak RSS of the API process and of its parser
+  workers, and the index cache size.
+
+Questions are drawn from a seeded RNG and embeddings are deterministic, so
+two runs on the same machine differ only by timing noise. With --baseline,
+each metric is printed next to the baseline's value with the relative
+change.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.pdf_parsing import make_fixture
+
+# Settings that change the numbers, recorded with every run.
+RECORDED_SETTINGS = [
+    "EMBEDDING_BATCH_SIZE", "EMBEDDING_MAX_CONCURRENCY", "EMBEDDING_STORAGE_DTYPE", "MONGO_WRITE_BATCH_SIZE",
+    "INGESTION_MAX_CONCURRENCY", "PDF_PARSE_WORKERS", "PDF_PAGES_PER_TASK", "RETRIEVAL_TOP_K", "RETRIEVAL_MODE",
+    "VECTOR_INDEX_BACKEND", "VECTOR_SEARCH_THREADS", "CONTEXT_TOKEN_BUDGET", "ANSWER_CACHE_ENABLED",
+]
+# Metrics compared against a baseline, and whether a higher value is better.
+COMPARED_METRICS = {
+    "ingestion.pages_per_sec": True,
+    "ingestion.chunks_per_sec": True,
+    "chat.p50_ms": False,
+    "chat.p95_ms": False,
+    "chat.p99_ms": False,
+    "chat.requests_per_sec": True,
+    "memory.peak_rss_mb": False,
+}
+USER_ID = "bench-user"
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size, from /proc where available, else the peak so far.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile_ms(latencies: list[float], q: float) -> float:
+    return float(np.percentile(latencies, q)) * 1000
+
+
+def questions(count: int, pages: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        f"What does section {rng.randrange(pages)}.{rng.randrange(12)} say about torque values? ({i})"
+        for i in range(count)
+    ]
+
+
+async def run_size(args, pages: int, path: str) -> dict:
+    import mongomock
+    from httpx import ASGITransport, AsyncClient
+    from jose import jwt
+    from loguru import logger
+    from mongomock_motor import AsyncMongoMockClient
+    from app.core.config import settings
+    from app.main import app
+    from app.services import rag_pipeline, vector_store
+    from benchmarks.fakes import FakeEmbeddingProvider, FakeStreamingLLM
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    client = mongomock.MongoClient()
+    store = vector_store.MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model.client.provider = FakeEmbeddingProvider(dim=args.dim, latency=args.embed_latency_ms / 1000)
+    vector_store._vector_store.set(store)
+    llm = FakeStreamingLLM(first_token_latency=args.llm_first_token_ms / 1000, token_latency=args.llm_token_ms / 1000)
+    rag_pipeline._rag_pipeline.set(rag_pipeline.RAGPipeline(llm=llm, vector_store=store))
+
+    now = int(time.time())
+    token = jwt.encode(
+        {"sub": USER_ID, "aud": settings.JWT_AUDIENCE, "role": "authenticated", "iat": now, "exp": now + 3600},
+        settings.SUPABASE_JWT_SECRET, algorithm="HS256",
+    )
+    result = {"pages": pages, "memory": {"baseline_rss_mb": rss_mb()}}
+
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench",
+                               headers={"Authorization": f"Bearer {token}"}, timeout=None) as http:
+            start = time.perf_counter()
+            with open(path, "rb") as pdf:
+                response = await http.post("/api/v1/upload", files={"file": ("synthetic.pdf", pdf, "application/pdf")})
+            response.raise_for_status()
+            document_id = response.json()["document_id"]
+            while True:
+                status = (await http.get(f"/api/v1/documents/{document_id}/status")).json()
+                if status["stage"] in ("completed", "failed"):
+                    break
+                if time.perf_counter() - start > args.ingest_timeout:
+                    raise TimeoutError(f"Ingestion of {pages} pages did not finish within {args.ingest_timeout}s.")
+                await asyncio.sleep(args.poll_ms / 1000)
+            elapsed = time.perf_counter() - start
+            if status["stage"] == "failed":
+                raise RuntimeError(f"Ingestion of {pages} pages failed: {status['error']}")
+            chunks = store.collection.count_documents({"metadata.document_id": document_id})
+            result["ingestion"] = {
+                "seconds": elapsed,
+                "chunks": chunks,
+                "pages_per_sec": pages / elapsed,
+                "chunks_per_sec": chunks / elapsed,
+            }
+            result["memory"]["after_ingestion_rss_mb"] = rss_mb()
+
+            async def ask(question: str) -> float:
+                started = time.perf_counter()
+                response = await http.post("/api/v1/chat", json={"question": question, "document_id": document_id})
+                response.raise_for_status()
+                return time.perf_counter() - started
+
+            # The first question loads the document's indexes from MongoDB.
+            first_ms = await ask("What is this document about?") * 1000
+            pending = iter(questions(args.chat_requests, pages, args.seed))
+            latencies = []
+
+            async def worker():
+                for question in pending:
+                    latencies.append(await ask(question))
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+            result["chat"] = {
+                "requests": len(latencies),
+                "concurrency": args.concurrency,
+                "first_request_ms": first_ms,
+                "p50_ms": percentile_ms(latencies, 50),
+                "p95_ms": percentile_ms(latencies, 95),
+                "p99_ms": percentile_ms(latencies, 99),
+                "max_ms": max(latencies) * 1000,
+                "requests_per_sec": len(latencies) / elapsed,
+            }
+            result["memory"].update({
+                "after_chat_rss_mb": rss_mb(),
+                "index_cache_mb": store.index_cache.stats()["bytes"] / 2 ** 20,
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            })
+    # Parser workers have exited with the lifespan, so their peak is now counted.
+    result["memory"]["parser_worker_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    result["settings"] = {name: getattr(settings, name) for name in RECORDED_SETTINGS}
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: list[dict]) -> dict[str, float]:
+    values = {}
+    for result in results:
+        for metric in COMPARED_METRICS:
+            section, name = metric.split(".")
+            values[f"{result['pages']} pages {metric}"] = result[section][name]
+    return values
+
+
+def compare(current: dict, baseline: dict):
+    current_values, baseline_values = flatten(current["results"]), flatten(baseline["results"])
+    print(f"\nagainst baseline {baseline['meta']['commit']} ({baseline['meta']['timestamp']}):")
+    print(f"{'metric':<36}{'baseline':>12}{'current':>12}{'change':>9}")
+    for key, value in current_values.items():
+        if key not in baseline_values:
+            continue
+        before = baseline_values[key]
+        change = (value - before) / before * 100 if before else 0.0
+        better = COMPARED_METRICS[key.split(" pages ")[1]] == (change > 0)
+        marker = "" if abs(change) < 5 else (" +" if better else " !")
+        print(f"{key:<36}{before:>12.1f}{value:>12.1f}{change:>8.1f}%{marker}")
+
+
+def print_result(result: dict):
+    ingestion, chat, memory = result["ingestion"], result["chat"], result["memory"]
+    print(f"{result['pages']:>6} pages  ingestion {ingestion['seconds']:7.2f} s {ingestion['pages_per_sec']:8.1f} pages/s "
+          f"{ingestion['chunks_per_sec']:8.1f} chunks/s | chat p50 {chat['p50_ms']:7.1f} p95 {chat['p95_ms']:7.1f} "
+          f"p99 {chat['p99_ms']:7.1f} ms {chat['requests_per_sec']:6.1f} req/s | peak RSS {memory['peak_rss_mb']:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--chat-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-first-token-ms", type=float, default=50.0)
+    parser.add_argument("--llm-token-ms", type=float, default=2.0)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poll-ms", type=float, default=20.0)
+    parser.add_argument("--ingest-timeout", type=float, default=1800.0)
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", help="Compare against the JSON written by an earlier run.")
+    parser.add_argument("--worker", nargs=2, metavar=("PAGES", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        pages, path = args.worker
+        print(json.dumps(asyncio.run(run_size(args, int(pages), path))))
+        return
+
+    results = []
+    for pages in args.pages:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", *sys.argv[1:], "--worker", str(pages), make_fixture(pages)],
+            check=True, stdout=subprocess.PIPE, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+        print_result(results[-1])
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {name: value for name, value in vars(args).items() if name not in ("output", "baseline", "worker")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
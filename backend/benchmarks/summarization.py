@@ -0,0 +1,70 @@
+"""
+Wall time and LLM calls for summarizing a document with the legacy
+load_summarize_chain("map_reduce") path versus SummarizationEngine, cold and
+after revising a few chunks.
+
+Usage (from backend/):
+    python -m benchmarks.summarization --chunks 200 --llm-ms 200 --changed 5
+
+Uses a fake LLM with fixed latency that echoes part of its input, so wall time
+reflects how many calls are made and how many run at once.
+"""
+import argparse
+import asyncio
+import random
+import time
+from langchain.docstore.document import Document
+from benchmarks.fakes import FakeSummarizingLLM
+
+WORDS = "policy refund shipment invoice warranty clause supplier audit schedule payment delivery contract".split()
+
+
+def make_texts(count: int, rnd: random.Random) -> list[str]:
+    return [f"Part {i}. " + " ".join(rnd.choice(WORDS) for _ in range(150)) for i in range(count)]
+
+
+async def legacy(texts: list[str], llm_ms: float) -> tuple[float, int]:
+    from langchain.chains.summarize import load_summarize_chain
+
+    llm = FakeSummarizingLLM(latency=llm_ms / 1000)
+    chain = load_summarize_chain(llm, chain_type="map_reduce")
+    start = time.perf_counter()
+    await chain.ainvoke({"input_documents": [Document(page_content=text) for text in texts]})
+    return time.perf_counter() - start, llm.calls
+
+
+async def engine_runs(texts: list[str], revised: list[str], llm_ms: float):
+    from app.services.summarizer import SummarizationEngine
+
+    llm = FakeSummarizingLLM(latency=llm_ms / 1000)
+    engine = SummarizationEngine(llm=llm)
+    results = []
+    for run in (texts, revised):
+        calls, start = llm.calls, time.perf_counter()
+        await engine.summarize(run)
+        results.append((time.perf_counter() - start, llm.calls - calls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--llm-ms", type=float, default=200)
+    parser.add_argument("--changed", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    texts = make_texts(args.chunks, rnd)
+    revised = list(texts)
+    for i in rnd.sample(range(args.chunks), args.changed):
+        revised[i] = texts[i] + " Amended."
+
+    elapsed, calls = asyncio.run(legacy(texts, args.llm_ms))
+    print(f"legacy map_reduce chain:           {elapsed:8.2f} s  {calls:5d} LLM calls")
+    (cold, cold_calls), (warm, warm_calls) = asyncio.run(engine_runs(texts, revised, args.llm_ms))
+    print(f"engine, cold:                      {cold:8.2f} s  {cold_calls:5d} LLM calls")
+    print(f"engine, {args.changed} chunks revised:         {warm:8.2f} s  {warm_calls:5d} LLM calls")
+
+
+if __name__ == "__main__":
+    main()
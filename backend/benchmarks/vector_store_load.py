@@ -0,0 +1,108 @@
+"""
+Latency under concurrency for the sync and the async vector-store read paths.
+
+Usage (from backend/):
+    python -m benchmarks.vector_store_load --clients 32 --requests 20 --documents 40 --chunks 2000
+
+Runs against an in-process mock MongoDB (mongomock, mongomock-motor) seeded
+with random embeddings, with the index cache disabled so every request fetches
+chunks and builds its index. "sync" calls similarity_search directly from the
+coroutines, as a blocking driver inside an async handler would; "async" uses
+asimilarity_search. Alongside request latency it reports event-loop lag: how
+late a 5 ms timer fires while the load runs, which is the delay every other
+request on the worker sees. A sync request's own latency excludes the time it
+waited behind others on the blocked loop; that wait shows up as loop lag.
+
+mongomock-motor executes queries on the event loop, whereas Motor hands them to
+its own threads, so the async loop lag here is an upper bound.
+"""
+import argparse
+import asyncio
+import random
+import time
+import mongomock
+import numpy as np
+from loguru import logger
+from mongomock_motor import AsyncMongoMockClient
+from benchmarks.fakes import FakeEmbeddings
+
+
+def build_store(args):
+    from app.services.vector_index import VectorIndexCache
+    from app.services.vector_store import MongoVectorStore
+
+    client = mongomock.MongoClient()
+    store = MongoVectorStore(client=client, async_client=AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model = FakeEmbeddings(dim=args.dim)
+    store.index_cache = VectorIndexCache(max_bytes=0)
+
+    rng = np.random.default_rng(0)
+    for d in range(args.documents):
+        vectors = rng.normal(size=(args.chunks, args.dim)).astype(np.float32)
+        store.collection.insert_many([
+            {"text": f"chunk {i}", "embedding": vector.tolist(),
+             "metadata": {"user_id": "bench", "document_id": f"doc-{d}", "page": i}}
+            for i, vector in enumerate(vectors)
+        ])
+    return store
+
+
+def percentile(values: list[float], p: float) -> float:
+    return 1000 * float(np.percentile(values, p))
+
+
+async def run(store, mode: str, args) -> dict:
+    latencies, lags, done = [], [], asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append(time.perf_counter() - start - 0.005)
+
+    async def client(seed: int):
+        rnd = random.Random(seed)
+        for _ in range(args.requests):
+            document_id = f"doc-{rnd.randrange(args.documents)}"
+            start = time.perf_counter()
+            if mode == "sync":
+                store.similarity_search("refund policy", user_id="bench", document_id=document_id, k=5)
+            else:
+                await store.asimilarity_search("refund policy", user_id="bench", document_id=document_id, k=5)
+            latencies.append(time.perf_counter() - start)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+
+    return {
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "lag_p99": percentile(lags or [0.0], 99),
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    logger.remove()
+    store = build_store(args)
+    print(f"{args.clients} clients x {args.requests} requests, {args.documents} documents x {args.chunks} chunks")
+    print(f"{'mode':6} {'p50 ms':>9} {'p99 ms':>9} {'loop lag p99 ms':>16} {'req/s':>8}")
+    for mode in ("sync", "async"):
+        result = asyncio.run(run(store, mode, args))
+        print(f"{mode:6} {result['p50']:9.1f} {result['p99']:9.1f} {result['lag_p99']:16.1f} {result['throughput']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
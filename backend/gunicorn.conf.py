@@ -0,0 +1,49 @@
+"""
+Multi-worker deployment: one gunicorn master supervising several Uvicorn
+worker processes on one machine.
+
+Usage (from backend/):
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every setting below comes from the environment (or .env), like the app's:
+- WEB_CONCURRENCY: worker processes; 0 or unset means one per CPU core.
+- PORT: the port to bind on all interfaces.
+- SHARED_INDEX_DIR: where workers share embedding matrices and change
+  versions; defaults to a directory on /dev/shm when there is more than one worker.
+  Docker gives /dev/shm 64 MB unless run with a larger --shm-size, so
+  SHARED_INDEX_MAX_MB, the cap on shared matrices, defaults to 48; raise both
+  together, e.g. --shm-size=1g with SHARED_INDEX_MAX_MB=900. Matrices that do
+  not fit under the cap or in the free space are kept per worker.
+
+Ingestion jobs are claimed and tracked in MongoDB, so uploads, status polls,
+summaries and deletes of a document agree whichever worker serves them.
+
+The resolved worker count is exported to the workers, which size their
+MongoDB pool, search threads and PDF parser pool as a share of the machine.
+The app is not preloaded: it starts threads, and forking a threaded process
+is unsafe, so each worker imports it after the fork.
+"""
+import os
+import tempfile
+from dotenv import load_dotenv
+from app.core.scaling import cpu_count
+
+load_dotenv()
+
+workers = int(os.getenv("WEB_CONCURRENCY") or 0) or cpu_count()
+worker_class = "uvicorn_worker.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = False
+# Streamed chat answers can outlast gunicorn's 30 second default.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if workers > 1 and not os.getenv("SHARED_INDEX_DIR"):
+    shared_root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    os.environ["SHARED_INDEX_DIR"] = os.path.join(shared_root, "chat-with-pdf")
+# Keeps NumPy's BLAS from starting a thread per core in every worker.
+threads_per_worker = str(max(1, cpu_count() // workers))
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(variable, threads_per_worker)
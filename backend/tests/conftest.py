@@ -0,0 +1,13 @@
+import os
+
+# Placeholders for the settings the app requires; the tests contact none of them.
+for name, value in {
+    "MONGO_CONNECTION_STRING": "mongodb://localhost:27017",
+    "GOOGLE_GEMINI_API_KEY": "test",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "test",
+    "SUPABASE_JWT_SECRET": "test-secret",
+    "SUPABASE_ANON_KEY": "test",
+    "HUGGINGFACE_API_TOKEN": "test",
+}.items():
+    os.environ.setdefault(name, value)
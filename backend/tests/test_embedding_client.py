@@ -0,0 +1,208 @@
+import asyncio
+import gc
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.services.embeddings import EmbeddingAPIError, EmbeddingClient, HuggingFaceInferenceProvider
+
+
+class StubServer:
+    """
+    Local stand-in for a Hugging Face feature-extraction endpoint. The text
+    "text-<i>" embeds as [i]. Queued failures are served, in order, before
+    any successful answer, as (status, headers) or (status, headers, body);
+    delay(texts) sets how long each request takes.
+    """
+    def __init__(self):
+        self.failures: list[tuple[int, dict]] = []
+        self.delay = lambda texts: 0.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["inputs"]
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    failure = stub.failures.pop(0) if stub.failures else None
+                try:
+                    time.sleep(stub.delay(texts))
+                    if failure is not None:
+                        status, headers, *body = failure
+                        body = body[0] if body else b""
+                        self.send_response(status)
+                        for name, value in headers.items():
+                            self.send_header(name, value)
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+                    payload = json.dumps([[float(text.split("-")[1])] for text in texts]).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub():
+    with StubServer() as server:
+        yield server
+
+
+def make_client(stub: StubServer, **options) -> EmbeddingClient:
+    options = {"batch_size": 4, "max_concurrency": 4, "backoff_base": 0.01, "backoff_max": 5.0, **options}
+    return EmbeddingClient(HuggingFaceInferenceProvider("stub", stub.url), **options)
+
+
+def texts(count: int) -> list[str]:
+    return [f"text-{i}" for i in range(count)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [429, 500, 503])
+async def test_retries_rate_limits_and_server_errors(stub, status):
+    stub.failures = [(status, {}), (status, {})]
+    client = make_client(stub)
+
+    assert await client.aembed_query("text-7") == [7.0]
+    assert stub.requests == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(stub):
+    stub.failures = [(400, {})]
+    client = make_client(stub)
+
+    with pytest.raises(EmbeddingAPIError) as error:
+        await client.aembed_query("text-1")
+    assert error.value.status_code == 400
+    assert stub.requests == 1
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(stub):
+    stub.failures = [(503, {})] * 3
+    client = make_client(stub, max_retries=2)
+
+    with pytest.raises(EmbeddingAPIError) as error:
+        await client.aembed_query("text-1")
+    assert error.value.status_code == 503
+    assert stub.requests == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [b"<html>Bad gateway</html>", b"42", b'{"error": "loading"}', b"[[1.0], [2.0]]"])
+async def test_malformed_success_is_a_retryable_api_error(stub, body):
+    stub.failures = [(200, {"Content-Type": "application/json"}, body)]
+    client = make_client(stub, max_retries=0)
+
+    with pytest.raises(EmbeddingAPIError) as error:
+        await client.aembed_query("text-1")
+    assert error.value.status_code == 502
+    assert error.value.retryable
+
+    stub.failures = [(200, {"Content-Type": "application/json"}, body)]
+    retrying = make_client(stub, max_retries=1)
+    assert await retrying.aembed_query("text-1") == [1.0]
+    await client.aclose()
+    await retrying.aclose()
+
+
+@pytest.mark.asyncio
+async def test_honours_retry_after(stub):
+    stub.failures = [(429, {"Retry-After": "1"})]
+    # Without Retry-After the backoff would be a few milliseconds at most.
+    client = make_client(stub, backoff_base=0.001)
+
+    start = time.perf_counter()
+    assert await client.aembed_query("text-3") == [3.0]
+    assert time.perf_counter() - start >= 0.95
+    assert stub.requests == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_batch_times_out_and_is_retried(stub):
+    stub.delay = lambda batch: 1.0 if stub.requests == 1 else 0.0
+    client = make_client(stub, batch_timeout=0.2)
+
+    start = time.perf_counter()
+    assert await client.aembed_query("text-5") == [5.0]
+    assert time.perf_counter() - start < 0.9
+    assert stub.requests == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_raised_once_retries_run_out(stub):
+    stub.delay = lambda batch: 1.0
+    client = make_client(stub, batch_timeout=0.1, max_retries=0)
+
+    with pytest.raises(EmbeddingAPIError, match="timed out"):
+        await client.aembed_query("text-5")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_preserves_order_across_concurrent_batches(stub):
+    # Later batches finish first.
+    stub.delay = lambda batch: 0.2 - int(batch[0].split("-")[1]) / 200
+    stub.failures = [(503, {})]
+    client = make_client(stub, batch_size=4, max_concurrency=10)
+
+    vectors = await client.aembed_documents(texts(40))
+    assert vectors == [[float(i)] for i in range(40)]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_bounds_concurrent_batches(stub):
+    stub.delay = lambda batch: 0.1
+    client = make_client(stub, batch_size=2, max_concurrency=3)
+
+    vectors = await client.aembed_documents(texts(24))
+    assert len(vectors) == 24
+    assert stub.requests == 12
+    assert stub.max_in_flight == 3
+    await client.aclose()
+
+
+def test_drops_semaphores_of_closed_loops(stub):
+    client = make_client(stub)
+    for _ in range(3):
+        asyncio.run(client.aembed_query("text-1"))
+    gc.collect()
+
+    assert len(client._semaphores) == 0
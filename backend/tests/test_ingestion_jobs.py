@@ -0,0 +1,56 @@
+import time
+import pytest
+from app.services.ingestion import DocumentBusyError, IngestionJob, IngestionJobStore, IngestionStage
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+@pytest.fixture
+def job_store():
+    return IngestionJobStore(mongomock_motor.AsyncMongoMockClient().db.ingestion_jobs, stale_seconds=60)
+
+
+def job(user_id: str = "u", document_id: str = "d") -> IngestionJob:
+    return IngestionJob(document_id=document_id, user_id=user_id, filename="a.pdf", file_path="/tmp/a.pdf")
+
+
+@pytest.mark.asyncio
+async def test_one_claim_per_document_until_released(job_store):
+    first = job()
+    await job_store.claim(first)
+    with pytest.raises(DocumentBusyError):
+        await job_store.claim(job())
+    # Document ids are per user.
+    await job_store.claim(job(user_id="other"))
+
+    first.update(stage=IngestionStage.COMPLETED)
+    await job_store.release(first)
+    second = job()
+    await job_store.claim(second)
+    assert (await job_store.get("u", "d")).revision == second.revision
+
+
+@pytest.mark.asyncio
+async def test_stale_claim_reads_as_failed_and_can_be_taken_over(job_store):
+    await job_store.claim(job())
+    await job_store.collection.update_one({"_id": "u:d"}, {"$set": {"heartbeat_at": time.time() - 120}})
+
+    stale = await job_store.get("u", "d")
+    assert stale.stage == IngestionStage.FAILED
+    await job_store.claim(job())
+
+
+@pytest.mark.asyncio
+async def test_release_of_a_superseded_job_keeps_the_new_claim(job_store):
+    old = job()
+    await job_store.claim(old)
+    await job_store.collection.update_one({"_id": "u:d"}, {"$set": {"heartbeat_at": time.time() - 120}})
+    new = job()
+    await job_store.claim(new)
+
+    old.update(stage=IngestionStage.FAILED)
+    await job_store.release(old)
+    current = await job_store.get("u", "d")
+    assert current.revision == new.revision and current.stage == IngestionStage.QUEUED
+    with pytest.raises(DocumentBusyError):
+        await job_store.claim(job())
@@ -0,0 +1,14 @@
+import pytest
+from app.services.keyword_index import reciprocal_rank_fusion
+
+
+def test_ids_ranked_well_in_both_lists_win():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+    assert [key for key, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_limit_and_empty_rankings():
+    assert reciprocal_rank_fusion([["a", "b"], []], limit=1) == [("a", pytest.approx(1 / 61))]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,86 @@
+from langchain.docstore.document import Document
+from app.services.revision_diff import RevisionDiff
+
+MODEL = "model-a"
+
+
+def stored_chunk(chunk_id, text: str, page: int, start_index: int, chunk_index: int,
+                 total_pages: int = 2, model: str = MODEL) -> dict:
+    metadata = {"page": page, "start_index": start_index, "chunk_index": chunk_index, "total_pages": total_pages}
+    return {"_id": chunk_id, "text": text, "metadata": metadata, "embedding_model": model}
+
+
+def upload(*chunks: tuple[str, int, int], total_pages: int = 2) -> list[Document]:
+    return [
+        Document(page_content=text, metadata={"page": page, "start_index": start_index, "total_pages": total_pages})
+        for text, page, start_index in chunks
+    ]
+
+
+STORED = [
+    stored_chunk(1, "alpha", 0, 0, 0),
+    stored_chunk(2, "beta", 0, 100, 1),
+    stored_chunk(3, "gamma", 1, 0, 2),
+    stored_chunk(4, "delta", 1, 100, 3),
+]
+
+
+def test_identical_upload_keeps_every_chunk():
+    diff = RevisionDiff(STORED, MODEL)
+
+    new = diff.add(upload(("alpha", 0, 0), ("beta", 0, 100), ("gamma", 1, 0), ("delta", 1, 100)))
+
+    assert new == []
+    assert diff.kept == 4
+    assert not diff.shifts and not diff.moves and not diff.removed_ids
+    assert not diff.changed
+
+
+def test_inserted_page_shifts_later_chunks_together():
+    diff = RevisionDiff(STORED, MODEL)
+
+    new = diff.add(upload(("cover", 0, 0), ("alpha", 1, 0), ("beta", 1, 100), ("gamma", 2, 0), ("delta", 2, 100),
+                          total_pages=3))
+
+    assert [doc.page_content for doc in new] == ["cover"]
+    assert new[0].metadata["chunk_index"] == 0
+    assert dict(diff.shifts) == {(1, 1): [1, 2, 3, 4]}
+    assert diff.moves == [] and diff.kept == 0 and diff.reused == 4
+    assert diff.new_total_pages == 3
+    assert diff.placements[4] == {"page": 2, "start_index": 100, "chunk_index": 4}
+
+
+def test_chunk_at_a_new_offset_is_moved_and_unmatched_chunks_are_removed():
+    diff = RevisionDiff(STORED, MODEL)
+
+    new = diff.add(upload(("alpha", 0, 0), ("gamma", 0, 50), ("epsilon", 1, 0)))
+
+    assert [doc.page_content for doc in new] == ["epsilon"]
+    assert diff.kept == 1
+    assert diff.moves == [(3, {"metadata.page": 0, "metadata.start_index": 50, "metadata.chunk_index": 1})]
+    assert diff.removed_ids == {2, 4}
+    assert diff.placements == {
+        1: {"page": 0, "start_index": 0, "chunk_index": 0},
+        3: {"page": 0, "start_index": 50, "chunk_index": 1},
+    }
+    assert diff.new_total_pages is None and diff.changed
+
+
+def test_repeated_text_prefers_the_copy_already_in_place():
+    stored = [stored_chunk(1, "footer", 0, 900, 0), stored_chunk(2, "footer", 1, 900, 1)]
+    diff = RevisionDiff(stored, MODEL)
+
+    diff.add(upload(("title", 0, 0), ("footer", 1, 900)))
+
+    assert diff.kept == 1
+    assert diff.removed_ids == {1}
+
+
+def test_chunks_embedded_with_another_model_are_replaced():
+    stored = STORED[:1] + [stored_chunk(2, "beta", 0, 100, 1, model="model-old")]
+    diff = RevisionDiff(stored, MODEL)
+
+    new = diff.add(upload(("alpha", 0, 0), ("beta", 0, 100)))
+
+    assert [doc.page_content for doc in new] == ["beta"]
+    assert diff.removed_ids == {2}
@@ -0,0 +1,113 @@
+import hashlib
+import numpy as np
+import pytest
+from langchain.docstore.document import Document
+from app.services.embeddings import EmbeddingProvider
+from app.services.revision_diff import RevisionDiff
+from app.services.vector_store import MongoVectorStore
+
+mongomock = pytest.importorskip("mongomock")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic unit vectors derived from the text hash; counts embedded texts.
+    """
+    model_name = "hash"
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        self.embedded += len(texts)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+            vector = np.random.default_rng(seed).normal(size=16)
+            vectors.append((vector / np.linalg.norm(vector)).tolist())
+        return vectors
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_batch(texts)
+
+
+@pytest.fixture
+def store():
+    # mongomock has no transactions, so revisions take the hidden write path.
+    client = mongomock.MongoClient()
+    store = MongoVectorStore(client=client, async_client=mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client))
+    store.embedding_model.client.provider = HashEmbeddingProvider()
+    return store
+
+
+def pages(*texts: str) -> list[Document]:
+    return [
+        Document(page_content=text, metadata={"page": i, "start_index": 0, "total_pages": len(texts)})
+        for i, text in enumerate(texts)
+    ]
+
+
+async def diff_upload(store: MongoVectorStore, documents: list[Document]) -> RevisionDiff:
+    diff = RevisionDiff(await store.aget_document_chunks("u", "d"), store.embedding_model.model_name)
+    new_documents = diff.add(documents)
+    diff.add_embeddings(await store.embedding_model.aembed_documents([doc.page_content for doc in new_documents]))
+    return diff
+
+
+async def apply(store: MongoVectorStore, diff: RevisionDiff, documents: list[Document], revision: str):
+    texts = [doc.page_content for doc in documents]
+    chunk_ids = [doc.metadata["chunk_index"] for doc in documents]
+    await store.aapply_revision("u", "d", diff, texts, chunk_ids, revision)
+
+
+@pytest.mark.asyncio
+async def test_unguarded_revision_is_hidden_until_published(store):
+    await store.aadd_documents(pages("one", "two", "three"), "u", "d", revision="r1")
+    documents = pages("zero", "one", "two", "three")
+    diff = await diff_upload(store, documents)
+    assert store.embedding_model.client.provider.embedded == 4
+
+    seen_before_publish = []
+    publish = store.apublish_revision
+
+    async def observe_then_publish(user_id, document_id, revision):
+        seen_before_publish.extend(await store.aget_document_texts("u", "d"))
+        await publish(user_id, document_id, revision)
+
+    store.apublish_revision = observe_then_publish
+    await apply(store, diff, documents, "r2")
+
+    assert seen_before_publish == ["one", "two", "three"]
+    assert await store.aget_document_texts("u", "d") == ["zero", "one", "two", "three"]
+    # Only the new text was embedded; the reused chunks were copied with their stored embeddings.
+    assert store.embedding_model.client.provider.embedded == 4
+    chunks = list(store.collection.find({}, {"metadata.page": 1, "metadata.chunk_index": 1, "revision": 1}))
+    assert len(chunks) == 4
+    assert {chunk["revision"] for chunk in chunks} == {"r2"}
+    assert sorted((c["metadata"]["page"], c["metadata"]["chunk_index"]) for c in chunks) == [(i, i) for i in range(4)]
+    assert store.revision_collection.count_documents({}) == 0
+    results = await store.asimilarity_search("one", "u", "d", k=1)
+    assert results[0].page_content == "one"
+
+
+@pytest.mark.asyncio
+async def test_failed_unguarded_revision_is_discarded(store):
+    await store.aadd_documents(pages("one", "two"), "u", "d", revision="r1")
+    documents = pages("one", "two", "three")
+    diff = await diff_upload(store, documents)
+
+    async def fail(user_id, document_id, revision):
+        raise RuntimeError("publish failed")
+
+    store.apublish_revision = fail
+    with pytest.raises(RuntimeError):
+        await apply(store, diff, documents, "r2")
+    assert await store.aget_document_texts("u", "d") == ["one", "two"]
+
+    # What the ingestion pipeline does with a revision that did not commit.
+    await store.adelete_document("u", "d", revision="r2")
+    assert await store.aget_document_texts("u", "d") == ["one", "two"]
+    assert store.collection.count_documents({}) == 2
+    assert store.collection.count_documents({"revision": "r2"}) == 0
+    assert not store.revision_collection.find_one({"hidden": "r2"})
@@ -7,7 +7,9 @@ export function initializeApi(sessionProvider) {
     // Return the public API methods that the rest of the app can use.
     return {
         uploadPDF,
-        postChatMessage
+        getDocumentStatus,
+        postChatMessage,
+        streamChatMessage
     };
 }
 
@@ -69,6 +71,21 @@ async function uploadPDF(file) {
     return result;
 }
 
+async function getDocumentStatus(documentId) {
+    const token = await getAuthToken();
+    if (!token) {
+        throw new Error('Authentication error: You must be logged in to check document status.');
+    }
+
+    const response = await fetch(`${API_BASE_URL}/api/v1/documents/${encodeURIComponent(documentId)}/status`, {
+        headers: {
+            'Authorization': `Bearer ${token}`,
+        },
+    });
+
+    return handleResponse(response);
+}
+
 async function postChatMessage(documentId, question) {
     console.log('postChatMessage called with:', { documentId, question });
     console.log('documentId type:', typeof documentId, 'value:', documentId);
@@ -97,3 +114,56 @@ async function postChatMessage(documentId, question) {
 
     return handleResponse(response);
 }
+
+// Streams an answer from the SSE chat endpoint. `handlers.onSources` receives the
+// retrieved chunks before any text; `handlers.onToken` receives each piece of the answer.
+async function streamChatMessage(documentId, question, handlers = {}) {
+    const token = await getAuthToken();
+    if (!token) {
+        throw new Error('Authentication error: You must be logged in to chat.');
+    }
+
+    const response = await fetch(`${API_BASE_URL}/api/v1/chat/stream`, {
+        method: 'POST',
+        headers: {
+            'Authorization': `Bearer ${token}`,
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ document_id: documentId, question: question }),
+    });
+
+    if (!response.ok) {
+        await handleResponse(response); // Throws with the backend's error message
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) eventName = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            }
+            const payload = data ? JSON.parse(data) : {};
+
+            if (eventName === 'sources') handlers.onSources?.(payload);
+            else if (eventName === 'token') handlers.onToken?.(payload.text);
+            else if (eventName === 'error') throw new Error(payload.detail);
+            else if (eventName === 'done') return;
+        }
+    }
+}
@@ -152,12 +152,21 @@ function initializeChat(elements, api) {
  thinkingMessage.classList.add('thinking-message');
 
  try {
- console.log('Sending chat message with documentId:', currentDocumentId, 'type:', typeof currentDocumentId);
- console.log('Question:', question);
- const response = await api.postChatMessage(String(currentDocumentId), String(question));
- console.log('Received response:', response);
- thinkingMessage.querySelector('p').textContent = response.answer;
+ const answerElement = thinkingMessage.querySelector('p');
+ let answer = '';
+ await api.streamChatMessage(String(currentDocumentId), String(question), {
+ onToken: (text) => {
+ // Replace the "Thinking..." placeholder with the first token, then append
+ if (!answer) thinkingMessage.classList.remove('thinking-message');
+ answer += text;
+ answerElement.textContent = answer;
+ elements.chatWindow.scrollTop = elements.chatWindow.scrollHeight;
+ },
+ });
+ if (!answer) {
+ answerElement.textContent = "I couldn't find the answer in the provided document.";
  thinkingMessage.classList.remove('thinking-message');
+ }
  } catch (error) {
  console.error('Chat error:', error);
  thinkingMessage.querySelector('p').textContent = `Error: ${error.message}`;
@@ -1,3 +1,5 @@
+const STATUS_POLL_INTERVAL_MS = 1000;
+
 // This module no longer searches for elements, preventing race conditions.
 // It receives all necessary elements and functions from chatUI.js.
 export function initializeUploader(elements, api, onUploadSuccess) {
@@ -39,6 +41,8 @@ async function handleUpload(elements, api, onUploadSuccess) {
         const documentId = String(result.document_id);
         console.log('Processed documentId:', documentId, 'type:', typeof documentId);
         
+        await waitForIngestion(elements, api, documentId);
+
         elements.uploadStatus.textContent = 'File processed successfully! You can now ask questions.';
         elements.uploadStatus.className = 'status-message success';
         
@@ -57,3 +61,26 @@ async function handleUpload(elements, api, onUploadSuccess) {
     }
 }
 
+// Uploads are processed in the background; poll until the document is ready.
+async function waitForIngestion(elements, api, documentId) {
+    while (true) {
+        const status = await api.getDocumentStatus(documentId);
+
+        if (status.stage === 'completed') {
+            return status;
+        }
+        if (status.stage === 'failed') {
+            throw new Error(status.error || 'Processing failed.');
+        }
+
+        let progress = status.stage;
+        if (status.stage === 'embedding' && status.chunks_total) {
+            progress = `embedding ${status.chunks_stored}/${status.chunks_total} chunks`;
+        } else if (status.pages_total) {
+            progress = `${status.stage} (${status.pages_processed}/${status.pages_total} pages)`;
+        }
+        elements.uploadStatus.textContent = `Processing: ${progress}...`;
+
+        await new Promise(resolve => setTimeout(resolve, STATUS_POLL_INTERVAL_MS));
+    }
+}